@@ -0,0 +1,216 @@
+"""
+商品列表响应缓存
+匿名请求（没有 UUID 请求头）的列表响应按规范化的查询参数缓存渲染后的 JSON。
+缓存键中包含版本号：商品列表使用全局版本，分类商品列表使用该分类的版本。
+商品、图片、分类、评价写入时由信号递增相关版本号，旧的缓存项不再被读取，随 TTL 过期，
+因此失效时不需要扫描或删除缓存键。
+
+版本号保存在数据库（ListCacheVersion）而不是缓存中：未配置共享缓存时默认缓存是进程内的
+LocMemCache，多个副本各自的版本号不会随其他副本的写入递增，列表 ETag 会一直返回 304。
+读取版本号是一次主键查询；响应缓存本身可以是进程内的，键中的版本号保证不会读到旧数据。
+
+访问量等不通过信号更新的数据最多滞后 PRODUCT_LIST_CACHE_TTL 秒。
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import HttpResponse
+
+from .conditional import not_modified, set_validators
+from .models import ListCacheVersion
+
+KEY_PREFIX = "product_list"
+GLOBAL_SCOPE = "global"
+# 按热度、独立访客数、近期热度排序
+UNVERSIONED_SORTS = {"1", "5", "6"}
+
+
+def cache_ttl():
+    """缓存时间（秒），0 表示关闭缓存"""
+    return getattr(settings, "PRODUCT_LIST_CACHE_TTL", 60)
+
+
+def get_cache():
+    return caches[getattr(settings, "PRODUCT_LIST_CACHE_ALIAS", "default")]
+
+
+def category_scope(category_id):
+    return f"category:{category_id}"
+
+
+def _initial_version():
+    # 新建的版本号从当前时间开始，数据库恢复或重建后不会与进程内缓存中的旧版本重复
+    return time.time_ns() // 1000
+
+
+def get_version(scope):
+    version = ListCacheVersion.objects.filter(scope=scope).values_list("version", flat=True).first()
+    return 0 if version is None else version
+
+
+def bump_versions(scopes):
+    """递增版本号，使这些范围内已缓存的响应失效"""
+    # 按固定顺序更新，并发写入时加锁顺序一致
+    for scope in sorted(set(scopes)):
+        if ListCacheVersion.objects.filter(scope=scope).update(version=F("version") + 1):
+            continue
+        try:
+            with transaction.atomic():
+                ListCacheVersion.objects.create(scope=scope, version=_initial_version())
+        except IntegrityError:
+            # 其他进程同时创建了该范围的版本号
+            ListCacheVersion.objects.filter(scope=scope).update(version=F("version") + 1)
+    stats.record_invalidation()
+
+
+def bump_product(category_ids=()):
+    """商品或其关联数据变化：全局列表和商品所属分类的列表失效"""
+    bump_versions([GLOBAL_SCOPE, *(category_scope(category_id) for category_id in category_ids)])
+
+
+def normalize_params(query_params):
+    """规范化查询参数：参数名和多值都排序，忽略空值"""
+    items = []
+    for name in sorted(query_params.keys()):
+        values = sorted(value for value in query_params.getlist(name) if value != "")
+        if values:
+            items.append((name, values))
+    return repr(items)
+
+
+def _base_url(request):
+    # 响应中的分页链接是绝对地址，来自请求的 Host 头，缓存键和 ETag 需要包含协议和主机，
+    # 否则伪造 Host 的请求写入的链接会返回给其他客户端
+    return request.build_absolute_uri(request.path)
+
+
+def response_cache_key(scope, request, renderer_format):
+    digest = hashlib.sha1(
+        f"{_base_url(request)}|{renderer_format}|{normalize_params(request.query_params)}".encode()
+    ).hexdigest()
+    return f"{KEY_PREFIX}:response:{scope}:{get_version(scope)}:{digest}"
+
+
+def list_etag(scope, request):
+    """
+    列表的 ETag，由版本号和规范化的查询参数生成，不需要查询数据库
+    按热度排序的列表随访问量变化，不由版本号决定，返回 None
+    """
+    if request.query_params.get("sort_by") in UNVERSIONED_SORTS:
+        return None
+    renderer = getattr(request, "accepted_renderer", None)
+    renderer_format = renderer.format if renderer is not None else ""
+    digest = hashlib.sha1(
+        f"{get_version(scope)}|{_base_url(request)}|{renderer_format}|{normalize_params(request.query_params)}".encode()
+    ).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+class CacheStats:
+    """进程内的命中统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.hit_age_total = 0.0
+        self.max_hit_age = 0.0
+
+    def record_hit(self, age):
+        with self._lock:
+            self.hits += 1
+            self.hit_age_total += age
+            self.max_hit_age = max(self.max_hit_age, age)
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                # 命中的缓存项的平均/最大存活时间，即实际的滞后窗口
+                "avg_hit_age_seconds": self.hit_age_total / self.hits if self.hits else 0.0,
+                "max_hit_age_seconds": self.max_hit_age,
+                "ttl_seconds": cache_ttl(),
+            }
+
+
+stats = CacheStats()
+
+
+class CachedListMixin:
+    """
+    为 ListAPIView 的匿名 JSON 请求缓存响应，并根据版本号生成 ETag 支持条件请求
+    子类通过 get_cache_scope() 指定使用哪个版本号
+    """
+
+    def get_cache_scope(self):
+        return GLOBAL_SCOPE
+
+    def _cacheable(self, request):
+        renderer = getattr(request, "accepted_renderer", None)
+        return (
+            cache_ttl() > 0
+            and not request.headers.get("UUID")
+            and renderer is not None
+            and renderer.format == "json"
+        )
+
+    def list(self, request, *args, **kwargs):
+        etag = list_etag(self.get_cache_scope(), request)
+        if etag:
+            response = not_modified(request, etag=etag)
+            if response is not None:
+                return response
+        response = self._cached_list(request, *args, **kwargs)
+        return set_validators(response, etag=etag)
+
+    def _cached_list(self, request, *args, **kwargs):
+        if not self._cacheable(request):
+            return super().list(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_cache_key(self.get_cache_scope(), request, request.accepted_renderer.format)
+        entry = cache.get(key)
+        if entry is not None:
+            age = time.time() - entry["cached_at"]
+            stats.record_hit(age)
+            response = HttpResponse(entry["content"], content_type=entry["content_type"])
+            response["X-Cache"] = "HIT"
+            response["Age"] = str(int(age))
+            return response
+
+        stats.record_miss()
+        response = super().list(request, *args, **kwargs)
+
+        def store(rendered):
+            if rendered.status_code == 200:
+                cache.set(
+                    key,
+                    {
+                        "content": rendered.content,
+                        "content_type": rendered["Content-Type"],
+                        "cached_at": time.time(),
+                    },
+                    cache_ttl(),
+                )
+
+        response.add_post_render_callback(store)
+        response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,31 @@
+"""
+条件请求（ETag / Last-Modified）
+商品详情的 ETag 由商品版本号生成，列表的 ETag 见 Product.cache.list_etag，
+计算时都不需要序列化数据或请求用户服务。
+
+响应中的访问量、独立访客数和卖家信息不计入版本号，因此使用弱 ETag。
+?fields= / ?view= 返回的是不同的表示，详情的 ETag 中包含投影，不同投影的 ETag 不会相同。
+"""
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def product_etag(product, projection=None):
+    suffix = projection.etag_suffix() if projection is not None else ""
+    if suffix:
+        return f'W/"{product.product_id}-{product.version}-{suffix}"'
+    return f'W/"{product.product_id}-{product.version}"'
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """请求的 If-None-Match / If-Modified-Since 与当前版本一致时返回 304 响应，否则返回 None"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
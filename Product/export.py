@@ -0,0 +1,74 @@
+"""
+商品目录导出
+按 (updated_at, product_id) 顺序以 NDJSON（每行一个 JSON 对象）流式输出全部商品，
+供搜索、推荐、分析等下游服务同步目录。
+
+查询使用 iterator(chunk_size=...)，PostgreSQL 下为服务端游标，每次只取一批行；
+每批商品的分类、图片和卖家信息各用一次查询获取，序列化后立即写出，
+内存占用只与批大小有关，与目录大小无关。批大小由 PRODUCT_EXPORT_CHUNK_SIZE 配置（默认2000）。
+"""
+import itertools
+
+from django.conf import settings
+from rest_framework import serializers
+
+from .renderers import ORJSONRenderer
+from .serializers import USER_INFO_CONTEXT_KEY
+
+EXPORT_ORDERING = ("updated_at", "product_id")
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Accept-Encoding 是否接受 gzip（RFC 9110 12.5.3）
+
+    按 q 值判断：gzip;q=0 表示拒绝；没有列出 gzip 时看 * 的 q 值
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def export_chunk_size():
+    return getattr(settings, "PRODUCT_EXPORT_CHUNK_SIZE", 2000)
+
+
+def export_lines(queryset, row_serializer, chunk_size=None):
+    """
+    逐批生成 NDJSON 数据，每批一个 bytes
+
+    每行是 ProductSerializer 的输出加上 updated_at（下游用作增量同步的水位）
+    """
+    chunk_size = chunk_size or export_chunk_size()
+    renderer = ORJSONRenderer()
+    updated_at_field = serializers.DateTimeField()
+    rows = row_serializer.rows(queryset.order_by(*EXPORT_ORDERING)).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        # 卖家信息只在一批内复用，避免缓存随导出的商品数量增长
+        row_serializer.context.pop(USER_INFO_CONTEXT_KEY, None)
+        lines = []
+        for row, item in zip(chunk, row_serializer.to_representation(chunk)):
+            item["updated_at"] = updated_at_field.to_representation(row["updated_at"])
+            lines.append(renderer.render(item))
+        lines.append(b"")
+        yield b"\n".join(lines)
+
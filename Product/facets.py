@@ -0,0 +1,147 @@
+"""
+商品列表的筛选统计（分面）
+对 ProductFilter 过滤后的商品统计各状态数量、价格区间分布和各分类数量，供筛选侧栏使用。
+
+所有统计在一条 SQL 中完成（UNION ALL）：
+    - 商品按 (status, 价格区间) 分组计数，状态和价格两个分面在 Python 中分别求和
+    - 商品-分类中间表按分类分组计数
+分类数量增加只会增加结果行数，SQL 和执行计划不变。
+
+结果按过滤参数和全局版本号缓存 PRODUCT_FACET_CACHE_TTL 秒（默认30），商品写入后自动失效。
+"""
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, CharField, Count, F, IntegerField, Value, When
+from rest_framework.exceptions import ValidationError
+
+from .cache import GLOBAL_SCOPE, get_cache, get_version, normalize_params
+from .filters import ProductFilter
+from .models import Product
+
+KEY_PREFIX = "product_facets"
+# 价格区间的下限，最后一个区间没有上限
+DEFAULT_PRICE_BUCKETS = [0, 50, 100, 200, 500, 1000, 5000]
+
+
+def facet_cache_ttl():
+    return getattr(settings, "PRODUCT_FACET_CACHE_TTL", 30)
+
+
+def price_buckets():
+    return [Decimal(str(bound)) for bound in getattr(settings, "PRODUCT_FACET_PRICE_BUCKETS", DEFAULT_PRICE_BUCKETS)]
+
+
+def price_bucket_expression(bounds):
+    """价格所在区间的序号"""
+    return Case(
+        *[When(price__lt=upper, then=Value(index)) for index, upper in enumerate(bounds[1:])],
+        default=Value(len(bounds) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def facet_query(queryset, bounds):
+    """
+    一条 UNION ALL 查询，每行为 (status, bucket, category_id, category_name, count)，
+    不属于该分组的列为 NULL
+    """
+    product_ids = queryset.order_by().values("pk")
+    null_int = Value(None, output_field=IntegerField())
+    null_str = Value(None, output_field=CharField())
+
+    status_price = (
+        Product.objects.filter(pk__in=product_ids)
+        .order_by()
+        .values(
+            facet_status=F("status"),
+            facet_bucket=price_bucket_expression(bounds),
+            facet_category=null_int,
+            facet_category_name=null_str,
+        )
+        .annotate(facet_count=Count("*"))
+    )
+    through = Product.categories.through
+    categories = (
+        through.objects.filter(product_id__in=product_ids)
+        .order_by()
+        .values(
+            facet_status=null_int,
+            facet_bucket=null_int,
+            facet_category=F("category_id"),
+            facet_category_name=F("category__name"),
+        )
+        .annotate(facet_count=Count("*"))
+    )
+    return status_price.union(categories, all=True)
+
+
+def compute_facets(queryset):
+    bounds = price_buckets()
+    status_counts = {value: 0 for value, _ in Product.STATUS_CHOICES}
+    bucket_counts = [0] * len(bounds)
+    categories = []
+    for row in facet_query(queryset, bounds):
+        if row["facet_category"] is not None:
+            categories.append(
+                {
+                    "category_id": row["facet_category"],
+                    "name": row["facet_category_name"],
+                    "count": row["facet_count"],
+                }
+            )
+        else:
+            status_counts[row["facet_status"]] = status_counts.get(row["facet_status"], 0) + row["facet_count"]
+            bucket_counts[row["facet_bucket"]] += row["facet_count"]
+
+    labels = dict(Product.STATUS_CHOICES)
+    categories.sort(key=lambda item: (-item["count"], item["category_id"]))
+    return {
+        "count": sum(status_counts.values()),
+        "status": [
+            {"value": value, "label": labels.get(value), "count": count}
+            for value, count in status_counts.items()
+        ],
+        "price": [
+            {
+                "min": str(lower),
+                "max": str(bounds[index + 1]) if index + 1 < len(bounds) else None,
+                "count": bucket_counts[index],
+            }
+            for index, lower in enumerate(bounds)
+        ],
+        "categories": categories,
+    }
+
+
+def filter_params(query_params):
+    """只保留 ProductFilter 的参数，分页、排序等参数不影响统计结果"""
+    params = query_params.copy()
+    for name in list(params.keys()):
+        if name not in ProductFilter.base_filters:
+            del params[name]
+    return params
+
+
+def get_facets(query_params):
+    """
+    过滤参数对应的分面统计，参数无效时抛出 ValidationError
+    """
+    params = filter_params(query_params)
+    ttl = facet_cache_ttl()
+    key = None
+    if ttl > 0:
+        digest = hashlib.sha1(normalize_params(params).encode()).hexdigest()
+        key = f"{KEY_PREFIX}:{get_version(GLOBAL_SCOPE)}:{digest}"
+        facets = get_cache().get(key)
+        if facets is not None:
+            return facets
+
+    filterset = ProductFilter(params, queryset=Product.objects.all())
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    facets = compute_facets(filterset.qs)
+    if key is not None:
+        get_cache().set(key, facets, ttl)
+    return facets
@@ -0,0 +1,156 @@
+"""
+商品列表的只读快速序列化
+直接从 values() 查询得到的字典行构建与 ProductSerializer 完全相同的输出，
+不实例化模型对象，也不逐行经过嵌套序列化器的调度逻辑。
+
+字段的输出格式（价格精度、时间格式、图片URL等）仍由 ProductSerializer 绑定的字段负责，
+因此修改 ProductSerializer 的字段定义后两条路径的输出保持一致。
+"""
+from django.conf import settings
+from django.db.models import F
+from django.db.models.fields.files import FieldFile
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .models import Category, ProductMedia
+from .projections import get_projection, project_user_info
+from .queries import ordering_columns
+from .serializers import (
+    ProductSerializer,
+    UserInfoMixin,
+    prefetch_user_info,
+)
+
+# 需要单独查询的字段
+NESTED_FIELDS = ("categories", "media")
+
+
+def fast_list_enabled():
+    return getattr(settings, "PRODUCT_FAST_LIST", True)
+
+
+def _represent(field, value):
+    # 与 Serializer.to_representation 一样，None 不交给字段处理
+    return None if value is None else field.to_representation(value)
+
+
+def _child_fields(fields, name):
+    if name not in fields:
+        return None
+    return list(fields[name].child.fields.values())
+
+
+class ProductRowSerializer(UserInfoMixin):
+    """从字典行构建商品列表数据"""
+
+    serializer_class = ProductSerializer
+
+    def __init__(self, context=None, serializer_class=None):
+        self.context = context if context is not None else {}
+        if serializer_class is not None:
+            self.serializer_class = serializer_class
+        # 绑定后的字段，字段的 context 指向 self.context（图片URL需要其中的 request）
+        fields = self.serializer_class(context=self.context).fields
+        self.fields = [field for field in fields.values() if not field.write_only]
+        self.column_fields = [
+            field
+            for field in self.fields
+            if field.field_name not in NESTED_FIELDS
+            and not isinstance(field, serializers.SerializerMethodField)
+        ]
+        # 投影中不包含分类或图片时为 None，不查询对应的表
+        self.category_fields = _child_fields(fields, "categories")
+        self.media_fields = _child_fields(fields, "media")
+        self.media_file_field = ProductMedia._meta.get_field("media")
+        projection = get_projection(self.context)
+        self.main_media_only = projection is not None and projection.main_media_only
+        self.with_user_info = "user_info" in fields
+
+    def columns(self):
+        """values() 需要查询的列"""
+        return list(dict.fromkeys([*(field.source for field in self.column_fields), "product_id", "user_id"]))
+
+    def rows(self, queryset):
+        """
+        把商品查询集转换成字典行查询集，保留过滤、排序和注解
+        排序列和注解即使不输出也要查询，游标分页从行中读取它们
+        """
+        columns = dict.fromkeys([*self.columns(), *ordering_columns(queryset)])
+        return queryset.prefetch_related(None).values(*columns, *queryset.query.annotations)
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        product_ids = [row["product_id"] for row in rows]
+        categories = self._load_categories(product_ids)
+        media = self._load_media(product_ids)
+        if self.with_user_info:
+            prefetch_user_info(self.context, {row["user_id"] for row in rows})
+
+        data = []
+        for row in rows:
+            item = {}
+            for field in self.fields:
+                name = field.field_name
+                if name == "categories":
+                    item[name] = categories.get(row["product_id"], [])
+                elif name == "media":
+                    item[name] = media.get(row["product_id"], [])
+                elif name == "user_info":
+                    item[name] = project_user_info(self.context, self.resolve_user_info(row["user_id"]))
+                else:
+                    item[name] = _represent(field, row[field.source])
+            data.append(item)
+        return data
+
+    def _load_categories(self, product_ids):
+        """
+        一次查询所有商品的分类，与预取使用相同的连接（分类表连接中间表）
+        """
+        if not product_ids or self.category_fields is None:
+            return {}
+        rows = (
+            Category.objects.filter(products__in=product_ids)
+            .values(*(field.source for field in self.category_fields), related_product_id=F("products"))
+        )
+        result = {}
+        for row in rows:
+            result.setdefault(row["related_product_id"], []).append(
+                {field.field_name: _represent(field, row[field.source]) for field in self.category_fields}
+            )
+        return result
+
+    def _load_media(self, product_ids):
+        """一次查询所有商品的图片，使用模型默认排序（主图优先）"""
+        if not product_ids or self.media_fields is None:
+            return {}
+        queryset = ProductMedia.objects.filter(product_id__in=product_ids)
+        if self.main_media_only:
+            queryset = queryset.filter(is_main=True)
+        rows = queryset.values("product_id", *(field.source for field in self.media_fields))
+        result = {}
+        for row in rows:
+            row["media"] = FieldFile(None, self.media_file_field, row["media"])
+            result.setdefault(row["product_id"], []).append(
+                {field.field_name: _represent(field, row[field.source]) for field in self.media_fields}
+            )
+        return result
+
+
+class FastProductListMixin:
+    """
+    商品列表视图的只读快速路径：按字典行分页和序列化
+    通过 PRODUCT_FAST_LIST = False 退回到 ProductSerializer
+    """
+
+    row_serializer_class = ProductRowSerializer
+
+    def list(self, request, *args, **kwargs):
+        if not fast_list_enabled():
+            return super().list(request, *args, **kwargs)
+
+        row_serializer = self.row_serializer_class(context=self.get_serializer_context())
+        queryset = row_serializer.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(row_serializer.to_representation(page))
+        return Response(row_serializer.to_representation(queryset))
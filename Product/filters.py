@@ -1,6 +1,8 @@
 import django_filters
-from django.db.models import Q
-from .models import Product
+from django.db.models import Exists, OuterRef, Q
+from .models import Product, SellerSnapshot
+from .search import full_text_enabled, search_products
+from .title_index import title_filter
 
 class ProductFilter(django_filters.FilterSet):
     """
@@ -8,7 +10,7 @@ class ProductFilter(django_filters.FilterSet):
     提供对商品的高级过滤功能
     """
     # 标题模糊搜索
-    title = django_filters.CharFilter(field_name='title', lookup_expr='icontains')
+    title = django_filters.CharFilter(method='filter_title')
     
     # 描述模糊搜索
     description = django_filters.CharFilter(field_name='description', lookup_expr='icontains')
@@ -22,19 +24,67 @@ class ProductFilter(django_filters.FilterSet):
     
     # 状态过滤
     status = django_filters.NumberFilter(field_name='status')
-    user_status = django_filters.NumberFilter(field_name='user__status')
+    # 卖家状态过滤 (读取本地卖家目录)
+    user_status = django_filters.NumberFilter(method='filter_user_status')
     # 搜索字段 (同时搜索标题和描述)
     search = django_filters.CharFilter(method='filter_search')
     
+    def filter_title(self, queryset, name, value):
+        """
+        标题模糊搜索：启用标题索引时先用索引得到候选商品（以及索引之后修改过的商品），再用 icontains 确认
+        """
+        condition = title_filter(value)
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        return queryset.filter(title__icontains=value)
+
     def filter_search(self, queryset, name, value):
         """
         搜索方法：同时在标题和描述中搜索关键词
+        PostgreSQL 下使用全文索引，未指定 sort_by 时按相关度排序；
+        其他数据库启用标题索引时，标题部分由索引缩小范围
+        """
+        if not full_text_enabled(queryset.db):
+            condition = title_filter(value)
+            if condition is not None:
+                return queryset.filter(
+                    (condition & Q(title__icontains=value)) | Q(description__icontains=value)
+                )
+        queryset = search_products(queryset, value)
+        if "search_rank" in queryset.query.annotations and not self.data.get("sort_by"):
+            queryset = queryset.order_by("-search_rank", "-created_at", "-product_id")
+        return queryset
+    
+    def filter_user_status(self, queryset, name, value):
+        """
+        卖家状态过滤：对本地卖家目录做半连接，不请求用户服务
+        没有快照的卖家按正常状态(0)处理
         """
+        value = int(value)
+        if value == 0:
+            abnormal = SellerSnapshot.objects.filter(user_id=OuterRef('user_id')).exclude(status=0)
+            return queryset.filter(~Exists(abnormal))
         return queryset.filter(
-            Q(title__icontains=value) | 
-            Q(description__icontains=value)
+            Exists(SellerSnapshot.objects.filter(user_id=OuterRef('user_id'), status=value))
         )
     
     class Meta:
         model = Product
         fields = ['title', 'description', 'min_price', 'max_price', 'category', 'status', 'search','user_status']
+
+
+class ProductExportFilter(django_filters.FilterSet):
+    """
+    商品导出过滤器
+    updated_after 用于增量同步：下游记录上次导出的最后一行的 updated_at 作为水位，
+    下次从该水位（含）继续导出，水位上的商品会重复出现，按 product_id 覆盖即可
+    """
+    status = django_filters.NumberFilter(field_name='status')
+    category = django_filters.NumberFilter(field_name='categories__category_id')
+    created_after = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+    updated_after = django_filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+
+    class Meta:
+        model = Product
+        fields = ['status', 'category', 'created_after', 'created_before', 'updated_after']
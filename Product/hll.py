@@ -0,0 +1,79 @@
+"""
+HyperLogLog 基数估计
+用 2^12 = 4096 个寄存器（每个1字节，共4KB）估计不同访客的数量，标准误差约 1.6%。
+两个 sketch 按寄存器取最大值即可合并，合并满足交换律且重复合并结果不变，
+因此多个进程各自累加的结果可以随时合并到数据库中的 sketch 上。
+"""
+import hashlib
+import math
+
+P = 12
+M = 1 << P
+# 哈希值中用于计算 rho 的位数
+W_BITS = 64 - P
+ALPHA = 0.7213 / (1 + 1.079 / M)
+# 2^-rho 的查找表，rho 最大为 W_BITS + 1
+_INVERSE_POWERS = [2.0 ** -rho for rho in range(W_BITS + 2)]
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+
+def register_for(value):
+    """
+    value 对应的 (寄存器序号, rho)
+
+    高 P 位选择寄存器，rho 为剩余位中第一个 1 的位置（从1开始）
+    """
+    hashed = _hash(value)
+    index = hashed >> W_BITS
+    remainder = hashed & ((1 << W_BITS) - 1)
+    return index, W_BITS - remainder.bit_length() + 1
+
+
+class HyperLogLog:
+    def __init__(self, registers=None):
+        if registers is None:
+            self.registers = bytearray(M)
+        else:
+            if len(registers) != M:
+                raise ValueError(f"HyperLogLog registers must be {M} bytes, got {len(registers)}")
+            self.registers = bytearray(registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(bytes(data))
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        index, rho = register_for(value)
+        return self.update({index: rho})
+
+    def update(self, registers):
+        """
+        按 {寄存器序号: rho} 取最大值合并，返回是否有寄存器变化
+        """
+        changed = False
+        for index, rho in registers.items():
+            if rho > self.registers[index]:
+                self.registers[index] = rho
+                changed = True
+        return changed
+
+    def merge(self, other):
+        """合并另一个 sketch（寄存器逐个取最大值）"""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """估计的基数"""
+        estimate = ALPHA * M * M / sum(_INVERSE_POWERS[rho] for rho in self.registers)
+        zeros = self.registers.count(0)
+        # 基数较小时使用线性计数
+        if estimate <= 2.5 * M and zeros:
+            return round(M * math.log(M / zeros))
+        return round(estimate)
+
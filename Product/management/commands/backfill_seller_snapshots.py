@@ -0,0 +1,50 @@
+"""
+批量回填本地卖家目录
+收集商品、评价、收藏中出现的全部用户ID，从用户服务批量获取用户信息写入 SellerSnapshot
+"""
+from django.core.management.base import BaseCommand
+
+from ProductService.user_service import user_service
+from Product.models import Product, ProductReview, Collection, SellerSnapshot
+from Product.seller_directory import snapshot_version, upsert_snapshots
+
+
+class Command(BaseCommand):
+    help = "从用户服务批量回填本地卖家目录（SellerSnapshot）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=200, help="每批请求的用户数量"
+        )
+        parser.add_argument(
+            "--only-missing", action="store_true", help="只回填本地还没有快照的用户"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        user_ids = set(Product.objects.values_list("user_id", flat=True).distinct())
+        user_ids.update(ProductReview.objects.values_list("user_id", flat=True).distinct())
+        user_ids.update(Collection.objects.values_list("collecter", flat=True).distinct())
+        if options["only_missing"]:
+            user_ids.difference_update(SellerSnapshot.objects.values_list("user_id", flat=True))
+
+        user_ids = sorted(str(user_id) for user_id in user_ids)
+        self.stdout.write(f"Backfilling {len(user_ids)} users (batch size {batch_size})")
+
+        written = 0
+        unresolved = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            # 跳过客户端缓存，直接请求用户服务；版本号取请求前的时间，
+            # 已应用的更新事件（版本号不小于它）不会被覆盖
+            for user_id in batch:
+                user_service.cache.invalidate(user_id)
+            version = snapshot_version()
+            user_infos = user_service.get_users_by_ids(batch)
+            written += upsert_snapshots(user_infos, version=version)
+            unresolved += sum(1 for user_id in batch if not user_infos.get(user_id))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {written} snapshots, {unresolved} users unresolved")
+        )
@@ -0,0 +1,104 @@
+"""
+商品列表序列化基准
+对比 ProductSerializer + JSONRenderer 与字典行快速序列化 + ORJSONRenderer 渲染一页商品的吞吐量，
+并检查两者输出的字节完全相同
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from Product.fast_serializers import ProductRowSerializer
+from Product.management.commands.bench_search import BENCH_USER_ID, Command as SearchBenchCommand
+from Product.models import Category, Product, ProductMedia, SellerSnapshot
+from Product.projections import PRODUCT_VIEWS, PROJECTION_CONTEXT_KEY
+from Product.queries import build_product_queryset
+from Product.renderers import ORJSONRenderer, orjson
+from Product.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = "对比 ProductSerializer 与快速序列化渲染商品列表的吞吐量"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, action="append", dest="page_sizes", help="每页条数，可重复指定")
+        parser.add_argument("--runs", type=int, default=50, help="每种每页条数的测量次数")
+        parser.add_argument("--view", choices=sorted(PRODUCT_VIEWS), default="full", help="商品数据的投影")
+        parser.add_argument("--cleanup", action="store_true", help="删除基准数据后退出")
+
+    def handle(self, *args, **options):
+        bench_products = Product.objects.filter(user_id=BENCH_USER_ID)
+        if options["cleanup"]:
+            deleted, _ = bench_products.delete()
+            SellerSnapshot.objects.filter(user_id=BENCH_USER_ID).delete()
+            self.stdout.write(f"Deleted {deleted} rows")
+            return
+
+        page_sizes = options["page_sizes"] or [20, 50, 100]
+        existing = bench_products.count()
+        if existing < max(page_sizes):
+            self.seed(max(page_sizes) - existing)
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed, ORJSONRenderer falls back to JSONRenderer"))
+
+        projection = PRODUCT_VIEWS[options["view"]]
+        queryset = build_product_queryset(queryset=bench_products, projection=projection)
+        context = {"request": RequestFactory().get("/product/"), PROJECTION_CONTEXT_KEY: projection}
+        for page_size in page_sizes:
+            slow_content = self.render_serializer(queryset, page_size, context)
+            fast_content = self.render_rows(queryset, page_size, context)
+            if slow_content != fast_content:
+                raise CommandError(f"Output differs for page size {page_size}")
+            self.stdout.write(f"page_size {page_size:>4}    payload: {len(fast_content)} bytes")
+
+            results = {}
+            for name, render in (("serializer", self.render_serializer), ("fast", self.render_rows)):
+                samples = []
+                for _ in range(options["runs"]):
+                    started = time.perf_counter()
+                    render(queryset, page_size, context)
+                    samples.append(time.perf_counter() - started)
+                results[name] = statistics.median(samples)
+                self.stdout.write(
+                    f"page_size {page_size:>4} {name:>10}: median {results[name] * 1000:8.2f}ms  "
+                    f"{1 / results[name]:8.1f} pages/s  {page_size / results[name]:9.0f} products/s"
+                )
+            self.stdout.write(f"page_size {page_size:>4}    speedup: {results['serializer'] / results['fast']:.2f}x")
+
+    @staticmethod
+    def render_serializer(queryset, page_size, context):
+        serializer = ProductSerializer(queryset[:page_size], many=True, context=dict(context))
+        return JSONRenderer().render(serializer.data)
+
+    @staticmethod
+    def render_rows(queryset, page_size, context):
+        row_serializer = ProductRowSerializer(context=dict(context))
+        rows = row_serializer.rows(queryset)[:page_size]
+        return ORJSONRenderer().render(row_serializer.to_representation(rows))
+
+    def seed(self, rows):
+        self.stdout.write(f"Seeding {rows} products...")
+        rng = random.Random(rows)
+        SellerSnapshot.objects.get_or_create(user_id=BENCH_USER_ID, defaults={"username": "bench"})
+        categories = [Category.objects.get_or_create(name=name)[0] for name in ("数码", "服饰", "闲置")]
+        products = Product.objects.bulk_create(
+            [SearchBenchCommand._random_product(rng) for _ in range(rows)]
+        )
+        through = Product.categories.through
+        through.objects.bulk_create(
+            [
+                through(product_id=product.product_id, category_id=category.category_id)
+                for product in products
+                for category in rng.sample(categories, 2)
+            ]
+        )
+        ProductMedia.objects.bulk_create(
+            [
+                ProductMedia(product=product, media=f"product_media/{product.product_id}_{i}.jpg", is_main=i == 0)
+                for product in products
+                for i in range(3)
+            ]
+        )
@@ -0,0 +1,105 @@
+"""
+商品搜索基准
+对比 icontains 过滤与全文索引搜索在大量商品上的耗时（全文索引只在 PostgreSQL 上可用）
+"""
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from Product.models import Product
+from Product.search import full_text_enabled, rebuild_search_vectors, search_products
+
+# 基准数据使用固定的卖家ID，便于统计和清理
+BENCH_USER_ID = uuid.UUID("00000000-0000-0000-0000-00000000be4c")
+
+BRANDS = ["苹果", "华为", "小米", "索尼", "佳能", "戴尔", "联想", "任天堂", "耐克", "优衣库"]
+ITEMS = ["手机", "耳机", "平板", "相机", "笔记本电脑", "显示器", "键盘", "游戏机", "运动鞋", "羽绒服"]
+CONDITIONS = ["九成新", "全新未拆封", "轻微划痕", "自用闲置", "毕业出售", "功能完好"]
+WORDS = ["包邮", "可小刀", "原装配件", "发票齐全", "支持验货", "同城自提", "电池健康", "保修期内"]
+
+DEFAULT_QUERIES = ["耳机", "华为手机", "九成新", "iphone", "游戏机 包邮"]
+
+
+class Command(BaseCommand):
+    help = "对比 icontains 与全文索引搜索的耗时"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="基准商品数量")
+        parser.add_argument("--runs", type=int, default=5, help="每个搜索词的测量次数")
+        parser.add_argument("--query", action="append", dest="queries", help="搜索词，可重复指定")
+        parser.add_argument("--cleanup", action="store_true", help="删除基准数据后退出")
+
+    def handle(self, *args, **options):
+        bench_products = Product.objects.filter(user_id=BENCH_USER_ID)
+        if options["cleanup"]:
+            deleted, _ = bench_products.delete()
+            self.stdout.write(f"Deleted {deleted} rows")
+            return
+
+        existing = bench_products.count()
+        if existing < options["rows"]:
+            self.seed(options["rows"] - existing)
+
+        queries = options["queries"] or DEFAULT_QUERIES
+        strategies = [("icontains", self.legacy_search)]
+        if full_text_enabled():
+            strategies.append(("full_text", self.full_text_search))
+        else:
+            self.stdout.write(self.style.WARNING("Full-text search requires PostgreSQL, only icontains is measured"))
+
+        for query in queries:
+            for name, search in strategies:
+                samples = []
+                for _ in range(options["runs"]):
+                    started = time.perf_counter()
+                    queryset = search(query)
+                    count = queryset.count()
+                    list(queryset[:20])
+                    samples.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f"{query:>12} {name:>10}: {count:>8} rows  "
+                    f"median {statistics.median(samples):9.1f}ms  max {max(samples):9.1f}ms"
+                )
+
+    def legacy_search(self, value):
+        return Product.objects.filter(
+            Q(title__icontains=value) | Q(description__icontains=value)
+        ).order_by("-created_at")
+
+    def full_text_search(self, value):
+        queryset = search_products(Product.objects.all(), value)
+        return queryset.order_by("-search_rank", "-created_at", "-product_id")
+
+    def seed(self, rows, batch_size=5000):
+        self.stdout.write(f"Seeding {rows} products...")
+        rng = random.Random(rows)
+        started = time.perf_counter()
+        for start in range(0, rows, batch_size):
+            batch = [self._random_product(rng) for _ in range(min(batch_size, rows - start))]
+            Product.objects.bulk_create(batch)
+            # bulk_create 不触发信号，直接批量生成搜索向量
+            rebuild_search_vectors(Product.objects.filter(pk__in=[p.product_id for p in batch]))
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE product")
+        self.stdout.write(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    @staticmethod
+    def _random_product(rng):
+        brand, item = rng.choice(BRANDS), rng.choice(ITEMS)
+        title = f"{brand}{item} {rng.choice(CONDITIONS)}"
+        if rng.random() < 0.1:
+            title = f"iPhone {rng.randint(8, 16)} {title}"
+        description = "，".join(rng.sample(WORDS, 3)) + f"，{rng.choice(CONDITIONS)}的{brand}{item}"
+        return Product(
+            user_id=BENCH_USER_ID,
+            title=title,
+            description=description,
+            price=rng.randint(10, 10000),
+            status=Product.ON_SALE,
+        )
@@ -0,0 +1,76 @@
+"""
+标题倒排索引基准
+测量构建耗时、内存占用和查询耗时，默认使用随机生成的标题，不访问数据库
+"""
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from Product.management.commands.bench_search import BRANDS, CONDITIONS, ITEMS
+from Product.models import Product
+from Product.title_index import TitleIndex
+
+DEFAULT_QUERIES = ["耳机", "华为手机", "九成新", "iphone 1", "游戏机"]
+
+
+class Command(BaseCommand):
+    help = "测量标题倒排索引的构建耗时、内存占用和查询耗时"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="随机标题数量")
+        parser.add_argument("--from-db", action="store_true", help="使用数据库中的商品标题")
+        parser.add_argument("--runs", type=int, default=100, help="每个查询词的测量次数")
+        parser.add_argument("--query", action="append", dest="queries", help="查询词，可重复指定")
+
+    def handle(self, *args, **options):
+        if options["from_db"]:
+            rows = list(Product.objects.values_list("product_id", "title"))
+        else:
+            rows = list(self._random_titles(options["rows"]))
+
+        index = TitleIndex()
+        started = time.perf_counter()
+        documents = index.build(rows)
+        build_seconds = time.perf_counter() - started
+
+        stats = index.stats()
+        memory_mb = stats["memory_bytes"] / 1024 / 1024
+        self.stdout.write(
+            f"Built {documents} titles in {build_seconds:.2f}s, "
+            f"{stats['tokens']} tokens, {stats['postings']} postings"
+        )
+        self.stdout.write(
+            f"Memory {memory_mb:.1f}MB ({stats['memory_bytes'] / max(documents, 1):.1f} bytes/product, "
+            f"{memory_mb * 1_000_000 / max(documents, 1):.1f}MB per million)"
+        )
+
+        queries = options["queries"] or DEFAULT_QUERIES
+        if not options["queries"] and rows:
+            # 取一个真实标题的片段作为选择性高的查询
+            queries = queries + [rows[len(rows) // 2][1][-8:]]
+        for query in queries:
+            samples = []
+            for _ in range(options["runs"]):
+                started = time.perf_counter()
+                result = index.search(query)
+                samples.append((time.perf_counter() - started) * 1_000_000)
+            # None 表示候选过多，由数据库过滤
+            matches = "too many" if result is None else len(result)
+            self.stdout.write(
+                f"{query:>12}: {matches:>8} candidates  "
+                f"median {statistics.median(samples):10.1f}us  max {max(samples):10.1f}us"
+            )
+
+    @staticmethod
+    def _random_titles(rows):
+        rng = random.Random(rows)
+        for _ in range(rows):
+            # 随机的型号/描述文字让词元分布接近真实标题
+            detail = "".join(chr(0x4E00 + rng.randrange(3000)) for _ in range(rng.randint(2, 6)))
+            title = f"{rng.choice(BRANDS)}{rng.choice(ITEMS)} {detail} {rng.choice(CONDITIONS)}"
+            if rng.random() < 0.1:
+                title = f"iPhone {rng.randint(8, 16)} {title}"
+            yield uuid.UUID(int=rng.getrandbits(128)), title
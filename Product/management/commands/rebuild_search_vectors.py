@@ -0,0 +1,29 @@
+"""
+重建商品的全文检索向量（search_vector）
+迁移 0005 不回填已有商品，部署后执行一次 --only-missing；分词规则变化后不带参数执行全部重建。
+每批 UPDATE 单独提交，不长时间锁表（只在 PostgreSQL 上有效）
+"""
+from django.core.management.base import BaseCommand
+
+from Product.models import Product
+from Product.search import full_text_enabled, rebuild_search_vectors
+
+
+class Command(BaseCommand):
+    help = "分批重建商品的 search_vector（PostgreSQL）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only-missing", action="store_true", help="只处理 search_vector 为空的商品"
+        )
+
+    def handle(self, *args, **options):
+        if not full_text_enabled():
+            self.stdout.write("Full-text search requires PostgreSQL, nothing to do")
+            return
+
+        queryset = Product.objects.order_by("product_id")
+        if options["only_missing"]:
+            queryset = queryset.filter(search_vector__isnull=True)
+        updated = rebuild_search_vectors(queryset)
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} search vectors"))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-17 03:12
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Product', '0002_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerSnapshot',
+            fields=[
+                ('user_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('username', models.CharField(max_length=150)),
+                ('avatar', models.CharField(blank=True, max_length=500, null=True)),
+                ('email', models.CharField(blank=True, max_length=254, null=True)),
+                ('address', models.CharField(blank=True, max_length=255, null=True)),
+                ('status', models.SmallIntegerField(default=0)),
+                ('privilege', models.SmallIntegerField(default=0)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'seller_snapshot',
+            },
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='product_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
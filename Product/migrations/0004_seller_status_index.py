@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Product', '0003_seller_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sellersnapshot',
+            index=models.Index(fields=['status', 'user_id'], name='seller_status_idx'),
+        ),
+    ]
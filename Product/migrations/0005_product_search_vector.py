@@ -0,0 +1,51 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+# 只在 PostgreSQL 上创建的扩展和索引。GIN 索引不放进模型状态，
+# 否则 SQLite 重建 product 表时会尝试创建它们。
+# 标题的 trigram 索引建在 UPPER(title::text) 上，与 icontains 生成的 SQL 一致
+SEARCH_INDEX_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS product_search_vector_idx ON product USING gin (search_vector)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS product_title_trgm_idx ON product "
+    "USING gin ((UPPER(title::text)) gin_trgm_ops)",
+]
+DROP_SEARCH_INDEX_SQL = [
+    "DROP INDEX CONCURRENTLY IF EXISTS product_title_trgm_idx",
+    "DROP INDEX CONCURRENTLY IF EXISTS product_search_vector_idx",
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for sql in SEARCH_INDEX_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for sql in DROP_SEARCH_INDEX_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行。
+    # 已有商品的 search_vector 不在迁移中回填，迁移后执行
+    #     python manage.py rebuild_search_vectors --only-missing
+    # 分批更新，不长时间锁表（回填前这些商品仍能按标题子串搜索到）
+    atomic = False
+
+    dependencies = [
+        ('Product', '0004_seller_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-17 03:27
+
+from django.db import migrations, models
+
+from Product.operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行
+    atomic = False
+
+    dependencies = [
+        ('Product', '0005_product_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='collection',
+            index=models.Index(fields=['collecter', '-create_at'], name='collection_collecter_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(fields=['-created_at', '-product_id'], name='product_created_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(fields=['-visit_count', '-product_id'], name='product_visit_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(fields=['price', 'product_id'], name='product_price_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(fields=['-rating_avg', '-product_id'], name='product_rating_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(fields=['user_id', '-created_at', '-product_id'], name='product_user_created_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='productmedia',
+            index=models.Index(condition=models.Q(('is_main', True)), fields=['product'], name='product_media_main_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='productreview',
+            index=models.Index(fields=['product', '-created_at'], name='review_product_created_idx'),
+        ),
+    ]
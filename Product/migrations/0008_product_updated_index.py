@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 03:38
+
+from django.db import migrations, models
+
+from Product.operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行
+    atomic = False
+
+    dependencies = [
+        ('Product', '0007_product_version'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(fields=['updated_at', 'product_id'], name='product_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 03:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from Product.operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行
+    atomic = False
+
+    dependencies = [
+        ('Product', '0008_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVisitorSketch',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='visitor_sketch', serialize=False, to='Product.product')),
+                ('registers', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'product_visitor_sketch',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='unique_visitors',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='独立访客数（估计值）'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(fields=['-unique_visitors', '-product_id'], name='product_visitors_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+from Product.operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行
+    atomic = False
+
+    dependencies = [
+        ('Product', '0009_product_visitor_sketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='trending_score',
+            field=models.FloatField(default=0.0, editable=False, help_text='热度（log2，前向衰减）'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(fields=['-trending_score', '-product_id'], name='product_trending_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Product', '0010_product_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListCacheVersion',
+            fields=[
+                ('scope', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'product_list_cache_version',
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2 on 2026-10-17 04:07
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# 按热度排序时 NULL 排在最后（ORDER BY trending_score DESC NULLS LAST）。
+# PostgreSQL 的降序索引默认 NULLS FIRST，需要重建；SQLite 的降序本来就是 NULL 在后，模型中的索引即可使用，
+# 而且 SQLite 不支持在索引中写 NULLS LAST，因此只在 PostgreSQL 上重建
+TRENDING_INDEX_SQL = [
+    "DROP INDEX CONCURRENTLY IF EXISTS product_trending_idx",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS product_trending_idx ON product "
+    "(trending_score DESC NULLS LAST, product_id DESC)",
+]
+REVERSE_TRENDING_INDEX_SQL = [
+    "DROP INDEX CONCURRENTLY IF EXISTS product_trending_idx",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS product_trending_idx ON product "
+    "(trending_score DESC, product_id DESC)",
+]
+
+
+def rebuild_trending_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for sql in TRENDING_INDEX_SQL:
+        schema_editor.execute(sql)
+
+
+def restore_trending_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for sql in REVERSE_TRENDING_INDEX_SQL:
+        schema_editor.execute(sql)
+
+
+def clear_empty_scores(apps, schema_editor):
+    # 之前没有事件的商品保存为 0.0，改为 NULL；分批更新，不长时间锁表
+    Product = apps.get_model("Product", "Product")
+    while True:
+        batch = list(Product.objects.filter(trending_score=0.0).values_list("pk", flat=True)[:BATCH_SIZE])
+        if not batch:
+            return
+        Product.objects.filter(pk__in=batch, trending_score=0.0).update(trending_score=None)
+
+
+def restore_empty_scores(apps, schema_editor):
+    Product = apps.get_model("Product", "Product")
+    while True:
+        batch = list(Product.objects.filter(trending_score=None).values_list("pk", flat=True)[:BATCH_SIZE])
+        if not batch:
+            return
+        Product.objects.filter(pk__in=batch).update(trending_score=0.0)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行
+    atomic = False
+
+    dependencies = [
+        ('Product', '0011_list_cache_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='trending_score',
+            field=models.FloatField(default=None, editable=False, help_text='热度（log2，前向衰减），NULL 表示没有事件', null=True),
+        ),
+        migrations.RunPython(rebuild_trending_index, restore_trending_index),
+        migrations.RunPython(clear_empty_scores, restore_empty_scores),
+    ]
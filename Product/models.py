@@ -1,4 +1,8 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from minio_storage import MinioMediaStorage
 import uuid
 # Product数据表：Product, ProductMedia, Category, ProductReview, Collection
@@ -18,8 +22,16 @@ class Product(models.Model):
         status:  default=0 (0 = 上架, 1 = 下架)
         created_at: DateTimeField(not nessary)
         categories: model(related_name="products")
+        search_vector: 标题和描述的全文检索向量（PostgreSQL），由 Product.search 维护
+        version: 内容版本号（微秒时间戳，单调递增），商品及其图片、分类、评分变化时更新
+        updated_at: 内容最后修改时间
+        unique_visitors: 独立访客数，由 ProductVisitorSketch 估计
+        trending_score: 随时间衰减的热度（对数域），由 Product.trending 维护，NULL 表示还没有事件
     """
 
+    # 只修改这些字段不算内容变化，不更新版本号
+    UNVERSIONED_FIELDS = {"visit_count", "unique_visitors", "trending_score"}
+
     ON_SALE = 0
     OFF_SALE = 1
     SALED = 2
@@ -51,9 +63,57 @@ class Product(models.Model):
         max_digits=2, decimal_places=1, default=0.0, help_text="平均评分"
     )
     stock = models.PositiveIntegerField(default=1, help_text="库存数量")
+    search_vector = SearchVectorField(null=True, editable=False)
+    version = models.BigIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+    unique_visitors = models.PositiveIntegerField(default=0, editable=False, help_text="独立访客数（估计值）")
+    trending_score = models.FloatField(
+        null=True, default=None, editable=False, help_text="热度（log2，前向衰减），NULL 表示没有事件"
+    )
 
     class Meta:
         db_table = "product"
+        # 与列表接口的排序一一对应，末尾的 product_id 与查询中的次级排序一致
+        indexes = [
+            models.Index(fields=["-created_at", "-product_id"], name="product_created_idx"),
+            models.Index(fields=["-visit_count", "-product_id"], name="product_visit_idx"),
+            models.Index(fields=["price", "product_id"], name="product_price_idx"),
+            models.Index(fields=["-rating_avg", "-product_id"], name="product_rating_idx"),
+            models.Index(
+                fields=["user_id", "-created_at", "-product_id"], name="product_user_created_idx"
+            ),
+            # 导出接口按 updated_at 水位增量同步
+            models.Index(fields=["updated_at", "product_id"], name="product_updated_idx"),
+            models.Index(fields=["-unique_visitors", "-product_id"], name="product_visitors_idx"),
+            # 排序时没有事件（NULL）的商品排在最后，PostgreSQL 上的索引为 NULLS LAST（见迁移 0012）
+            models.Index(fields=["-trending_score", "-product_id"], name="product_trending_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or not set(update_fields) <= self.UNVERSIONED_FIELDS:
+            now = timezone.now()
+            self.version = max(self.version + 1, _version_at(now))
+            self.updated_at = now
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "version", "updated_at"}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def touch(cls, product_ids):
+        """图片、分类、评价等关联数据变化时更新商品的版本号（product_ids 可以是子查询）"""
+        now = timezone.now()
+        cls.objects.filter(pk__in=product_ids).update(
+            version=Greatest(
+                F("version") + 1, Value(_version_at(now), output_field=models.BigIntegerField())
+            ),
+            updated_at=now,
+        )
+
+
+def _version_at(moment):
+    # 使用微秒时间戳作为版本号，不同进程并发写入也不会得到相同的版本号
+    return int(moment.timestamp() * 1_000_000)
 
 
 class ProductMedia(models.Model):
@@ -81,6 +141,12 @@ class ProductMedia(models.Model):
     class Meta:
         db_table = "product_media"
         ordering = ["-is_main", "created_at"]  # 主图优先，然后按时间排序
+        indexes = [
+            # 只查主图时使用的部分索引
+            models.Index(
+                fields=["product"], condition=models.Q(is_main=True), name="product_media_main_idx"
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         # 如果设置为主图，则将该产品的其他图片设为非主图
@@ -91,6 +157,27 @@ class ProductMedia(models.Model):
         super().save(*args, **kwargs)
 
 
+class ProductVisitorSketch(models.Model):
+    """ProductVisitorSketch
+
+    商品访客的 HyperLogLog sketch（见 Product.hll），每个商品固定 4KB，不保存访客本身
+
+    Attributes:
+        product: primary_key，对应的商品
+        registers: HyperLogLog 寄存器
+        updated_at: 最后合并时间
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="visitor_sketch"
+    )
+    registers = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "product_visitor_sketch"
+
+
 class Category(models.Model):
     """Category
 
@@ -129,6 +216,9 @@ class ProductReview(models.Model):
 
     class Meta:
         db_table = "product_review"
+        indexes = [
+            models.Index(fields=["product", "-created_at"], name="review_product_created_idx"),
+        ]
 
 
 class Collection(models.Model):
@@ -149,3 +239,60 @@ class Collection(models.Model):
     class Meta:
         db_table = "collection"
         unique_together = ("collection", "collecter")
+        indexes = [
+            models.Index(fields=["collecter", "-create_at"], name="collection_collecter_idx"),
+        ]
+
+
+class SellerSnapshot(models.Model):
+    """SellerSnapshot
+
+    用户服务中用户信息的本地只读副本，由用户变更事件维护，
+    序列化商品时直接读取，不再请求用户服务
+
+    Attributes:
+        user_id: primary_key，对应用户服务的用户ID
+        username: CharField
+        avatar: 头像地址
+        email: 邮箱
+        address: 地址
+        status: 0=正常, 1=封禁
+        privilege: 权限级别
+        version: 事件版本号（毫秒时间戳），用于丢弃乱序到达的旧事件
+        updated_at: 本地更新时间
+    """
+
+    user_id = models.UUIDField(primary_key=True)
+    username = models.CharField(max_length=150)
+    avatar = models.CharField(max_length=500, null=True, blank=True)
+    email = models.CharField(max_length=254, null=True, blank=True)
+    address = models.CharField(max_length=255, null=True, blank=True)
+    status = models.SmallIntegerField(default=0)
+    privilege = models.SmallIntegerField(default=0)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "seller_snapshot"
+        indexes = [
+            # 按卖家状态过滤商品时先定位非正常状态的少量卖家
+            models.Index(fields=["status", "user_id"], name="seller_status_idx"),
+        ]
+
+
+class ListCacheVersion(models.Model):
+    """ListCacheVersion
+
+    商品列表缓存的版本号（见 Product.cache），保存在数据库中，所有副本读取同一份版本号，
+    任一副本写入后其他副本的缓存和 ETag 同时失效
+
+    Attributes:
+        scope: primary_key，"global" 或 "category:<category_id>"
+        version: 版本号，写入时递增
+    """
+
+    scope = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField()
+
+    class Meta:
+        db_table = "product_list_cache_version"
@@ -1,15 +1,346 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import datetime
+import decimal
+import json
+import uuid
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import F, OrderBy, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CursorResultsSetPagination(BasePagination):
+    """
+    游标（keyset）分页
+
+    按查询集的排序字段加上唯一主键定位下一页，不执行 COUNT 和 OFFSET，
+    任意深度的翻页耗时相同，翻页期间插入新数据也不会出现重复或遗漏。
+    游标中保存当前页边界行的排序字段值，格式为 base64 编码的 JSON。
+    排序字段可以是字符串，也可以是指定了 NULL 位置的 F(...).asc()/desc()，后者的值可以为 NULL。
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "无效的游标"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        查询集的排序字段，末尾补上主键作为唯一的次级排序
+
+        指定了 NULL 位置的字段转换为字符串形式，NULL 是否排在最后记入 self.nulls_last
+        """
+        self.nulls_last = {}
+        ordering = []
+        for field in queryset.query.order_by:
+            if isinstance(field, OrderBy) and isinstance(field.expression, F):
+                name = field.expression.name
+                if field.nulls_first or field.nulls_last:
+                    self.nulls_last[name] = bool(field.nulls_last)
+                field = ("-" if field.descending else "") + name
+            if isinstance(field, str):
+                ordering.append(field)
+        ordering = ordering or ["-" + queryset.model._meta.pk.name]
+        pk_name = queryset.model._meta.pk.name
+        if ordering[-1].lstrip("-") not in (pk_name, "pk"):
+            descending = ordering[-1].startswith("-")
+            ordering.append(("-" if descending else "") + pk_name)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.annotations = queryset.query.annotations
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor["r"])
+        ordering = self._reversed(self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*self._order_by(ordering))
+        if cursor:
+            queryset = queryset.filter(self._seek_filter(ordering, cursor["v"]))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        # 向后翻页时一定存在下一页；从游标开始的正向翻页一定存在上一页
+        if self.reverse:
+            has_next, has_previous = cursor is not None, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+        self.next_cursor = self._cursor_for(results[-1], False) if has_next and results else None
+        self.previous_cursor = self._cursor_for(results[0], True) if has_previous and results else None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "links": {
+                    "next": self.get_next_link(),
+                    "previous": self.get_previous_link(),
+                },
+                "results": data,
+            }
+        )
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.base_url, "page")
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    @staticmethod
+    def _reversed(ordering):
+        return [field[1:] if field.startswith("-") else "-" + field for field in ordering]
+
+    def _is_nulls_last(self, name):
+        """NULL 在当前翻页方向上是否排在最后，反向翻页时 NULL 的位置也反过来"""
+        return self.nulls_last[name] != self.reverse
+
+    def _order_by(self, ordering):
+        expressions = []
+        for field in ordering:
+            name = field.lstrip("-")
+            if name not in self.nulls_last:
+                expressions.append(field)
+                continue
+            expression = F(name).desc if field.startswith("-") else F(name).asc
+            if self._is_nulls_last(name):
+                expressions.append(expression(nulls_last=True))
+            else:
+                expressions.append(expression(nulls_first=True))
+        return expressions
+
+    def _field(self, name):
+        """排序字段对应的模型字段；按注解（如搜索相关度）排序时返回注解的输出字段"""
+        name = name.lstrip("-")
+        if name in self.annotations:
+            return self.annotations[name].output_field
+        if name == "pk":
+            return self.model._meta.pk
+        return self.model._meta.get_field(name)
+
+    def _attname(self, name):
+        name = name.lstrip("-")
+        if name in self.annotations:
+            return name
+        return self._field(name).attname
+
+    def _seek_filter(self, ordering, values):
+        """
+        构造 (a, b, pk) 严格位于游标之后的条件：
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND pk > z)，方向随排序字段取反
+
+        指定了 NULL 位置的字段：NULL 排在最后时，非 NULL 值之后还有全部 NULL，NULL 之后没有其他值；
+        NULL 排在最前时，NULL 之后是全部非 NULL 值
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = self._attname(field)
+            lookup = "lt" if field.startswith("-") else "gt"
+            after = Q(**{f"{name}__{lookup}": value})
+            same = Q(**{name: value})
+            if field.lstrip("-") in self.nulls_last:
+                nulls_last = self._is_nulls_last(field.lstrip("-"))
+                if value is None:
+                    after = None if nulls_last else Q(**{f"{name}__isnull": False})
+                    same = Q(**{f"{name}__isnull": True})
+                elif nulls_last:
+                    after |= Q(**{f"{name}__isnull": True})
+            if after is not None:
+                condition |= equal & after
+            equal &= same
+        return condition
+
+    def _cursor_for(self, obj, reverse):
+        values = [
+            _encode_value(_value(obj, self._attname(field))) for field in self.ordering
+        ]
+        payload = json.dumps({"v": values, "r": int(reverse)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padding = "=" * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(encoded + padding))
+            values = payload["v"]
+            if len(values) != len(self.ordering):
+                raise ValueError("cursor does not match ordering")
+            return {
+                "v": [
+                    self._field(field).to_python(value)
+                    for field, value in zip(self.ordering, values)
+                ],
+                "r": bool(payload.get("r")),
+            }
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+
+def _value(obj, name):
+    """读取模型对象或 values() 字典行中的值"""
+    return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+
+def _encode_value(value):
+    """游标中的值保持完整精度（时间保留微秒）"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def estimate_count(queryset):
+    """
+    用 PostgreSQL 的统计信息估算查询集的行数，无法估算时返回 None
+
+    没有过滤条件时读取 pg_class.reltuples，否则读取 EXPLAIN 的行数估计
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+
+    query = queryset.order_by().query
+    with connection.cursor() as cursor:
+        if not query.where and not query.distinct:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # 从未 ANALYZE 过的表 reltuples 为 -1
+            return row[0] if row and row[0] >= 0 else None
+
+        sql, params = query.sql_with_params()
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedPage(Page):
+    """估算总数时按是否取到多余的一行判断有没有下一页"""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    总数使用估算值的分页器
+
+    估算值小于阈值（PAGINATION_EXACT_COUNT_THRESHOLD，默认1000）或无法估算时执行精确的 COUNT，
+    count_exact 表示 count 是否为精确值。估算值不准确，因此页码不受估算的总页数限制。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_exact = True
+        self.exact_count_threshold = getattr(settings, "PAGINATION_EXACT_COUNT_THRESHOLD", 1000)
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.exact_count_threshold:
+            self.count_exact = True
+            return self.object_list.count()
+        self.count_exact = False
+        return estimate
+
+    def validate_number(self, number):
+        if self.count_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return super().validate_number(number)
+        if number < 1:
+            return super().validate_number(number)
+        return number
+
+    def page(self, number):
+        self.count  # 先确定是否为精确值
+        if self.count_exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_next = len(object_list) > self.per_page
+        return EstimatedPage(object_list[: self.per_page], number, self, has_next)
 
 
 class StandardResultsSetPagination(PageNumberPagination):
-    """默认每页20个，最多100个"""
+    """
+    默认每页20个，最多100个
+
+    请求带 cursor 参数或 pagination=cursor 时改用游标分页，
+    返回结果中没有 count/total_pages，通过 links 翻页；
+    请求带 count=estimate 时 count/total_pages 使用估算值，count_exact 标记是否精确
+    """
 
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
+    mode_query_param = "pagination"
+    count_query_param = "count"
+    cursor_pagination_class = CursorResultsSetPagination
+    estimated_paginator_class = EstimatedCountPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        if request.query_params.get(self.count_query_param) == "estimate":
+            self.django_paginator_class = self.estimated_paginator_class
+        return super().paginate_queryset(queryset, request, view)
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.cursor_pagination_class.cursor_query_param in request.query_params
+        )
 
     def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
         return Response(
             {
                 "links": {
@@ -19,6 +350,7 @@ class StandardResultsSetPagination(PageNumberPagination):
                 "count": self.page.paginator.count if self.page else 0,
                 "total_pages": self.page.paginator.num_pages if self.page else 0,
                 "current_page": self.page.number if self.page else 0,
+                "count_exact": getattr(self.page.paginator, "count_exact", True) if self.page else True,
                 "results": data,
             }
         )
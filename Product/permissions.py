@@ -0,0 +1,25 @@
+"""
+内部接口的权限
+"""
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+USER_EVENT_TOKEN_HEADER = "X-User-Event-Token"
+
+
+class HasUserEventToken(BasePermission):
+    """
+    用户变更事件接口只接受携带共享密钥的请求
+    密钥由 USER_EVENT_TOKEN 配置，与用户服务共享；未配置时拒绝所有请求
+    """
+
+    message = "缺少或错误的事件密钥"
+
+    def has_permission(self, request, view):
+        expected = getattr(settings, "USER_EVENT_TOKEN", "")
+        if not expected:
+            return False
+        token = request.headers.get(USER_EVENT_TOKEN_HEADER, "")
+        return hmac.compare_digest(token.encode(), expected.encode())
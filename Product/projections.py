@@ -0,0 +1,122 @@
+"""
+商品数据的投影（稀疏字段集）
+?view=card 返回列表卡片需要的字段（标题、价格、状态、主图、卖家名称），
+?fields=a,b,c 指定返回的字段，可以与 view 组合（字段由 fields 决定，图片和卖家信息的裁剪由 view 决定）。
+
+投影同时决定查询的内容：不返回的列不查询（例如 description），
+不返回分类或图片时不查询对应的表，卡片视图只查询主图。
+只对 GET/HEAD 请求生效，写入请求始终使用完整的序列化器。
+"""
+import hashlib
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+PROJECTION_CONTEXT_KEY = "product_projection"
+FIELDS_QUERY_PARAM = "fields"
+VIEW_QUERY_PARAM = "view"
+# 不对应 product 表中的列、需要单独获取的字段
+RELATED_FIELDS = frozenset({"user_info", "categories", "media"})
+
+
+class ProductProjection:
+    """
+    Args:
+        fields: 返回的字段，None 表示全部
+        main_media_only: 只返回主图
+        user_info_fields: user_info 中保留的键，None 表示全部
+    """
+
+    def __init__(self, fields=None, main_media_only=False, user_info_fields=None):
+        self.fields = frozenset(fields) if fields is not None else None
+        self.main_media_only = main_media_only
+        self.user_info_fields = tuple(user_info_fields) if user_info_fields is not None else None
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def columns(self):
+        """需要查询的 product 表的列，None 表示全部"""
+        if self.fields is None:
+            return None
+        return ["product_id", "user_id", *sorted(self.fields - RELATED_FIELDS)]
+
+    def etag_suffix(self):
+        """区分不同投影的 ETag 后缀，完整数据返回空字符串"""
+        if self.fields is None and not self.main_media_only and self.user_info_fields is None:
+            return ""
+        key = "|".join([
+            "*" if self.fields is None else ",".join(sorted(self.fields)),
+            "main" if self.main_media_only else "all",
+            "*" if self.user_info_fields is None else ",".join(self.user_info_fields),
+        ])
+        return hashlib.md5(key.encode()).hexdigest()[:12]
+
+    def project_user_info(self, user_info):
+        if self.user_info_fields is None or user_info is None:
+            return user_info
+        return {name: user_info.get(name) for name in self.user_info_fields}
+
+
+FULL_PROJECTION = ProductProjection()
+
+PRODUCT_VIEWS = {
+    "full": FULL_PROJECTION,
+    "card": ProductProjection(
+        fields=["product_id", "user_info", "title", "price", "status", "media"],
+        main_media_only=True,
+        user_info_fields=["user_id", "username"],
+    ),
+}
+
+
+def parse_projection(query_params, allowed_fields):
+    """
+    从查询参数解析投影，视图或字段名未知时抛出 ValidationError（400）
+    """
+    view = query_params.get(VIEW_QUERY_PARAM) or "full"
+    if view not in PRODUCT_VIEWS:
+        raise ValidationError({VIEW_QUERY_PARAM: [f"未知的视图: {view}"]})
+    projection = PRODUCT_VIEWS[view]
+
+    value = query_params.get(FIELDS_QUERY_PARAM)
+    if not value:
+        return projection
+    fields = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in allowed_fields]
+    if unknown:
+        raise ValidationError({FIELDS_QUERY_PARAM: [f"未知字段: {', '.join(unknown)}"]})
+    return ProductProjection(fields, projection.main_media_only, projection.user_info_fields)
+
+
+def get_projection(context):
+    """序列化上下文中的投影，没有时返回 None"""
+    return context.get(PROJECTION_CONTEXT_KEY)
+
+
+def project_user_info(context, user_info):
+    projection = get_projection(context)
+    return user_info if projection is None else projection.project_user_info(user_info)
+
+
+class ProductProjectionMixin:
+    """为商品视图解析 ?fields= / ?view=，并放入序列化上下文"""
+
+    # 投影生效的请求方法
+    projection_methods = SAFE_METHODS
+
+    def get_projection(self):
+        if not hasattr(self, "_projection"):
+            request = getattr(self, "request", None)
+            if request is None or request.method not in self.projection_methods:
+                self._projection = FULL_PROJECTION
+            else:
+                self._projection = parse_projection(
+                    request.query_params, self.get_serializer_class().Meta.fields
+                )
+        return self._projection
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context[PROJECTION_CONTEXT_KEY] = self.get_projection()
+        return context
@@ -0,0 +1,82 @@
+"""
+商品列表查询构建
+统一处理 sort_by 排序，并为序列化需要的分类和图片添加预取，
+使每页的查询次数与每页条数无关
+"""
+from django.db.models import F, OrderBy, Prefetch
+
+from .models import Product, Category, ProductMedia
+
+# sort_by 与排序字段的对应关系，最后一个字段为唯一的 product_id，保证排序稳定
+# 可以为 NULL 的字段显式指定 NULL 的位置，各数据库的结果一致（游标分页也支持）
+PRODUCT_ORDERINGS = {
+    "0": ("-created_at", "-product_id"),  # 按创建时间倒序
+    "1": ("-visit_count", "-product_id"),  # 按热度倒序
+    "2": ("price", "product_id"),  # 按价格升序
+    "3": ("-price", "-product_id"),  # 按价格降序
+    "4": ("-rating_avg", "-product_id"),  # 按评分倒序
+    "5": ("-unique_visitors", "-product_id"),  # 按独立访客数倒序
+    "6": (F("trending_score").desc(nulls_last=True), "-product_id"),  # 按近期热度倒序，没有事件的排在最后
+}
+DEFAULT_SORT_BY = "0"
+
+
+def get_product_ordering(sort_by=None):
+    """返回 sort_by 对应的排序字段，未知的 sort_by 按创建时间倒序"""
+    return PRODUCT_ORDERINGS.get(sort_by, PRODUCT_ORDERINGS[DEFAULT_SORT_BY])
+
+
+def product_prefetches(prefix="", projection=None):
+    """
+    ProductSerializer 需要的关联数据预取
+
+    Args:
+        prefix: 从其他模型预取商品关联数据时的路径前缀，例如 "collection__"
+        projection: 请求的投影，不返回的关联数据不预取，卡片视图只预取主图
+    """
+    prefetches = []
+    if projection is None or projection.includes("categories"):
+        prefetches.append(
+            Prefetch(
+                f"{prefix}categories",
+                queryset=Category.objects.only("category_id", "name"),
+            )
+        )
+    if projection is None or projection.includes("media"):
+        media = ProductMedia.objects.only(
+            "media_id", "product_id", "media", "is_main", "created_at"
+        )
+        if projection is not None and projection.main_media_only:
+            media = media.filter(is_main=True)
+        prefetches.append(Prefetch(f"{prefix}media", queryset=media))
+    return prefetches
+
+
+def ordering_columns(queryset):
+    """查询集按哪些列排序（不含注解），投影裁剪列时需要保留，分页时要读取"""
+    annotations = queryset.query.annotations
+    columns = []
+    for field in queryset.query.order_by:
+        if isinstance(field, OrderBy) and isinstance(field.expression, F):
+            field = field.expression.name
+        if isinstance(field, str) and field.lstrip("-") not in annotations:
+            columns.append(field.lstrip("-"))
+    return columns
+
+
+def build_product_queryset(sort_by=None, queryset=None, projection=None):
+    """
+    构建商品列表查询
+
+    Args:
+        sort_by: 请求中的 sort_by 参数
+        queryset: 已经过滤的商品查询，默认全部商品
+        projection: 请求的投影，只查询投影需要的列和关联数据
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    queryset = queryset.order_by(*get_product_ordering(sort_by))
+    columns = projection.columns() if projection is not None else None
+    if columns is not None:
+        queryset = queryset.only(*columns, *ordering_columns(queryset))
+    return queryset.prefetch_related(*product_prefetches(projection=projection))
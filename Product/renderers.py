@@ -0,0 +1,35 @@
+"""
+JSON 渲染器
+使用 orjson 编码，输出与 rest_framework.renderers.JSONRenderer 逐字节相同；
+未安装 orjson、请求缩进输出或数据中有 orjson 不支持的类型时退回到 JSONRenderer。
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 是可选依赖
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """orjson 版本的 JSONRenderer"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        encoder = self.encoder_class()
+        try:
+            ret = orjson.dumps(
+                data,
+                default=encoder.default,
+                # 时间交给 DRF 的编码器处理（UTC 输出为 Z 结尾）
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except (orjson.JSONEncodeError, TypeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # 与 JSONRenderer 一样转义 \u2028 和 \u2029
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
@@ -0,0 +1,146 @@
+"""
+商品搜索
+PostgreSQL 下使用维护在 product.search_vector 上的全文索引（GIN）检索标题和描述，
+标题另有 pg_trgm 索引支持子串匹配；其他数据库退回到 icontains。
+
+中文没有空格分词，写入和查询时都把连续的中日韩字符切成相邻二元组（bigram），
+其他文字按单词处理，再交给 'simple' 配置生成 tsvector/tsquery。
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+
+# 按二元组切分的字符：中日韩统一表意文字、假名、谚文
+CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+TOKEN_RE = re.compile(rf"([{CJK_CHARS}]+)|((?:(?![{CJK_CHARS}])[^\W_])+)")
+
+SEARCH_CONFIG = "simple"
+UPDATE_BATCH_SIZE = 1000
+
+
+def cjk_bigrams(run):
+    """把一段连续的中日韩字符切成相邻二元组，单个字符原样返回"""
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text):
+    """
+    切分文本
+
+    Returns:
+        list: [(token, is_cjk_single)]，is_cjk_single 表示单个中日韩字符
+    """
+    tokens = []
+    for cjk, word in TOKEN_RE.findall(text or ""):
+        if cjk:
+            tokens.extend((token, len(cjk) == 1) for token in cjk_bigrams(cjk))
+        else:
+            tokens.append((word.lower(), False))
+    return tokens
+
+
+def ngram_text(text):
+    """生成写入 tsvector 的文本：空格分隔的二元组和单词"""
+    return " ".join(token for token, _ in tokenize(text))
+
+
+def tsquery_text(value):
+    """
+    把搜索词转换成 raw 格式的 tsquery 文本，所有词元都要匹配
+
+    单词和单个汉字按前缀匹配（与 icontains 的行为接近），二元组精确匹配。
+    搜索词中没有可用的词元时返回空字符串。
+    """
+    terms = []
+    for token, is_single in tokenize(value):
+        prefix = is_single or not _is_cjk(token)
+        terms.append(f"'{token}'" + (":*" if prefix else ""))
+    return " & ".join(dict.fromkeys(terms))
+
+
+def build_search_query(value):
+    """搜索词对应的 SearchQuery，没有可用的词元时返回 None"""
+    text = tsquery_text(value)
+    if not text:
+        return None
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type="raw")
+
+
+def _is_cjk(token):
+    return bool(re.match(rf"[{CJK_CHARS}]", token))
+
+
+def full_text_enabled(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def search_products(queryset, value):
+    """
+    按关键词过滤商品
+
+    PostgreSQL 下匹配全文索引或标题子串（trigram 索引），并标注相关度 search_rank；
+    其他数据库在标题和描述上执行 icontains。
+    """
+    if not full_text_enabled(queryset.db):
+        return queryset.filter(Q(title__icontains=value) | Q(description__icontains=value))
+
+    query = build_search_query(value)
+    if query is None:
+        return queryset.filter(title__icontains=value)
+    return queryset.filter(Q(search_vector=query) | Q(title__icontains=value)).annotate(
+        search_rank=SearchRank(F("search_vector"), query)
+    )
+
+
+_UPDATE_SQL = """
+    UPDATE product AS p
+    SET search_vector = setweight(to_tsvector('{config}', v.title), 'A')
+                     || setweight(to_tsvector('{config}', v.description), 'B')
+    FROM (VALUES {values}) AS v(product_id, title, description)
+    WHERE p.product_id = v.product_id
+"""
+
+
+def update_search_vectors(rows, using="default"):
+    """
+    批量更新 search_vector
+
+    Args:
+        rows: 可迭代的 (product_id, title, description)
+
+    Returns:
+        int: 更新的行数，非 PostgreSQL 时为 0
+    """
+    if not full_text_enabled(using):
+        return 0
+
+    updated = 0
+    batch = []
+    with connections[using].cursor() as cursor:
+        for product_id, title, description in rows:
+            batch.append((str(product_id), ngram_text(title), ngram_text(description)))
+            if len(batch) >= UPDATE_BATCH_SIZE:
+                updated += _execute_update(cursor, batch)
+                batch = []
+        if batch:
+            updated += _execute_update(cursor, batch)
+    return updated
+
+
+def _execute_update(cursor, batch):
+    values = ", ".join(["(%s::uuid, %s, %s)"] * len(batch))
+    params = [value for row in batch for value in row]
+    cursor.execute(_UPDATE_SQL.format(config=SEARCH_CONFIG, values=values), params)
+    return cursor.rowcount
+
+
+def rebuild_search_vectors(queryset):
+    """重建查询集中所有商品的 search_vector"""
+    rows = queryset.values_list("product_id", "title", "description").iterator(
+        chunk_size=UPDATE_BATCH_SIZE
+    )
+    return update_search_vectors(rows, using=queryset.db)
@@ -0,0 +1,187 @@
+"""
+本地卖家目录
+维护 SellerSnapshot（用户信息的本地副本）：消费用户服务发出的用户变更事件，
+以及批量写入回填/回源得到的用户信息
+"""
+import logging
+import time
+import uuid
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import cache
+from .models import Product, SellerSnapshot
+
+logger = logging.getLogger(__name__)
+
+# 快照中保存的用户字段
+SNAPSHOT_FIELDS = ("username", "avatar", "email", "address", "status", "privilege")
+
+USER_CREATED = "user.created"
+USER_UPDATED = "user.updated"
+USER_DELETED = "user.deleted"
+EVENT_TYPES = (USER_CREATED, USER_UPDATED, USER_DELETED)
+
+
+def snapshot_version():
+    """当前时间对应的快照版本号（毫秒时间戳），与用户服务事件的版本号可比较"""
+    return int(time.time() * 1000)
+
+
+def _snapshot_values(user_info):
+    """从用户服务返回的数据中提取快照字段"""
+    return {
+        "username": user_info.get("username") or "Unknown User",
+        "avatar": user_info.get("avatar"),
+        "email": user_info.get("email"),
+        "address": user_info.get("address"),
+        "status": user_info.get("status") or 0,
+        "privilege": user_info.get("privilege") or 0,
+    }
+
+
+def snapshot_to_user_info(snapshot):
+    """把快照转换成 get_user_info 的返回结构"""
+    return {
+        "user_id": str(snapshot.user_id),
+        "username": snapshot.username,
+        "avatar": snapshot.avatar,
+        "email": snapshot.email,
+        "status": snapshot.status,
+        "privilege": snapshot.privilege,
+        "address": snapshot.address,
+    }
+
+
+def invalidate_seller_lists(user_ids):
+    """
+    卖家快照变化后使列表缓存失效（事务提交后执行）
+    商品数据中包含卖家信息，user_status 过滤也依赖快照：全局列表（包括分面统计）
+    和这些卖家的商品所属分类的列表失效
+    """
+    category_ids = list(
+        Product.categories.through.objects.filter(product__user_id__in=list(user_ids))
+        .values_list("category_id", flat=True)
+        .distinct()
+    )
+    transaction.on_commit(lambda: cache.bump_product(category_ids))
+
+
+def get_snapshots(user_ids):
+    """
+    批量读取本地快照
+
+    Returns:
+        dict: {str(user_id): 用户信息字典}，没有快照的用户不在结果中
+    """
+    return {
+        str(snapshot.user_id): snapshot_to_user_info(snapshot)
+        for snapshot in SellerSnapshot.objects.filter(user_id__in=list(user_ids))
+    }
+
+
+def apply_user_event(event):
+    """
+    应用一条用户变更事件
+
+    事件格式::
+
+        {
+            "event": "user.created" | "user.updated" | "user.deleted",
+            "user_id": "<uuid>",
+            "version": 1700000000000,   # 用户服务侧的更新时间（毫秒），可选
+            "data": {"username": ..., "avatar": ..., "status": ..., ...}
+        }
+
+    只有版本号不小于本地快照时才会生效，乱序到达的旧事件会被忽略。
+
+    Returns:
+        bool: 事件是否生效
+    """
+    event_type = event.get("event")
+    user_id = event.get("user_id")
+    if event_type not in EVENT_TYPES or not user_id:
+        raise ValueError(f"Invalid user event: {event}")
+    user_id = uuid.UUID(str(user_id))
+    version = int(event.get("version") or snapshot_version())
+
+    if event_type == USER_DELETED:
+        deleted, _ = SellerSnapshot.objects.filter(
+            user_id=user_id, version__lte=version
+        ).delete()
+        applied = deleted > 0
+    else:
+        applied = _apply_snapshot(user_id, version, _snapshot_values(event.get("data") or {}))
+
+    if applied:
+        invalidate_seller_lists([user_id])
+    return applied
+
+
+def _apply_snapshot(user_id, version, values):
+    """版本号不小于本地快照时写入，返回是否写入"""
+    with transaction.atomic():
+        updated = SellerSnapshot.objects.filter(
+            user_id=user_id, version__lte=version
+        ).update(version=version, updated_at=timezone.now(), **values)
+        if updated:
+            return True
+        if SellerSnapshot.objects.filter(user_id=user_id).exists():
+            # 本地已有更新的版本
+            return False
+        try:
+            with transaction.atomic():
+                SellerSnapshot.objects.create(user_id=user_id, version=version, **values)
+        except IntegrityError:
+            # 并发写入，交给之后的事件覆盖
+            return False
+    return True
+
+
+def upsert_snapshots(user_infos, version=None):
+    """
+    批量写入从用户服务获取的用户信息
+
+    回源时（version 为 None）数据可能来自用户服务客户端的缓存，不能确定有多新：
+    只插入本地还没有的快照，版本号记为0，之后到达的任何事件都会覆盖它，已有的快照不覆盖。
+    回填时 version 为开始获取数据的时间：插入缺少的快照，已有的快照只在版本更旧时覆盖，
+    不会覆盖已经应用的更新事件。
+
+    Args:
+        user_infos: {user_id: 用户服务返回的数据}，值为 None 的条目会被跳过
+        version: 数据的版本号（毫秒时间戳）
+
+    Returns:
+        int: 写入的条数
+    """
+    values = {
+        uuid.UUID(str(user_id)): _snapshot_values(user_info)
+        for user_id, user_info in user_infos.items()
+        if user_info
+    }
+    if not values:
+        return 0
+
+    with transaction.atomic():
+        existing = set(
+            SellerSnapshot.objects.filter(user_id__in=list(values)).values_list("user_id", flat=True)
+        )
+        created = [
+            SellerSnapshot(user_id=user_id, version=version or 0, **user_values)
+            for user_id, user_values in values.items()
+            if user_id not in existing
+        ]
+        # 并发插入同一用户时保留先写入的快照
+        SellerSnapshot.objects.bulk_create(created, ignore_conflicts=True)
+        changed = [snapshot.user_id for snapshot in created]
+        if version is not None:
+            now = timezone.now()
+            for user_id in sorted(existing):
+                if SellerSnapshot.objects.filter(user_id=user_id, version__lt=version).update(
+                    version=version, updated_at=now, **values[user_id]
+                ):
+                    changed.append(user_id)
+        if changed:
+            invalidate_seller_lists(changed)
+    return len(changed)
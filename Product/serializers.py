@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.db import models
 from rest_framework import serializers
 from .models import (
     Product,
@@ -6,7 +8,54 @@ from .models import (
     Collection,
     ProductMedia,
 )
-from .user_utils import get_user_info
+from .projections import get_projection, project_user_info
+from .user_utils import get_user_info, get_users_info
+
+# 序列化上下文中缓存整页用户信息的键
+USER_INFO_CONTEXT_KEY = "user_info_map"
+
+
+def prefetch_user_info(context, user_ids):
+    """批量获取尚未缓存的用户信息并写入序列化上下文"""
+    user_info_map = context.setdefault(USER_INFO_CONTEXT_KEY, {})
+    missing = [
+        user_id for user_id in user_ids if user_id and str(user_id) not in user_info_map
+    ]
+    if missing:
+        user_info_map.update(get_users_info(missing))
+    return user_info_map
+
+
+class UserInfoListSerializer(serializers.ListSerializer):
+    """
+    列表序列化器：先收集整页数据中不同的用户ID并批量获取用户信息，
+    再逐行序列化，避免每一行都单独请求一次用户服务
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        items = list(iterable)
+
+        user_ids = set()
+        for item in items:
+            user_ids.update(self.child.get_prefetch_user_ids(item))
+        prefetch_user_info(self.context, user_ids)
+
+        return super().to_representation(items)
+
+
+class UserInfoMixin:
+    """从序列化上下文中读取批量获取的用户信息，未命中时单独请求"""
+
+    def get_prefetch_user_ids(self, obj):
+        """返回该对象序列化时需要的用户ID"""
+        return [obj.user_id]
+
+    def resolve_user_info(self, user_id):
+        user_info_map = self.context.get(USER_INFO_CONTEXT_KEY)
+        if user_id and user_info_map is not None and str(user_id) in user_info_map:
+            return user_info_map[str(user_id)]
+        return get_user_info(user_id)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -21,7 +70,7 @@ class ProductMediaSerializer(serializers.ModelSerializer):
         fields = ["media_id", "media", "is_main", "created_at"]
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(UserInfoMixin, serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
     # 反向引用外键，需要使用related_name
     media = ProductMediaSerializer(many=True, read_only=True)
@@ -45,13 +94,29 @@ class ProductSerializer(serializers.ModelSerializer):
             "rating_avg",
             "stock",
         ]
+        list_serializer_class = UserInfoListSerializer
+
+    def get_fields(self):
+        # 请求指定了 ?fields= / ?view= 时只保留投影中的字段
+        fields = super().get_fields()
+        projection = get_projection(self.context)
+        if projection is not None and projection.fields is not None:
+            fields = {name: field for name, field in fields.items() if projection.includes(name)}
+        return fields
 
     def get_user_info(self, obj):
         """获取用户信息"""
-        return get_user_info(obj.user_id)
+        return project_user_info(self.context, self.resolve_user_info(obj.user_id))
+
+
+class ProductDetailSerializer(ProductSerializer):
+    """商品详情，另外返回独立访客数"""
+
+    class Meta(ProductSerializer.Meta):  # type: ignore
+        fields = ProductSerializer.Meta.fields + ["unique_visitors"]
 
 
-class ProductReviewSerializer(serializers.ModelSerializer):
+class ProductReviewSerializer(UserInfoMixin, serializers.ModelSerializer):
     product = serializers.PrimaryKeyRelatedField(read_only=True)
     # 用户信息字段，通过方法字段从用户服务获取
     user_info = serializers.SerializerMethodField()
@@ -66,13 +131,14 @@ class ProductReviewSerializer(serializers.ModelSerializer):
             "comment",
             "created_at",
         ]
+        list_serializer_class = UserInfoListSerializer
 
     def get_user_info(self, obj):
         """获取用户信息"""
-        return get_user_info(obj.user_id)
+        return self.resolve_user_info(obj.user_id)
 
 
-class CollectionSerializer(serializers.ModelSerializer):
+class CollectionSerializer(UserInfoMixin, serializers.ModelSerializer):
     collection = ProductSerializer(read_only=True)
     # 用户信息字段，通过方法字段从用户服务获取
     collecter_info = serializers.SerializerMethodField()
@@ -80,7 +146,26 @@ class CollectionSerializer(serializers.ModelSerializer):
     class Meta:  # type: ignore
         model = Collection
         fields = ["collection", "collecter_info", "create_at"]
+        list_serializer_class = UserInfoListSerializer
+
+    def get_prefetch_user_ids(self, obj):
+        # 收藏者和被收藏商品的卖家一起批量获取
+        return [obj.collecter, obj.collection.user_id]
 
     def get_collecter_info(self, obj):
         """获取收藏者信息"""
-        return get_user_info(obj.collecter)
+        return self.resolve_user_info(obj.collecter)
+
+
+class ProductBulkRequestSerializer(serializers.Serializer):
+    """批量获取商品的请求，ID数量上限由 PRODUCT_BULK_MAX_IDS 配置（默认100）"""
+
+    product_ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+
+    def validate_product_ids(self, value):
+        max_ids = getattr(settings, "PRODUCT_BULK_MAX_IDS", 100)
+        # 去重并保持请求中的顺序
+        value = list(dict.fromkeys(value))
+        if len(value) > max_ids:
+            raise serializers.ValidationError(f"最多一次获取{max_ids}个商品")
+        return value
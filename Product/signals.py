@@ -0,0 +1,134 @@
+"""
+商品模型信号
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import cache, trending
+from .models import Category, Collection, Product, ProductMedia, ProductReview
+from .search import update_search_vectors
+from .title_index import title_index
+
+# 修改后需要重建搜索向量的字段
+SEARCH_FIELDS = {"title", "description"}
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, using, update_fields=None, **kwargs):
+    """标题或描述变化后更新 search_vector（只修改访问量、库存等字段时跳过）"""
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    update_search_vectors(
+        [(instance.product_id, instance.title, instance.description)], using=using
+    )
+
+
+def _add_to_title_index(product_id, title):
+    if title_index.accepting_changes():
+        title_index.add(product_id, title)
+
+
+def _remove_from_title_index(product_id):
+    if title_index.accepting_changes():
+        title_index.remove(product_id)
+
+
+@receiver(post_save, sender=Product)
+def update_product_title_index(sender, instance, update_fields=None, **kwargs):
+    """
+    标题索引随标题变化增量更新
+    事务提交后再判断和更新：提交前的修改对构建索引时读取的数据不可见；提交时索引已构建或正在构建
+    （包括首次构建）则记录或重放，否则之后的构建一定会读到
+    """
+    if update_fields is not None and "title" not in update_fields:
+        return
+    product_id, title = instance.product_id, instance.title
+    transaction.on_commit(lambda: _add_to_title_index(product_id, title))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_title_index(sender, instance, **kwargs):
+    product_id = instance.product_id
+    transaction.on_commit(lambda: _remove_from_title_index(product_id))
+
+
+def _product_category_ids(product_id):
+    return list(
+        Product.categories.through.objects.filter(product_id=product_id).values_list(
+            "category_id", flat=True
+        )
+    )
+
+
+def _category_product_ids(category_id):
+    return Product.categories.through.objects.filter(category_id=category_id).values("product_id")
+
+
+def _bump_product_on_commit(product_id, category_ids=None):
+    """事务提交后再递增版本号，避免并发请求把提交前的数据缓存到新版本下"""
+    if category_ids is None:
+        category_ids = _product_category_ids(product_id)
+    transaction.on_commit(lambda: cache.bump_product(category_ids))
+
+
+@receiver(post_save, sender=Product)
+def invalidate_list_cache_on_product_save(sender, instance, update_fields=None, **kwargs):
+    # 只修改访问量时不使列表缓存失效（由 TTL 控制滞后）
+    if update_fields is not None and set(update_fields) <= Product.UNVERSIONED_FIELDS:
+        return
+    _bump_product_on_commit(instance.product_id)
+
+
+@receiver(pre_delete, sender=Product)
+def invalidate_list_cache_on_product_delete(sender, instance, **kwargs):
+    # 删除前记录分类，删除后关联行已不存在
+    _bump_product_on_commit(instance.product_id)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def product_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """商品分类变化：更新商品版本号，使相关分类的列表缓存失效"""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        # 从分类一侧修改：instance 是分类
+        category_ids = [instance.pk]
+        Product.touch(pk_set if pk_set is not None else _category_product_ids(instance.pk))
+    else:
+        category_ids = set(pk_set or ()) | set(_product_category_ids(instance.pk))
+        Product.touch([instance.pk])
+    transaction.on_commit(lambda: cache.bump_product(category_ids))
+
+
+@receiver(post_save, sender=ProductMedia)
+@receiver(post_delete, sender=ProductMedia)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def product_related_changed(sender, instance, **kwargs):
+    """图片或评价变化：更新商品版本号，使列表缓存失效"""
+    Product.touch([instance.product_id])
+    _bump_product_on_commit(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """分类名称包含在商品数据中：更新该分类下商品的版本号，使列表缓存失效"""
+    Product.touch(_category_product_ids(instance.pk))
+    category_ids = [instance.pk]
+    transaction.on_commit(lambda: cache.bump_product(category_ids))
+
+
+@receiver(post_save, sender=Collection)
+def add_collection_to_trending(sender, instance, created, **kwargs):
+    """新的收藏计入近期热度"""
+    if created:
+        trending.record_event(instance.collection_id, "collection")
+
+
+@receiver(post_save, sender=ProductReview)
+def add_review_to_trending(sender, instance, created, **kwargs):
+    """新的评价计入近期热度"""
+    if created:
+        trending.record_event(instance.product_id, "review")
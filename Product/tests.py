@@ -1,16 +1,35 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
-from .models import Product, Category, ProductReview, ProductMedia, Collection
+from django.core.management import call_command
+from django.db import connection
+from .models import Product, Category, ProductReview, ProductMedia, Collection, SellerSnapshot
 from PIL import Image
 import io
 from decimal import Decimal
+from unittest import skipUnless
 from unittest.mock import patch, Mock
 import uuid
 
 
+# 列表响应缓存在测试之间保留，而数据库在每个测试后回滚，
+# 除 ProductListCacheTest / ProductFacetTest 外关闭缓存，避免测试之间互相影响；
+# 访问量直接写入数据库，不启动后台写入线程
+_list_cache_override = override_settings(
+    PRODUCT_LIST_CACHE_TTL=0, PRODUCT_FACET_CACHE_TTL=0, PRODUCT_VISIT_FLUSH_SECONDS=0
+)
+
+
+def setUpModule():
+    _list_cache_override.enable()
+
+
+def tearDownModule():
+    _list_cache_override.disable()
+
+
 def create_test_image(name='test.jpg'):
     """创建测试图片"""
     # 创建一个测试用图片文件
@@ -780,3 +799,1505 @@ class CollectionAPITest(APITestCase):
         response = self.client.delete(url, **{'HTTP_UUID': self.test_user['user_id']})
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Collection.objects.count(), 0)
+
+
+class UserInfoPrefetchTest(APITestCase):
+    """测试列表序列化时批量获取用户信息"""
+
+    def setUp(self):
+        self.mock_user_service = MockUserService()
+        self.seller_ids = [self.mock_user_service.testuser_id, self.mock_user_service.otheruser_id]
+
+        # 两个卖家共发布6个商品
+        for i in range(6):
+            Product.objects.create(
+                user_id=self.seller_ids[i % 2],
+                title=f"商品{i}",
+                description=f"这是商品{i}的描述",
+                price=10 + i,
+            )
+
+        self.client = APIClient()
+
+    def _mock_batch_service(self, mock_user_service):
+        mock_user_service.get_users_by_ids.side_effect = lambda user_ids: {
+            str(user_id): self.mock_user_service.get_user_by_id(user_id) for user_id in user_ids
+        }
+
+    @patch('Product.user_utils.user_service')
+    def test_product_list_fetches_each_seller_once(self, mock_user_service):
+        """测试商品列表每个卖家只请求一次"""
+        self._mock_batch_service(mock_user_service)
+
+        response = self.client.get(reverse("product-list-create"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 6)
+
+        mock_user_service.get_users_by_ids.assert_called_once()
+        requested_ids = mock_user_service.get_users_by_ids.call_args[0][0]
+        self.assertCountEqual(requested_ids, self.seller_ids)
+        mock_user_service.get_user_by_id.assert_not_called()
+
+        usernames = {item['user_info']['username'] for item in response.data['results']}
+        self.assertEqual(usernames, {'testuser', 'otheruser'})
+
+    @patch('Product.user_utils.user_service')
+    def test_collection_list_batches_collecter_and_seller(self, mock_user_service):
+        """测试收藏列表同时批量获取收藏者和卖家信息"""
+        self._mock_batch_service(mock_user_service)
+        collecter_id = self.mock_user_service.admin_id
+        for product in Product.objects.all()[:3]:
+            Collection.objects.create(collection=product, collecter=collecter_id)
+
+        response = self.client.get(reverse("user-collections"), **{'HTTP_UUID': collecter_id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+
+        mock_user_service.get_users_by_ids.assert_called_once()
+        mock_user_service.get_user_by_id.assert_not_called()
+        self.assertEqual(response.data['results'][0]['collecter_info']['username'], 'admin')
+
+    @patch('Product.user_utils.user_service')
+    def test_unavailable_user_service_falls_back(self, mock_user_service):
+        """测试用户服务不可用时返回基本信息"""
+        mock_user_service.get_users_by_ids.return_value = {}
+
+        response = self.client.get(reverse("product-list-create"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for item in response.data['results']:
+            self.assertEqual(item['user_info']['username'], 'Unknown User')
+
+
+@override_settings(USER_EVENT_TOKEN="event-secret")
+class SellerDirectoryTest(APITestCase):
+    """测试本地卖家目录"""
+
+    def setUp(self):
+        self.mock_user_service = MockUserService()
+        self.seller_id = self.mock_user_service.testuser_id
+        self.product = Product.objects.create(
+            user_id=self.seller_id,
+            title="测试商品",
+            description="这是一个测试商品的描述",
+            price=99.99,
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_USER_EVENT_TOKEN="event-secret")
+        self.event_url = reverse("user-event")
+
+    def _event(self, event_type, version, **data):
+        return {"event": event_type, "user_id": self.seller_id, "version": version, "data": data}
+
+    def test_events_maintain_snapshot(self):
+        """测试用户事件创建、更新快照并忽略乱序的旧事件"""
+        response = self.client.post(
+            self.event_url, self._event("user.created", 100, username="seller", status=0), format="json"
+        )
+        self.assertEqual(response.data, {"applied": 1, "ignored": 0})
+
+        events = [
+            self._event("user.updated", 300, username="seller-new", status=1),
+            self._event("user.updated", 200, username="seller-old", status=0),
+        ]
+        response = self.client.post(self.event_url, events, format="json")
+        self.assertEqual(response.data, {"applied": 1, "ignored": 1})
+
+        snapshot = SellerSnapshot.objects.get(user_id=self.seller_id)
+        self.assertEqual(snapshot.username, "seller-new")
+        self.assertEqual(snapshot.status, 1)
+
+        self.client.post(self.event_url, self._event("user.deleted", 400), format="json")
+        self.assertFalse(SellerSnapshot.objects.filter(user_id=self.seller_id).exists())
+
+    def test_invalid_event_rejected(self):
+        """测试格式错误的事件返回400"""
+        response = self.client.post(self.event_url, {"event": "user.updated", "user_id": "x"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_event_requires_token(self):
+        """测试没有或带错误密钥的事件请求被拒绝，且不修改快照"""
+        event = self._event("user.created", 100, username="attacker", status=1)
+        self.client.credentials()
+        response = self.client.post(self.event_url, event, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_X_USER_EVENT_TOKEN="wrong")
+        response = self.client.post(self.event_url, event, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_X_USER_EVENT_TOKEN="event-secret")
+        with override_settings(USER_EVENT_TOKEN=""):
+            response = self.client.post(self.event_url, event, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(SellerSnapshot.objects.filter(user_id=self.seller_id).exists())
+
+    def test_upsert_does_not_override_newer_events(self):
+        """测试回源写入不覆盖已有快照，回填只覆盖版本更旧的快照"""
+        from .seller_directory import upsert_snapshots
+
+        self.client.post(
+            self.event_url, self._event("user.updated", 200, username="from-event", status=1), format="json"
+        )
+        stale = {self.seller_id: {"username": "from-cache", "status": 0}}
+
+        upsert_snapshots(stale)
+        upsert_snapshots(stale, version=100)
+        snapshot = SellerSnapshot.objects.get(user_id=self.seller_id)
+        self.assertEqual((snapshot.username, snapshot.version), ("from-event", 200))
+
+        self.assertEqual(upsert_snapshots({self.seller_id: {"username": "from-backfill"}}, version=300), 1)
+        self.assertEqual(SellerSnapshot.objects.get(user_id=self.seller_id).username, "from-backfill")
+
+        # 回源插入的快照版本为0，之后的事件总能覆盖
+        other_id = self.mock_user_service.admin_id
+        upsert_snapshots({other_id: {"username": "from-cache"}})
+        response = self.client.post(
+            self.event_url,
+            {"event": "user.updated", "user_id": other_id, "version": 1, "data": {"username": "renamed"}},
+            format="json",
+        )
+        self.assertEqual(response.data, {"applied": 1, "ignored": 0})
+
+    @patch('Product.user_utils.user_service')
+    def test_product_list_reads_snapshot_without_network(self, mock_user_service):
+        """测试有快照时序列化商品不请求用户服务"""
+        SellerSnapshot.objects.create(user_id=self.seller_id, username="local-seller")
+
+        response = self.client.get(reverse("product-list-create"))
+        self.assertEqual(response.data['results'][0]['user_info']['username'], "local-seller")
+        response = self.client.get(reverse("product-detail", kwargs={"product_id": self.product.product_id}))
+        self.assertEqual(response.data['user_info']['username'], "local-seller")
+
+        mock_user_service.get_users_by_ids.assert_not_called()
+        mock_user_service.get_user_by_id.assert_not_called()
+
+    @patch('Product.user_utils.user_service')
+    def test_remote_result_is_written_through(self, mock_user_service):
+        """测试回源得到的用户信息写入本地目录"""
+        mock_user_service.get_users_by_ids.side_effect = lambda user_ids: {
+            user_id: self.mock_user_service.get_user_by_id(user_id) for user_id in user_ids
+        }
+        self.client.get(reverse("product-list-create"))
+        self.client.get(reverse("product-list-create"))
+
+        mock_user_service.get_users_by_ids.assert_called_once()
+        self.assertEqual(SellerSnapshot.objects.get(user_id=self.seller_id).username, "testuser")
+
+    @patch('Product.management.commands.backfill_seller_snapshots.user_service')
+    def test_backfill_command(self, mock_user_service):
+        """测试批量回填命令"""
+        collecter_id = self.mock_user_service.admin_id
+        Collection.objects.create(collection=self.product, collecter=collecter_id)
+        mock_user_service.get_users_by_ids.side_effect = lambda user_ids: {
+            user_id: self.mock_user_service.get_user_by_id(user_id) for user_id in user_ids
+        }
+
+        call_command("backfill_seller_snapshots", stdout=io.StringIO())
+
+        self.assertEqual(
+            set(SellerSnapshot.objects.values_list("username", flat=True)), {"testuser", "admin"}
+        )
+
+
+class SellerStatusFilterTest(APITestCase):
+    """测试按卖家状态过滤商品"""
+
+    def setUp(self):
+        self.mock_user_service = MockUserService()
+        self.normal_id = self.mock_user_service.testuser_id
+        self.banned_id = self.mock_user_service.otheruser_id
+        self.unknown_id = self.mock_user_service.admin_id
+
+        SellerSnapshot.objects.create(user_id=self.normal_id, username="testuser", status=0)
+        SellerSnapshot.objects.create(user_id=self.banned_id, username="otheruser", status=1)
+        for user_id in (self.normal_id, self.banned_id, self.unknown_id):
+            Product.objects.create(
+                user_id=user_id, title="商品", description="描述", price=10
+            )
+        self.client = APIClient()
+
+    @patch('Product.user_utils.user_service')
+    def test_filter_normal_sellers(self, mock_user_service):
+        """测试 user_status=0 排除被封禁卖家的商品，且不请求用户服务"""
+        mock_user_service.get_users_by_ids.return_value = {}
+        response = self.client.get(reverse("product-list-create"), {"user_status": 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        seller_ids = {str(item['user_info']['user_id']) for item in response.data['results']}
+        self.assertEqual(seller_ids, {self.normal_id, self.unknown_id})
+        for call in mock_user_service.get_users_by_ids.call_args_list:
+            self.assertNotIn(self.banned_id, call[0][0])
+
+    def test_filter_banned_sellers(self):
+        """测试 user_status=1 只返回被封禁卖家的商品"""
+        response = self.client.get(reverse("product-list-create"), {"user_status": 1})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['user_info']['user_id'], self.banned_id)
+
+
+class ProductListQueryCountTest(APITestCase):
+    """测试商品列表每页的查询次数与每页条数无关"""
+
+    def setUp(self):
+        self.mock_user_service = MockUserService()
+        self.seller_id = self.mock_user_service.testuser_id
+        SellerSnapshot.objects.create(user_id=self.seller_id, username="testuser")
+        self.category = Category.objects.create(name="测试分类")
+
+        for i in range(20):
+            product = Product.objects.create(
+                user_id=self.seller_id, title=f"商品{i}", description="描述", price=10 + i
+            )
+            product.categories.add(self.category)
+            ProductMedia.objects.create(product=product, is_main=True)
+        self.client = APIClient()
+
+    def _count_queries(self, url, params):
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), params['page_size'])
+        for item in response.data['results']:
+            self.assertEqual(len(item['categories']), 1)
+            self.assertEqual(len(item['media']), 1)
+        return len(context.captured_queries)
+
+    def test_constant_queries_per_page(self):
+        """测试三个商品列表接口在不同每页条数下查询次数相同"""
+        urls = [
+            reverse("product-list-create"),
+            reverse("category-products", kwargs={"category_id": self.category.category_id}),
+            reverse("product-publish-list"),
+        ]
+        for url in urls:
+            for sort_by in ("0", "2"):
+                params = {"sort_by": sort_by, "user_id": self.seller_id}
+                small = self._count_queries(url, {**params, "page_size": 5})
+                large = self._count_queries(url, {**params, "page_size": 20})
+                self.assertEqual(small, large, url)
+
+    def test_sort_is_stable_with_ties(self):
+        """测试排序字段相同时按 product_id 排序，分页不重复不遗漏"""
+        Product.objects.update(price=10)
+        url = reverse("product-list-create")
+        seen = []
+        for page in (1, 2, 3, 4):
+            response = self.client.get(url, {"sort_by": "2", "page_size": 5, "page": page})
+            seen.extend(item['product_id'] for item in response.data['results'])
+        self.assertEqual(len(set(seen)), 20)
+
+
+class CursorPaginationTest(APITestCase):
+    """测试游标分页"""
+
+    def setUp(self):
+        self.mock_user_service = MockUserService()
+        self.seller_id = self.mock_user_service.testuser_id
+        SellerSnapshot.objects.create(user_id=self.seller_id, username="testuser")
+        # 价格有重复，验证次级排序
+        for i in range(12):
+            Product.objects.create(
+                user_id=self.seller_id, title=f"商品{i}", description="描述", price=10 + i % 3
+            )
+        self.client = APIClient()
+        self.url = reverse("product-list-create")
+
+    def _walk(self, url, params):
+        """沿 next 链接翻完全部页，返回每页的结果"""
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            pages.append(response.data)
+            if not response.data["links"]["next"]:
+                return pages
+            response = self.client.get(response.data["links"]["next"])
+
+    def test_cursor_matches_page_number_order(self):
+        """测试各种排序下游标分页与页码分页的结果顺序一致"""
+        for sort_by in ("0", "1", "2", "3", "4"):
+            expected = [
+                item["product_id"]
+                for item in self.client.get(self.url, {"sort_by": sort_by, "page_size": 100}).data["results"]
+            ]
+            pages = self._walk(self.url, {"sort_by": sort_by, "page_size": 5, "pagination": "cursor"})
+            self.assertEqual(len(pages), 3)
+            walked = [item["product_id"] for page in pages for item in page["results"]]
+            self.assertEqual(walked, expected, sort_by)
+
+    def test_previous_link(self):
+        """测试通过 previous 链接返回上一页"""
+        pages = self._walk(self.url, {"sort_by": "2", "page_size": 5, "pagination": "cursor"})
+        self.assertIsNone(pages[0]["links"]["previous"])
+
+        response = self.client.get(pages[1]["links"]["previous"])
+        self.assertEqual(response.data["results"], pages[0]["results"])
+        self.assertIsNone(response.data["links"]["previous"])
+        response = self.client.get(pages[2]["links"]["previous"])
+        self.assertEqual(response.data["results"], pages[1]["results"])
+
+    def test_review_and_collection_lists(self):
+        """测试评价和收藏列表的游标分页"""
+        product = Product.objects.first()
+        for i in range(3):
+            ProductReview.objects.create(product=product, user_id=uuid.uuid4(), rating=5)
+            Collection.objects.create(collection=Product.objects.all()[i], collecter=self.seller_id)
+
+        with patch('Product.user_utils.user_service') as mock_user_service:
+            mock_user_service.get_users_by_ids.return_value = {}
+            pages = self._walk(
+                reverse("product-review-list-create", kwargs={"product_id": product.product_id}),
+                {"pagination": "cursor", "page_size": 2},
+            )
+        self.assertEqual([len(page["results"]) for page in pages], [2, 1])
+
+        response = self.client.get(
+            reverse("user-collections"), {"pagination": "cursor", "page_size": 2}, HTTP_UUID=self.seller_id
+        )
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(response.data["links"]["next"], HTTP_UUID=self.seller_id)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_invalid_cursor(self):
+        """测试无效游标返回404"""
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_is_default(self):
+        """测试默认仍然使用页码分页"""
+        response = self.client.get(self.url, {"page_size": 5})
+        self.assertEqual(response.data["count"], 12)
+        self.assertEqual(response.data["total_pages"], 3)
+
+
+class EstimatedCountPaginationTest(APITestCase):
+    """测试估算总数的分页"""
+
+    def setUp(self):
+        seller_id = MockUserService().testuser_id
+        SellerSnapshot.objects.create(user_id=seller_id, username="testuser")
+        for i in range(12):
+            Product.objects.create(user_id=seller_id, title=f"商品{i}", description="描述", price=10)
+        self.client = APIClient()
+        self.url = reverse("product-list-create")
+
+    def test_exact_count_by_default(self):
+        """测试默认返回精确总数"""
+        response = self.client.get(self.url, {"page_size": 5})
+        self.assertEqual(response.data["count"], 12)
+        self.assertTrue(response.data["count_exact"])
+
+    @patch('Product.pagination.estimate_count', return_value=5000)
+    def test_estimated_count(self, mock_estimate):
+        """测试估算值超过阈值时返回估算总数，翻页不受估算总页数影响"""
+        response = self.client.get(self.url, {"page_size": 5, "count": "estimate"})
+        self.assertEqual(response.data["count"], 5000)
+        self.assertFalse(response.data["count_exact"])
+        self.assertEqual(len(response.data["results"]), 5)
+
+        response = self.client.get(self.url, {"page_size": 5, "count": "estimate", "page": 3})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["links"]["next"])
+
+        response = self.client.get(self.url, {"page_size": 5, "count": "estimate", "page": 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+
+    @patch('Product.pagination.estimate_count', return_value=50)
+    def test_small_estimate_uses_exact_count(self, mock_estimate):
+        """测试估算值低于阈值时执行精确计数"""
+        response = self.client.get(self.url, {"page_size": 5, "count": "estimate"})
+        self.assertEqual(response.data["count"], 12)
+        self.assertTrue(response.data["count_exact"])
+
+
+class ProductSearchTest(APITestCase):
+    """测试商品搜索"""
+
+    def setUp(self):
+        seller_id = MockUserService().testuser_id
+        SellerSnapshot.objects.create(user_id=seller_id, username="testuser")
+        self.phone = Product.objects.create(
+            user_id=seller_id, title="华为手机 九成新", description="自用闲置，包邮", price=1000
+        )
+        self.headset = Product.objects.create(
+            user_id=seller_id, title="索尼耳机", description="iPhone 可用", price=300
+        )
+        self.client = APIClient()
+
+    def test_tokenize_cjk_bigrams(self):
+        """测试中文切分为二元组，其他文字按单词切分"""
+        from .search import ngram_text, tokenize
+
+        self.assertEqual(ngram_text("华为手机 iPhone13"), "华为 为手 手机 iphone13")
+        self.assertEqual(tokenize("中"), [("中", True)])
+        self.assertEqual(ngram_text("a_b，c"), "a b c")
+
+    def test_search_query_terms(self):
+        """测试搜索词转换为 tsquery：二元组精确匹配，单词和单字前缀匹配"""
+        from .search import build_search_query, tsquery_text
+
+        self.assertEqual(tsquery_text("华为手机 iph 中"), "'华为' & '为手' & '手机' & 'iph':* & '中':*")
+        self.assertIsNone(build_search_query("，。"))
+
+    def test_search_filter(self):
+        """测试 search 参数在标题和描述中搜索"""
+        url = reverse("product-list-create")
+        response = self.client.get(url, {"search": "手机"})
+        self.assertEqual([item["product_id"] for item in response.data["results"]], [str(self.phone.product_id)])
+        response = self.client.get(url, {"search": "iphone"})
+        self.assertEqual([item["product_id"] for item in response.data["results"]], [str(self.headset.product_id)])
+
+    def test_full_text_search_ranks_results(self):
+        """测试 PostgreSQL 全文索引搜索：标题命中排在描述命中之前"""
+        from .search import rebuild_search_vectors
+
+        if connection.vendor != "postgresql":
+            self.skipTest("full-text search requires PostgreSQL")
+        other = Product.objects.create(
+            user_id=self.phone.user_id, title="充电器", description="适用华为手机", price=50
+        )
+        rebuild_search_vectors(Product.objects.all())
+        response = self.client.get(reverse("product-list-create"), {"search": "华为手机"})
+        self.assertEqual(
+            [item["product_id"] for item in response.data["results"]],
+            [str(self.phone.product_id), str(other.product_id)],
+        )
+
+
+    def test_rebuild_command_fills_missing_vectors(self):
+        """测试 rebuild_search_vectors --only-missing 只回填没有检索向量的商品"""
+        if connection.vendor != "postgresql":
+            self.skipTest("full-text search requires PostgreSQL")
+        Product.objects.filter(pk=self.phone.pk).update(search_vector=None)
+        out = io.StringIO()
+        call_command("rebuild_search_vectors", "--only-missing", stdout=out)
+        self.assertIn("Updated 1 search vectors", out.getvalue())
+        self.assertFalse(Product.objects.filter(search_vector__isnull=True).exists())
+
+
+class TitleIndexTest(APITestCase):
+    """测试标题倒排索引"""
+
+    def test_search_add_remove(self):
+        """测试候选查询、更新和删除"""
+        from .title_index import TitleIndex
+
+        first, second = uuid.uuid4(), uuid.uuid4()
+        index = TitleIndex()
+        index.build([(first, "华为手机 九成新"), (second, "小米手机")])
+
+        self.assertCountEqual(index.search("手机"), [first, second])
+        self.assertEqual(index.search("华为"), [first])
+        self.assertEqual(index.search("苹果"), [])
+        self.assertIsNone(index.search("手"))
+
+        index.add(second, "小米耳机")
+        self.assertEqual(index.search("手机"), [first])
+        self.assertEqual(index.search("耳机"), [second])
+        index.remove(first)
+        self.assertEqual(index.search("华为"), [])
+        self.assertEqual(index.stats()["live_documents"], 1)
+
+    def test_changes_during_rebuild_are_replayed(self):
+        """测试重建期间的新增、修改和删除在替换索引前重放，不会丢失"""
+        from .title_index import TitleIndex
+
+        first, second, added = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        index = TitleIndex()
+        index.build([(first, "华为手机"), (second, "小米手机")])
+
+        def rows():
+            # 模拟重建读取数据库之后，其他请求修改了商品
+            yield first, "华为手机"
+            index.add(added, "索尼耳机")
+            index.add(second, "小米平板")
+            index.remove(first)
+            yield second, "小米手机"
+
+        index.build(rows())
+        self.assertEqual(index.search("耳机"), [added])
+        self.assertEqual(index.search("平板"), [second])
+        self.assertEqual(index.search("手机"), [])
+        self.assertEqual(index.stats()["live_documents"], 2)
+
+        # 不在重建时不再记录修改
+        index.add(first, "华为手机")
+        self.assertIsNone(index._changes)
+        self.assertEqual(index.search("华为"), [first])
+
+    def test_too_many_candidates(self):
+        """测试候选超过上限时返回 None"""
+        from .title_index import TitleIndex
+
+        index = TitleIndex(max_candidates=1)
+        index.build([(uuid.uuid4(), "手机"), (uuid.uuid4(), "手机")])
+        self.assertIsNone(index.search("手机"))
+
+    def test_filter_uses_index(self):
+        """测试启用标题索引后 title 过滤结果不变，且随商品保存和删除更新"""
+        from django.test import override_settings
+        from .title_index import title_index
+
+        seller_id = MockUserService().testuser_id
+        SellerSnapshot.objects.create(user_id=seller_id, username="testuser")
+        phone = Product.objects.create(user_id=seller_id, title="华为手机", description="描述", price=10)
+        Product.objects.create(user_id=seller_id, title="小米耳机", description="描述", price=10)
+        self.addCleanup(title_index._reset)
+        self.addCleanup(setattr, title_index, "built", False)
+
+        url = reverse("product-list-create")
+        with override_settings(PRODUCT_SEARCH_BACKEND="title_index", PRODUCT_TITLE_INDEX_REBUILD_SECONDS=0):
+            response = self.client.get(url, {"title": "手机"})
+            self.assertTrue(title_index.built)
+            self.assertEqual([item["product_id"] for item in response.data["results"]], [str(phone.product_id)])
+
+            # 索引在事务提交后更新
+            with self.captureOnCommitCallbacks(execute=True):
+                tablet = Product.objects.create(user_id=seller_id, title="华为平板", description="描述", price=10)
+            response = self.client.get(url, {"search": "华为"})
+            self.assertEqual(response.data["count"], 2)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                tablet.delete()
+            self.assertEqual(title_index.search("平板"), [])
+
+    def test_filter_includes_changes_from_other_processes(self):
+        """测试其他进程新增或改名的商品（不经过本进程的信号）在重建索引前也能过滤到"""
+        from django.utils import timezone
+        from .title_index import title_index
+
+        seller_id = uuid.uuid4()
+        phone = Product.objects.create(user_id=seller_id, title="华为手机", description="描述", price=10)
+        self.addCleanup(title_index._reset)
+        self.addCleanup(setattr, title_index, "built", False)
+
+        url = reverse("product-list-create")
+        with override_settings(PRODUCT_SEARCH_BACKEND="title_index", PRODUCT_TITLE_INDEX_REBUILD_SECONDS=0):
+            self.assertEqual(self.client.get(url, {"title": "耳机"}).data["count"], 0)
+            self.assertTrue(title_index.built)
+
+            # 模拟其他副本的写入：不触发本进程的信号
+            Product.objects.filter(pk=phone.pk).update(title="华为耳机", updated_at=timezone.now())
+            Product.objects.bulk_create(
+                [Product(user_id=seller_id, title="索尼耳机", description="描述", price=10)]
+            )
+            self.assertEqual(title_index.search("耳机"), [])
+            self.assertEqual(self.client.get(url, {"title": "耳机"}).data["count"], 2)
+            self.assertEqual(self.client.get(url, {"search": "耳机"}).data["count"], 2)
+
+    def test_saves_during_first_build_are_kept(self):
+        """测试首次构建期间提交的商品在构建完成后可以查到"""
+        from .title_index import title_index
+
+        seller_id = uuid.uuid4()
+        Product.objects.create(user_id=seller_id, title="华为手机", description="描述", price=10)
+        self.addCleanup(title_index._reset)
+        self.addCleanup(setattr, title_index, "built", False)
+        self.assertFalse(title_index.accepting_changes())
+
+        saved = []
+
+        def rows():
+            # 模拟构建读取数据库之后，其他请求保存了商品
+            yield from Product.objects.values_list("product_id", "title")
+            self.assertTrue(title_index.accepting_changes())
+            with self.captureOnCommitCallbacks(execute=True):
+                saved.append(
+                    Product.objects.create(user_id=seller_id, title="索尼耳机", description="描述", price=10)
+                )
+
+        with override_settings(PRODUCT_TITLE_INDEX_REBUILD_SECONDS=0):
+            title_index.build(rows())
+        self.assertEqual(title_index.search("耳机"), [saved[0].product_id])
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN checks require PostgreSQL")
+class ListIndexUsageTest(TestCase):
+    """测试列表接口的热点查询使用索引（EXPLAIN，仅 PostgreSQL）"""
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            # 禁用顺序扫描后如果仍然出现 Seq Scan，说明没有可用的索引
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan, plan)
+        self.assertIn(index_name, plan, plan)
+
+    def test_product_sort_orders(self):
+        """测试每种 sort_by 排序都能按索引顺序读取"""
+        from .queries import build_product_queryset
+
+        expected = {
+            "0": "product_created_idx",
+            "1": "product_visit_idx",
+            "2": "product_price_idx",
+            "3": "product_price_idx",
+            "4": "product_rating_idx",
+            "5": "product_visitors_idx",
+        }
+        for sort_by, index_name in expected.items():
+            self.assertUsesIndex(build_product_queryset(sort_by)[:20], index_name)
+
+    def test_trending_sort(self):
+        """测试按近期热度排序（DESC NULLS LAST）直接按 NULLS LAST 的索引顺序读取，不需要再排序"""
+        from .queries import build_product_queryset
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'product_trending_idx'")
+            (indexdef,) = cursor.fetchone()
+        self.assertIn("trending_score DESC NULLS LAST", indexdef)
+
+        queryset = build_product_queryset("6")[:20]
+        self.assertIn("NULLS LAST", str(queryset.query))
+        self.assertUsesIndex(queryset, "product_trending_idx")
+        plan = queryset.explain()
+        self.assertNotIn("Sort", plan, plan)
+
+    def test_publish_list(self):
+        from .queries import build_product_queryset
+
+        queryset = build_product_queryset(queryset=Product.objects.filter(user_id=uuid.uuid4()))
+        self.assertUsesIndex(queryset[:20], "product_user_created_idx")
+
+    def test_review_and_collection_lists(self):
+        self.assertUsesIndex(
+            ProductReview.objects.filter(product_id=uuid.uuid4()).order_by("-created_at")[:20],
+            "review_product_created_idx",
+        )
+        self.assertUsesIndex(
+            Collection.objects.filter(collecter=uuid.uuid4()).order_by("-create_at")[:20],
+            "collection_collecter_idx",
+        )
+
+    def test_main_media(self):
+        self.assertUsesIndex(
+            ProductMedia.objects.filter(product_id=uuid.uuid4(), is_main=True), "product_media_main_idx"
+        )
+
+
+@override_settings(PRODUCT_LIST_CACHE_TTL=60)
+class ProductListCacheTest(APITestCase):
+    """测试商品列表响应缓存"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.seller_id = MockUserService().testuser_id
+        SellerSnapshot.objects.create(user_id=self.seller_id, username="testuser")
+        self.category = Category.objects.create(name="手机")
+        self.other_category = Category.objects.create(name="耳机")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(
+                user_id=self.seller_id, title="华为手机", description="描述", price=10
+            )
+            self.product.categories.add(self.category)
+        self.client = APIClient()
+        self.url = reverse("product-list-create")
+        self.category_url = reverse("category-products", kwargs={"category_id": self.category.category_id})
+
+    def test_anonymous_list_is_cached(self):
+        """测试匿名请求命中缓存，参数顺序不影响缓存键"""
+        response = self.client.get(self.url + "?sort_by=1&page_size=5")
+        self.assertEqual(response["X-Cache"], "MISS")
+        cached = self.client.get(self.url + "?page_size=5&sort_by=1")
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.content, response.content)
+
+        response = self.client.get(self.url, {"sort_by": 1}, HTTP_UUID=self.seller_id)
+        self.assertFalse(response.has_header("X-Cache"))
+
+    def test_host_is_part_of_the_key(self):
+        """测试不同 Host 的请求不共用缓存，伪造的 Host 不会出现在其他客户端的分页链接中"""
+        Product.objects.create(user_id=self.seller_id, title="小米手机", description="描述", price=20)
+        evil = self.client.get(self.url, {"page_size": 1}, HTTP_HOST="evil.example")
+        self.assertEqual(evil["X-Cache"], "MISS")
+        self.assertTrue(evil.data["links"]["next"].startswith("http://evil.example/"))
+
+        response = self.client.get(self.url, {"page_size": 1}, HTTP_HOST="shop.example")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertTrue(response.json()["links"]["next"].startswith("http://shop.example/"))
+        self.assertNotEqual(response["ETag"], evil["ETag"])
+        cached = self.client.get(self.url, {"page_size": 1}, HTTP_HOST="shop.example")
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertTrue(cached.json()["links"]["next"].startswith("http://shop.example/"))
+
+    def test_write_invalidates(self):
+        """测试商品写入使全局列表和所属分类列表失效，访问量更新不失效"""
+        self.client.get(self.url)
+        self.client.get(self.category_url)
+        other_url = reverse("category-products", kwargs={"category_id": self.other_category.category_id})
+        self.client.get(other_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.visit_count = 5
+            self.product.save(update_fields=["visit_count"])
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = "华为手机 九成新"
+            self.product.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["title"], "华为手机 九成新")
+        self.assertEqual(self.client.get(self.category_url)["X-Cache"], "MISS")
+        # 其他分类的列表不受影响
+        self.assertEqual(self.client.get(other_url)["X-Cache"], "HIT")
+
+    def test_related_writes_invalidate(self):
+        """测试图片、分类和评价写入使列表失效"""
+        writes = [
+            lambda: ProductMedia.objects.create(product=self.product, is_main=True),
+            lambda: Category.objects.filter(pk=self.category.pk).first().save(),
+            lambda: ProductReview.objects.create(product=self.product, user_id=uuid.uuid4(), rating=5),
+            lambda: self.product.categories.add(self.other_category),
+        ]
+        for write in writes:
+            self.client.get(self.category_url)
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertEqual(self.client.get(self.category_url)["X-Cache"], "MISS")
+
+    def test_seller_changes_invalidate(self):
+        """测试卖家快照变化（用户事件、回填）使全局列表和卖家商品所属分类的列表失效"""
+        from .seller_directory import apply_user_event, upsert_snapshots
+
+        other_url = reverse("category-products", kwargs={"category_id": self.other_category.category_id})
+        for url in (self.url, self.category_url, other_url):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_user_event(
+                {"event": "user.updated", "user_id": self.seller_id, "version": 100, "data": {"username": "renamed"}}
+            )
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["user_info"]["username"], "renamed")
+        self.assertEqual(self.client.get(self.category_url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(other_url)["X-Cache"], "HIT")
+
+        # 被忽略的旧事件和没有变化的回源写入不使缓存失效
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_user_event(
+                {"event": "user.updated", "user_id": self.seller_id, "version": 50, "data": {"username": "old"}}
+            )
+            upsert_snapshots({self.seller_id: {"username": "cached"}})
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_snapshots({self.seller_id: {"username": "backfilled"}}, version=200)
+        self.assertEqual(self.client.get(self.category_url)["X-Cache"], "MISS")
+
+    def test_versions_are_shared_between_replicas(self):
+        """测试版本号保存在数据库中：进程内缓存不包含写入时，ETag 和缓存键仍然随写入改变"""
+        from django.core.cache import cache
+
+        from .cache import GLOBAL_SCOPE, bump_versions, get_version
+        from .models import ListCacheVersion
+
+        etag = self.client.get(self.url)["ETag"]
+        version = get_version(GLOBAL_SCOPE)
+        self.assertEqual(ListCacheVersion.objects.get(scope=GLOBAL_SCOPE).version, version)
+
+        # 模拟在另一个副本上写入：本进程的缓存不参与版本号的递增
+        cache.clear()
+        bump_versions([GLOBAL_SCOPE])
+        self.assertEqual(get_version(GLOBAL_SCOPE), version + 1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_metrics(self):
+        """测试缓存指标"""
+        from .cache import stats
+
+        hits = stats.hits
+        self.client.get(self.url)
+        self.client.get(self.url)
+        response = self.client.get(reverse("product_cache_metrics"))
+        metrics = response.json()["metrics"]
+        self.assertEqual(metrics["hits"], hits + 1)
+        self.assertEqual(metrics["ttl_seconds"], 60)
+        self.assertIn("max_hit_age_seconds", metrics)
+
+
+class ConditionalGetTest(APITestCase):
+    """测试 ETag / Last-Modified 条件请求"""
+
+    def setUp(self):
+        self.seller_id = MockUserService().testuser_id
+        self.product = Product.objects.create(
+            user_id=self.seller_id, title="华为手机", description="描述", price=10
+        )
+        self.client = APIClient()
+        self.detail_url = reverse("product-detail", kwargs={"product_id": self.product.product_id})
+
+    @patch('Product.user_utils.user_service')
+    def test_detail_not_modified(self, mock_user_service):
+        """测试 If-None-Match 匹配时返回 304，不序列化也不请求用户服务"""
+        mock_user_service.get_users_by_ids.return_value = {}
+        response = self.client.get(self.detail_url)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+        mock_user_service.reset_mock()
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        mock_user_service.get_users_by_ids.assert_not_called()
+
+        # 访问量变化不改变版本
+        self.client.get(self.detail_url, HTTP_UUID=str(uuid.uuid4()))
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_writes_change_etag(self):
+        """测试商品、图片、分类和评分变化后 ETag 改变"""
+        etags = [self.client.get(self.detail_url)["ETag"]]
+        category = Category.objects.create(name="手机")
+        writes = [
+            lambda: Product.objects.get(pk=self.product.pk).save(),
+            lambda: ProductMedia.objects.create(product=self.product, is_main=True),
+            lambda: self.product.categories.add(category),
+            lambda: Category.objects.get(pk=category.pk).save(),
+            lambda: ProductReview.objects.create(product=self.product, user_id=uuid.uuid4(), rating=4),
+        ]
+        for write in writes:
+            write()
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etags[-1])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etags.append(response["ETag"])
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_list_not_modified(self):
+        """测试列表的 ETag 随写入改变，按热度排序的列表没有 ETag"""
+        url = reverse("product-list-create")
+        etag = self.client.get(url, {"sort_by": 0})["ETag"]
+        response = self.client.get(url, {"sort_by": 0}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(user_id=self.seller_id, title="小米耳机", description="描述", price=10)
+        response = self.client.get(url, {"sort_by": 0}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertFalse(self.client.get(url, {"sort_by": 1}).has_header("ETag"))
+
+
+class FastProductListTest(APITestCase):
+    """测试商品列表快速序列化和 orjson 渲染器的输出与原有实现逐字节相同"""
+
+    def setUp(self):
+        self.seller_id = MockUserService().testuser_id
+        SellerSnapshot.objects.create(user_id=self.seller_id, username="testuser")
+        categories = [Category.objects.create(name=name) for name in ("手机", "数码")]
+        for i in range(6):
+            product = Product.objects.create(
+                user_id=self.seller_id,
+                title=f"商品{i}\u2028\"引号\"",
+                description="描述\n换行" if i % 2 else "",
+                price=Decimal("10.50") + i,
+                rating_avg=Decimal("4.5"),
+            )
+            product.categories.add(*categories[: i % 3])
+            ProductMedia.objects.create(product=product, is_main=False)
+            if i % 2:
+                ProductMedia.objects.create(product=product, media=f"product_media/{i}.jpg", is_main=True)
+        self.client = APIClient()
+
+    def _get_both(self, url, params):
+        with override_settings(PRODUCT_FAST_LIST=False):
+            expected = self.client.get(url, params)
+        actual = self.client.get(url, params)
+        self.assertEqual(actual.status_code, status.HTTP_200_OK)
+        return expected.content, actual.content
+
+    def test_same_bytes(self):
+        """测试三个商品列表接口在不同排序和分页方式下输出相同"""
+        category = Category.objects.get(name="手机")
+        urls = [
+            reverse("product-list-create"),
+            reverse("category-products", kwargs={"category_id": category.category_id}),
+            reverse("product-publish-list"),
+        ]
+        for url in urls:
+            for params in (
+                {"sort_by": "0"},
+                {"sort_by": "2", "page_size": 3, "page": 2},
+                {"sort_by": "3", "pagination": "cursor", "page_size": 2},
+                {"title": "商品"},
+                {"view": "card", "sort_by": "3", "pagination": "cursor", "page_size": 2},
+                {"fields": "title,categories,rating_avg", "sort_by": "4"},
+            ):
+                params = {**params, "user_id": self.seller_id}
+                expected, actual = self._get_both(url, params)
+                self.assertEqual(expected, actual, (url, params))
+
+    def test_cursor_from_rows(self):
+        """测试按字典行生成的游标可以继续翻页"""
+        url = reverse("product-list-create")
+        seen = []
+        params = {"pagination": "cursor", "page_size": 4}
+        while url:
+            data = self.client.get(url, params).json()
+            seen.extend(item["product_id"] for item in data["results"])
+            url, params = data["links"]["next"], {}
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_renderer_matches_json_renderer(self):
+        """测试 ORJSONRenderer 与 JSONRenderer 对时间、小数、UUID 和特殊字符的输出相同"""
+        from datetime import datetime, timezone as dt_timezone
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import ORJSONRenderer
+
+        data = {
+            "id": uuid.uuid4(),
+            "price": Decimal("12.30"),
+            "created_at": datetime(2024, 5, 1, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            "text": "中文\u2028\u2029\"\\</script>",
+            "items": [1, 2.5, None, True, {"nested": []}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+        self.assertEqual(ORJSONRenderer().render(None), JSONRenderer().render(None))
+
+
+class ProductProjectionTest(APITestCase):
+    """测试 ?fields= / ?view=card 同时裁剪响应和查询"""
+
+    def setUp(self):
+        self.seller_id = MockUserService().testuser_id
+        SellerSnapshot.objects.create(user_id=self.seller_id, username="testuser", email="test@example.com")
+        category = Category.objects.create(name="手机")
+        for i in range(3):
+            product = Product.objects.create(
+                user_id=self.seller_id, title=f"商品{i}", description="很长的描述" * 100, price=10 + i
+            )
+            product.categories.add(category)
+            ProductMedia.objects.create(product=product, is_main=False)
+            ProductMedia.objects.create(product=product, is_main=True)
+        self.client = APIClient()
+        self.url = reverse("product-list-create")
+
+    def _get(self, params, fast=True):
+        from django.test.utils import CaptureQueriesContext
+
+        with override_settings(PRODUCT_FAST_LIST=fast), CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), [query["sql"] for query in context.captured_queries]
+
+    def test_card_view(self):
+        """测试卡片视图只返回卡片字段和主图，不查询描述和分类"""
+        for fast in (True, False):
+            data, queries = self._get({"view": "card"}, fast=fast)
+            for item in data["results"]:
+                self.assertEqual(
+                    list(item), ["product_id", "user_info", "title", "price", "status", "media"]
+                )
+                self.assertEqual(item["user_info"], {"user_id": self.seller_id, "username": "testuser"})
+                self.assertEqual(len(item["media"]), 1)
+                self.assertTrue(item["media"][0]["is_main"])
+            self.assertFalse(any('"description"' in sql for sql in queries), fast)
+            self.assertFalse(any('"product_categories"' in sql for sql in queries), fast)
+
+    def test_fields(self):
+        """测试 ?fields= 只返回指定字段，未知字段返回 400"""
+        data, queries = self._get({"fields": "title,price", "sort_by": "4"})
+        self.assertEqual(list(data["results"][0]), ["title", "price"])
+        self.assertFalse(any('"product_media"' in sql for sql in queries))
+
+        response = self.client.get(self.url, {"fields": "title,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"view": "tiny"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_and_writes(self):
+        """测试详情接口支持投影，写入请求忽略投影"""
+        product = Product.objects.first()
+        url = reverse("product-detail", kwargs={"product_id": product.product_id})
+        response = self.client.get(url, {"fields": "title"})
+        self.assertEqual(response.json(), {"title": product.title})
+
+        # 卡片视图的详情只返回主图，完整详情返回全部图片
+        card = self.client.get(url, {"view": "card"})
+        self.assertEqual(list(card.json()), ["product_id", "user_info", "title", "price", "status", "media"])
+        self.assertEqual([media["is_main"] for media in card.json()["media"]], [True])
+        full = self.client.get(url)
+        self.assertEqual(len(full.json()["media"]), 2)
+
+        # 不同投影是不同的表示，ETag 不同，不能用一个投影的 ETag 得到另一个投影的 304
+        self.assertNotEqual(card["ETag"], full["ETag"])
+        response = self.client.get(url, {"view": "card"}, HTTP_IF_NONE_MATCH=full["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, {"view": "card"}, HTTP_IF_NONE_MATCH=card["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.patch(f"{url}?fields=title", {"description": "新描述"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["description"], "新描述")
+
+
+@override_settings(PRODUCT_EXPORT_CHUNK_SIZE=2)
+class ProductExportTest(APITestCase):
+    """测试 NDJSON 商品导出"""
+
+    def setUp(self):
+        self.seller_id = MockUserService().testuser_id
+        SellerSnapshot.objects.create(user_id=self.seller_id, username="testuser")
+        self.category = Category.objects.create(name="手机")
+        self.products = []
+        for i in range(5):
+            product = Product.objects.create(
+                user_id=self.seller_id, title=f"商品{i}", description="描述", price=10 + i,
+                status=Product.OFF_SALE if i == 4 else Product.ON_SALE,
+            )
+            if i % 2:
+                product.categories.add(self.category)
+            ProductMedia.objects.create(product=product, is_main=True)
+            self.products.append(product)
+        self.client = APIClient()
+        self.url = reverse("product-export")
+
+    def _export(self, params=None, **headers):
+        import json
+
+        response = self.client.get(self.url, params or {}, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        content = b"".join(response.streaming_content)
+        if response.get("Content-Encoding") == "gzip":
+            import gzip
+
+            content = gzip.decompress(content)
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_export_all(self):
+        """测试按 updated_at 顺序导出全部商品，每行与列表接口的数据一致"""
+        lines = self._export()
+        self.assertEqual([line["product_id"] for line in lines], [str(p.product_id) for p in self.products])
+        listed = self.client.get(reverse("product-list-create"), {"sort_by": "0"}).json()["results"]
+        by_id = {item["product_id"]: item for item in listed}
+        for line in lines:
+            updated_at = line.pop("updated_at")
+            self.assertTrue(updated_at)
+            self.assertEqual(line, by_id[line["product_id"]])
+
+    def test_filters(self):
+        """测试状态、分类和 updated_after 水位过滤"""
+        self.assertEqual(len(self._export({"status": Product.ON_SALE})), 4)
+        self.assertEqual(len(self._export({"category": self.category.category_id})), 2)
+
+        lines = self._export()
+        watermark = lines[2]["updated_at"]
+        resumed = self._export({"updated_after": watermark})
+        self.assertEqual([line["product_id"] for line in resumed], [line["product_id"] for line in lines[2:]])
+
+        response = self.client.get(self.url, {"updated_after": "not-a-date"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_gzip(self):
+        """测试 Accept-Encoding: gzip 时压缩输出"""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(len(self._export(HTTP_ACCEPT_ENCODING="gzip")), 5)
+
+        # q=0 表示拒绝 gzip，不压缩
+        for header in ("gzip;q=0, deflate", "gzip; q=0.0", "*;q=0", "identity"):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=header)
+            self.assertFalse(response.has_header("Content-Encoding"), header)
+        self.assertEqual(len(self._export(HTTP_ACCEPT_ENCODING="gzip;q=0")), 5)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="deflate, *;q=0.5")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+
+class ProductBulkTest(APITestCase):
+    """测试批量获取商品"""
+
+    def setUp(self):
+        self.seller_ids = [uuid.uuid4(), uuid.uuid4()]
+        self.products = []
+        for i in range(4):
+            product = Product.objects.create(
+                user_id=self.seller_ids[i % 2], title=f"商品{i}", description="描述", price=10 + i
+            )
+            ProductMedia.objects.create(product=product, is_main=True)
+            self.products.append(product)
+        self.client = APIClient()
+        self.url = reverse("product-bulk")
+
+    @patch('Product.user_utils.user_service')
+    def test_bulk_get(self, mock_user_service):
+        """测试按请求顺序返回、报告缺失的ID、每个卖家只请求一次、不增加访问次数"""
+        mock_user_service.get_users_by_ids.return_value = {}
+        missing_id = str(uuid.uuid4())
+        ids = [str(self.products[2].product_id), missing_id, str(self.products[0].product_id),
+               str(self.products[1].product_id), str(self.products[2].product_id)]
+
+        response = self.client.post(self.url, {"product_ids": ids}, format="json", HTTP_UUID=str(uuid.uuid4()))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["product_id"] for item in response.data["results"]],
+            [ids[0], ids[2], ids[3]],
+        )
+        self.assertEqual(response.data["missing"], [missing_id])
+        mock_user_service.get_users_by_ids.assert_called_once()
+        self.assertEqual(len(mock_user_service.get_users_by_ids.call_args[0][0]), 2)
+        self.assertEqual(sum(Product.objects.values_list("visit_count", flat=True)), 0)
+
+        detail = self.client.get(reverse("product-detail", kwargs={"product_id": ids[0]})).json()
+        self.assertEqual(response.json()["results"][0], detail)
+
+        response = self.client.get(self.url, {"ids": ",".join(ids[:3]), "view": "card"})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertNotIn("description", response.data["results"][0])
+
+    def test_constant_queries(self):
+        """测试查询次数与商品数量无关"""
+        from django.test.utils import CaptureQueriesContext
+
+        counts = []
+        for size in (1, 4):
+            ids = [str(product.product_id) for product in self.products[:size]]
+            with CaptureQueriesContext(connection) as context:
+                self.client.post(self.url, {"product_ids": ids}, format="json")
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    @override_settings(PRODUCT_BULK_MAX_IDS=3)
+    def test_invalid_requests(self):
+        """测试ID过多、格式错误或为空时返回 400"""
+        ids = [str(uuid.uuid4()) for _ in range(4)]
+        for data in ({"product_ids": ids}, {"product_ids": ["bad"]}, {"product_ids": []}, {}):
+            response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+
+
+class ProductFacetTest(APITestCase):
+    """测试商品筛选统计"""
+
+    def setUp(self):
+        self.seller_id = uuid.uuid4()
+        self.phone = Category.objects.create(name="手机")
+        self.digital = Category.objects.create(name="数码")
+        Category.objects.create(name="空分类")
+        for i, price in enumerate([10, 60, 60, 150, 8000]):
+            product = Product.objects.create(
+                user_id=self.seller_id, title=f"商品{i}", description="描述", price=price,
+                status=Product.SALED if i == 0 else Product.ON_SALE,
+            )
+            product.categories.add(self.phone)
+            if i % 2:
+                product.categories.add(self.digital)
+        self.client = APIClient()
+        self.url = reverse("product-facets")
+
+    def test_facets_in_one_query(self):
+        """测试所有分面在一条查询中统计"""
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(context.captured_queries), 1)
+
+        data = response.json()
+        self.assertEqual(data["count"], 5)
+        status_counts = {item["value"]: item["count"] for item in data["status"]}
+        self.assertEqual(status_counts, {0: 4, 1: 0, 2: 1, 3: 0})
+        self.assertEqual([item["count"] for item in data["price"]], [1, 2, 1, 0, 0, 0, 1])
+        self.assertEqual(data["price"][0], {"min": "0", "max": "50", "count": 1})
+        self.assertIsNone(data["price"][-1]["max"])
+        self.assertEqual(
+            [(item["name"], item["count"]) for item in data["categories"]], [("手机", 5), ("数码", 2)]
+        )
+
+    def test_filters(self):
+        """测试统计与 ProductFilter 的过滤结果一致，无效参数返回 400"""
+        data = self.client.get(self.url, {"min_price": 50, "status": 0, "page": 3}).json()
+        self.assertEqual(data["count"], 4)
+        self.assertEqual(
+            [(item["name"], item["count"]) for item in data["categories"]], [("手机", 4), ("数码", 2)]
+        )
+        data = self.client.get(self.url, {"category": self.digital.category_id}).json()
+        self.assertEqual(data["count"], 2)
+
+        response = self.client.get(self.url, {"min_price": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PRODUCT_FACET_CACHE_TTL=30)
+    def test_cache(self):
+        """测试结果按过滤参数缓存，商品写入后失效"""
+        from django.core.cache import cache
+        from django.test.utils import CaptureQueriesContext
+
+        cache.clear()
+        self.client.get(self.url, {"status": 0})
+        with CaptureQueriesContext(connection) as context:
+            data = self.client.get(self.url, {"status": 0, "sort_by": 2}).json()
+        # 命中缓存时只读取版本号
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(data["count"], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(user_id=self.seller_id, title="新商品", description="描述", price=10)
+        self.assertEqual(self.client.get(self.url, {"status": 0}).json()["count"], 5)
+
+
+class VisitBufferTest(APITestCase):
+    """测试访问量写缓冲"""
+
+    def setUp(self):
+        from .visit_buffer import VisitBuffer
+
+        self.seller_id = uuid.uuid4()
+        self.products = [
+            Product.objects.create(user_id=self.seller_id, title=f"商品{i}", description="描述", price=10)
+            for i in range(3)
+        ]
+        self.buffer = VisitBuffer(batch_size=2)
+        patcher = patch('Product.views.visit_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.buffer.stop)
+        self.client = APIClient()
+
+    def _visit(self, product, user_id=None):
+        url = reverse("product-detail", kwargs={"product_id": product.product_id})
+        return self.client.get(url, HTTP_UUID=str(user_id or uuid.uuid4()))
+
+    def _visit_counts(self):
+        return [Product.objects.get(pk=product.pk).visit_count for product in self.products]
+
+    @override_settings(PRODUCT_VISIT_FLUSH_SECONDS=3600)
+    def test_buffered_visits(self):
+        """测试访问不同步写数据库，批量写入后计数完整"""
+        from django.test.utils import CaptureQueriesContext
+
+        for _ in range(3):
+            response = self._visit(self.products[0])
+        self.assertEqual(response.data["visit_count"], 1)
+        self._visit(self.products[1])
+        self._visit(self.products[2])
+        self._visit(self.products[2], user_id=self.seller_id)  # 卖家自己的访问不计数
+        self.assertEqual(self._visit_counts(), [0, 0, 0])
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.buffer.flush(), 3)
+        updates = [
+            query for query in context.captured_queries
+            if query["sql"].startswith("UPDATE") and '"visit_count" = ' in query["sql"]
+        ]
+        self.assertEqual(len(updates), 2)  # batch_size=2
+        self.assertEqual(self._visit_counts(), [3, 1, 1])
+        self.assertEqual(self.buffer.pending(), {})
+        self.assertEqual(self.buffer.flush(), 0)
+
+    @override_settings(PRODUCT_VISIT_FLUSH_SECONDS=3600)
+    def test_failed_flush_keeps_visits(self):
+        """测试写入失败时增量保留在缓冲中，下次写入"""
+        self._visit(self.products[0])
+        self._visit(self.products[0])
+        with patch('Product.visit_buffer.apply_visits', side_effect=Exception("db down")):
+            self.assertEqual(self.buffer.flush(), 0)
+        self._visit(self.products[0])
+        self.assertEqual(self.buffer.pending(), {self.products[0].product_id: 3})
+        self.buffer.stop()
+        self.assertEqual(self._visit_counts(), [3, 0, 0])
+
+    def test_write_through(self):
+        """测试关闭缓冲时每次访问直接累加到数据库"""
+        self._visit(self.products[0])
+        self._visit(self.products[0])
+        self.assertEqual(self._visit_counts(), [2, 0, 0])
+        self.assertEqual(self.buffer.pending(), {})
+
+
+class UniqueVisitorTest(APITestCase):
+    """测试 HyperLogLog 独立访客估计"""
+
+    def test_hyperloglog(self):
+        """测试估计误差、重复访客不计数和合并"""
+        from .hll import HyperLogLog
+
+        for size in (1, 50, 20000):
+            sketch = HyperLogLog()
+            for i in range(size):
+                sketch.add(f"visitor-{i}")
+                sketch.add(f"visitor-{i}")
+            self.assertLessEqual(abs(sketch.count() - size), max(1, size * 0.05), size)
+
+        left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for i in range(3000):
+            left.add(i)
+            union.add(i)
+        for i in range(2000, 5000):
+            right.add(i)
+            union.add(i)
+        restored = HyperLogLog.from_bytes(left.to_bytes())
+        self.assertEqual(restored.merge(right).count(), union.count())
+        self.assertEqual(len(union.to_bytes()), 4096)
+
+    @override_settings(PRODUCT_VISIT_FLUSH_SECONDS=3600)
+    def test_visitors_from_several_processes(self):
+        """测试多个进程的缓冲合并到同一个 sketch，独立访客数用于排序和详情"""
+        from .visit_buffer import VisitBuffer
+
+        seller_id = uuid.uuid4()
+        popular = Product.objects.create(user_id=seller_id, title="商品1", description="描述", price=10)
+        refreshed = Product.objects.create(user_id=seller_id, title="商品2", description="描述", price=10)
+        visitors = [uuid.uuid4() for _ in range(5)]
+
+        first, second = VisitBuffer(), VisitBuffer()
+        self.addCleanup(first.stop)
+        self.addCleanup(second.stop)
+        for visitor in visitors[:3]:
+            first.add(popular.product_id, visitor_id=visitor)
+        for visitor in visitors[1:]:
+            second.add(popular.product_id, visitor_id=visitor)
+        for _ in range(10):
+            first.add(refreshed.product_id, visitor_id=visitors[0])
+        first.flush()
+        second.flush()
+
+        popular.refresh_from_db()
+        refreshed.refresh_from_db()
+        self.assertEqual((popular.visit_count, popular.unique_visitors), (7, 5))
+        self.assertEqual((refreshed.visit_count, refreshed.unique_visitors), (10, 1))
+
+        url = reverse("product-list-create")
+        response = self.client.get(url, {"sort_by": "5"})
+        self.assertEqual(
+            [item["product_id"] for item in response.data["results"]],
+            [str(popular.product_id), str(refreshed.product_id)],
+        )
+        response = self.client.get(url, {"sort_by": "1"})
+        self.assertEqual(response.data["results"][0]["product_id"], str(refreshed.product_id))
+
+        detail = self.client.get(reverse("product-detail", kwargs={"product_id": popular.product_id}))
+        self.assertEqual(detail.data["unique_visitors"], 5)
+
+    def test_write_through_visitor(self):
+        """测试关闭缓冲时访问直接更新 sketch"""
+        product = Product.objects.create(user_id=uuid.uuid4(), title="商品", description="描述", price=10)
+        url = reverse("product-detail", kwargs={"product_id": product.product_id})
+        visitor = str(uuid.uuid4())
+        for user_id in (visitor, visitor, str(uuid.uuid4())):
+            self.client.get(url, HTTP_UUID=user_id)
+        product.refresh_from_db()
+        self.assertEqual((product.visit_count, product.unique_visitors), (3, 2))
+
+
+class TrendingScoreTest(APITestCase):
+    """测试随时间衰减的近期热度"""
+
+    def setUp(self):
+        self.seller_id = uuid.uuid4()
+        self.products = [
+            Product.objects.create(user_id=self.seller_id, title=f"商品{i}", description="描述", price=10)
+            for i in range(5)
+        ]
+        self.client = APIClient()
+
+    def _decayed(self, product, at):
+        from .trending import decayed_score
+
+        return decayed_score(Product.objects.get(pk=product.pk).trending_score, at)
+
+    @override_settings(PRODUCT_TRENDING_HALF_LIFE_HOURS=24)
+    def test_decay(self):
+        """测试事件按半衰期衰减，较早的大量访问排在最近的少量访问之后"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .trending import add_events
+
+        now = timezone.now()
+        old, recent = self.products[0], self.products[1]
+        add_events({old.product_id: 10}, at=now - timedelta(days=3))
+        add_events({recent.product_id: 2}, at=now - timedelta(hours=1))
+        add_events({recent.product_id: 1}, at=now)
+
+        self.assertAlmostEqual(self._decayed(old, now), 10 / 8, places=6)
+        self.assertAlmostEqual(self._decayed(recent, now), 2 * 2 ** (-1 / 24) + 1, places=6)
+
+        response = self.client.get(reverse("product-list-create"), {"sort_by": "6", "page_size": 2})
+        self.assertEqual(
+            [item["product_id"] for item in response.data["results"]],
+            [str(recent.product_id), str(old.product_id)],
+        )
+
+    def test_events(self):
+        """测试访问、收藏、评价都计入热度"""
+        from django.utils import timezone
+
+        visited, collected, reviewed = self.products[:3]
+        url = reverse("product-detail", kwargs={"product_id": visited.product_id})
+        self.client.get(url, HTTP_UUID=str(uuid.uuid4()))
+        Collection.objects.create(collection=collected, collecter=uuid.uuid4())
+        ProductReview.objects.create(product=reviewed, user_id=uuid.uuid4(), rating=5)
+
+        now = timezone.now()
+        self.assertAlmostEqual(self._decayed(visited, now), 1, places=2)
+        self.assertAlmostEqual(self._decayed(collected, now), 5, places=2)
+        self.assertAlmostEqual(self._decayed(reviewed, now), 3, places=2)
+
+    def test_cursor_pagination_with_ties(self):
+        """测试按热度排序时游标分页不重复不遗漏"""
+        from .trending import add_events
+
+        add_events({self.products[0].product_id: 1, self.products[1].product_id: 1})
+        url = reverse("product-list-create")
+        seen = []
+        params = {"sort_by": "6", "pagination": "cursor", "page_size": 2}
+        while url:
+            data = self.client.get(url, params).json()
+            seen.extend(item["product_id"] for item in data["results"])
+            url, params = data["links"]["next"], {}
+        self.assertEqual(sorted(seen), sorted(str(product.product_id) for product in self.products))
+        self.assertEqual(set(seen[:2]), {str(self.products[0].product_id), str(self.products[1].product_id)})
+
+        # 从最后一页向前翻页，没有事件（NULL）的商品同样不重复不遗漏
+        url, params, backward = data["links"]["previous"], {}, []
+        while url:
+            data = self.client.get(url, params).json()
+            backward[:0] = [item["product_id"] for item in data["results"]]
+            url = data["links"]["previous"]
+        self.assertEqual(backward + seen[-1:], seen)
+
+    def test_products_without_events(self):
+        """测试没有事件的商品热度为 NULL，排在有事件的商品之后"""
+        from .trending import add_events, decayed_score
+
+        product = self.products[3]
+        self.assertIsNone(Product.objects.get(pk=product.pk).trending_score)
+        self.assertEqual(decayed_score(None), 0.0)
+        add_events({product.product_id: 1})
+        response = self.client.get(reverse("product-list-create"), {"sort_by": "6"})
+        self.assertEqual(response.data["results"][0]["product_id"], str(product.product_id))
+
+    @override_settings(PRODUCT_TRENDING_HALF_LIFE_HOURS=24)
+    def test_large_exponent_gap(self):
+        """
+        测试事件与已有分数相差超过 1074 个半衰期时不下溢
+
+        PostgreSQL 的 power(2, -1100) 会报错，差值截断后更新成功，较小的一项被忽略
+        """
+        from datetime import timedelta
+        from .trending import LANDMARK, add_events, event_exponent
+
+        empty, old = self.products[:2]
+        add_events({old.product_id: 1}, at=LANDMARK)
+        at = LANDMARK + timedelta(hours=24 * 1100)
+        self.assertEqual(add_events({empty.product_id: 2, old.product_id: 2}, at=at), 2)
+
+        expected = event_exponent(2, at)
+        self.assertAlmostEqual(expected, 1101)
+        for product in (empty, old):
+            self.assertAlmostEqual(Product.objects.get(pk=product.pk).trending_score, expected)
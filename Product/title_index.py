@@ -0,0 +1,323 @@
+"""
+商品标题的进程内倒排索引
+以标题（小写）中相邻两个字符为词元，每个词元对应一个按文档号递增的 array('I') 倒排表。
+任何长度不小于2的子串的全部二元组都出现在标题中，因此倒排表求交得到的是
+title__icontains 结果的超集，调用方再用 icontains 确认。
+
+内存占用：每个商品 16 字节ID（bytearray 连续存放）+ 1 字节删除标记 + 每个二元组 4 字节，
+另有商品ID到文档号的字典（约 110 字节/商品），写入时按商品ID定位文档号不需要扫描；
+每个不同的二元组另有约 100 字节的字典项和数组开销（只出现一次的二元组不建数组）。
+bench_title_index 的随机数据（100 万个标题、约 250 万个不同二元组）实测约 430MB，
+不同二元组越少占用越低。常见二元组组成的查询候选很多，超过 max_candidates 时交给数据库过滤。
+
+通过 PRODUCT_SEARCH_BACKEND = "title_index" 启用。首次查询时从数据库批量构建，
+之后由保存/删除信号在事务提交后增量维护，并每隔 PRODUCT_TITLE_INDEX_REBUILD_SECONDS 秒全量重建
+（回收删除和修改留下的空位，同时纳入其他进程写入的商品）。
+重建期间的增量修改会被记录下来，在新索引替换旧索引前重放，不会丢失。
+
+索引只包含本进程的增量修改，其他副本或进程新增、改名的商品要到下次重建才会进入索引，
+因此过滤时除了索引的候选，还包括索引开始读取数据库之后（减去 PRODUCT_TITLE_INDEX_SNAPSHOT_MARGIN_SECONDS，
+默认60秒，覆盖副本间的时钟偏差和读取时尚未提交的事务）修改过的商品，见 title_filter()。
+"""
+import bisect
+import logging
+import sys
+import threading
+import time
+import uuid
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ID_BYTES = 16
+# 候选数量乘以该值仍小于倒排表长度时，逐个二分查找比遍历倒排表快
+BISECT_RATIO = 64
+
+
+def title_bigrams(text):
+    """
+    标题小写后的相邻二元组（去重）
+
+    二元组编码为整数 (ord(a) << 21) | ord(b)，比两个字符的 str 占用更少内存
+    """
+    text = (text or "").lower()
+    return {(ord(text[i]) << 21) | ord(text[i + 1]) for i in range(len(text) - 1)}
+
+
+def _append(postings, token, doc_id):
+    """只出现在一个商品中的二元组直接保存文档号，第二次出现时再换成数组"""
+    posting = postings.get(token)
+    if posting is None:
+        postings[token] = doc_id
+    elif isinstance(posting, int):
+        postings[token] = array("I", (posting, doc_id))
+    else:
+        posting.append(doc_id)
+
+
+def _posting_size(posting):
+    return 1 if isinstance(posting, int) else len(posting)
+
+
+def _contains(posting, doc_id):
+    position = bisect.bisect_left(posting, doc_id)
+    return position < len(posting) and posting[position] == doc_id
+
+
+class TitleIndex:
+    """标题二元组倒排索引"""
+
+    def __init__(self, max_candidates=10000):
+        """
+        Args:
+            max_candidates: 候选商品超过该数量时放弃使用索引（由数据库过滤更合适）
+        """
+        self.max_candidates = max_candidates
+        self._lock = threading.RLock()
+        # 同一时间只进行一次全量构建
+        self._rebuild_lock = threading.Lock()
+        # 构建期间记录的增量修改 [(product_id, title 或 None 表示删除)]，不在构建时为 None
+        self._changes = None
+        self._reset()
+        self.built = False
+        self.built_at = None
+        # 当前索引开始读取数据的时间，之后的修改不一定在索引中
+        self.snapshot_at = None
+
+    def _reset(self):
+        self._ids = bytearray()  # 文档号 -> 商品ID（每个16字节）
+        self._alive = bytearray()  # 文档号 -> 1 有效 / 0 已删除
+        self._slots = {}  # 商品ID（16字节）-> 有效的文档号
+        self._postings = {}  # 二元组 -> 文档号或递增的 array('I')
+
+    def build(self, rows):
+        """
+        用 (product_id, title) 全量构建索引，构建完成后整体替换
+        构建期间 add/remove 的修改在替换前重放到新索引上（rows 可能是修改前读取的）
+        """
+        with self._rebuild_lock:
+            with self._lock:
+                self._changes = []
+            snapshot_at = timezone.now()
+            try:
+                ids = bytearray()
+                slots = {}
+                postings = {}
+                doc_id = 0
+                for product_id, title in rows:
+                    id_bytes = _id_bytes(product_id)
+                    ids += id_bytes
+                    slots[id_bytes] = doc_id
+                    for token in title_bigrams(title):
+                        _append(postings, token, doc_id)
+                    doc_id += 1
+            except BaseException:
+                with self._lock:
+                    self._changes = None
+                raise
+
+            with self._lock:
+                changes, self._changes = self._changes, None
+                self._ids, self._slots, self._postings = ids, slots, postings
+                self._alive = bytearray(b"\x01") * doc_id
+                for product_id, title in changes:
+                    if title is None:
+                        self._remove(product_id)
+                    else:
+                        self._add(product_id, title)
+                self.built = True
+                self.built_at = time.time()
+                self.snapshot_at = snapshot_at
+            return doc_id
+
+    def accepting_changes(self):
+        """
+        是否需要接收增量修改：已构建，或正在构建（包括首次构建，修改会在替换前重放）
+
+        两者都不是时不需要记录，之后的构建会从数据库读到已提交的修改
+        """
+        with self._lock:
+            return self.built or self._changes is not None
+
+    def add(self, product_id, title):
+        """新增或更新一个商品（旧的文档号标记为删除）"""
+        with self._lock:
+            self._add(product_id, title)
+            if self._changes is not None:
+                self._changes.append((product_id, title))
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+            if self._changes is not None:
+                self._changes.append((product_id, None))
+
+    def _add(self, product_id, title):
+        id_bytes = _id_bytes(product_id)
+        self._remove(id_bytes)
+        doc_id = len(self._alive)
+        self._ids += id_bytes
+        self._alive.append(1)
+        self._slots[id_bytes] = doc_id
+        for token in title_bigrams(title):
+            _append(self._postings, token, doc_id)
+
+    def _remove(self, product_id):
+        doc_id = self._slots.pop(_id_bytes(product_id), None)
+        if doc_id is not None:
+            self._alive[doc_id] = 0
+
+    def search(self, value):
+        """
+        返回标题可能包含 value 的商品ID列表
+
+        value 少于两个字符或候选过多时返回 None，表示索引无法缩小范围
+        """
+        tokens = title_bigrams(value)
+        if not tokens:
+            return None
+
+        with self._lock:
+            postings = []
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is None:
+                    return []
+                postings.append((posting,) if isinstance(posting, int) else posting)
+            postings.sort(key=len)
+            smallest, others = postings[0], postings[1:]
+            if len(smallest) > self.max_candidates * 4:
+                return None
+
+            candidates = set(smallest)
+            for posting in others:
+                if len(candidates) * BISECT_RATIO < len(posting):
+                    # 候选很少时在长倒排表中二分查找
+                    candidates = {doc_id for doc_id in candidates if _contains(posting, doc_id)}
+                else:
+                    # 否则由 set.intersection 在 C 中遍历整个倒排表
+                    candidates = candidates.intersection(posting)
+                if not candidates:
+                    return []
+            alive = self._alive
+            doc_ids = sorted(doc_id for doc_id in candidates if alive[doc_id])
+            if len(doc_ids) > self.max_candidates:
+                return None
+            ids = self._ids
+            return [
+                uuid.UUID(bytes=bytes(ids[doc_id * ID_BYTES:(doc_id + 1) * ID_BYTES]))
+                for doc_id in doc_ids
+            ]
+
+    def stats(self):
+        with self._lock:
+            documents = len(self._alive)
+            postings = sum(_posting_size(posting) for posting in self._postings.values())
+            return {
+                "built": self.built,
+                "built_at": self.built_at,
+                "documents": documents,
+                "live_documents": documents - self._alive.count(0),
+                "tokens": len(self._postings),
+                "postings": postings,
+                "memory_bytes": self.memory_bytes(),
+            }
+
+    def memory_bytes(self):
+        """索引占用的内存（字节）"""
+        with self._lock:
+            total = sys.getsizeof(self._ids) + sys.getsizeof(self._alive)
+            total += sys.getsizeof(self._slots)
+            for id_bytes, doc_id in self._slots.items():
+                total += sys.getsizeof(id_bytes) + sys.getsizeof(doc_id)
+            total += sys.getsizeof(self._postings)
+            for token, posting in self._postings.items():
+                total += sys.getsizeof(token) + sys.getsizeof(posting)
+            return total
+
+
+def _id_bytes(product_id):
+    if isinstance(product_id, bytes):
+        return product_id
+    if isinstance(product_id, uuid.UUID):
+        return product_id.bytes
+    return uuid.UUID(str(product_id)).bytes
+
+
+def backend_enabled():
+    return getattr(settings, "PRODUCT_SEARCH_BACKEND", "database") == "title_index"
+
+
+class _ManagedTitleIndex(TitleIndex):
+    """从数据库懒加载并定期重建的全局索引"""
+
+    def __init__(self):
+        super().__init__(max_candidates=getattr(settings, "PRODUCT_TITLE_INDEX_MAX_CANDIDATES", 10000))
+        self._build_lock = threading.Lock()
+        self._rebuild_thread = None
+
+    def build_from_database(self):
+        from .models import Product
+
+        started = time.monotonic()
+        rows = Product.objects.values_list("product_id", "title").iterator(chunk_size=5000)
+        documents = self.build(rows)
+        logger.info(f"Title index built: {documents} products in {time.monotonic() - started:.2f}s")
+        return documents
+
+    def ensure_built(self):
+        if self.built:
+            return
+        with self._build_lock:
+            if self.built:
+                return
+            self.build_from_database()
+            self._start_rebuild_thread()
+
+    def _start_rebuild_thread(self):
+        interval = getattr(settings, "PRODUCT_TITLE_INDEX_REBUILD_SECONDS", 300)
+        if not interval or self._rebuild_thread is not None:
+            return
+
+        def rebuild_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.build_from_database()
+                except Exception as e:
+                    logger.error(f"Failed to rebuild title index: {e}")
+
+        self._rebuild_thread = threading.Thread(target=rebuild_loop, name="title-index-rebuild", daemon=True)
+        self._rebuild_thread.start()
+
+
+# 全局标题索引实例
+title_index = _ManagedTitleIndex()
+
+
+def title_filter(value):
+    """
+    启用标题索引时返回缩小 title__icontains 范围的条件，否则返回 None（由数据库过滤）
+
+    条件为索引中的候选商品，或索引快照之后修改过的商品（使用 updated_at 索引），
+    调用方仍需用 icontains 确认
+    """
+    if not backend_enabled():
+        return None
+    try:
+        title_index.ensure_built()
+    except Exception as e:
+        logger.error(f"Failed to build title index: {e}")
+        return None
+    with title_index._lock:
+        candidates = title_index.search(value)
+        snapshot_at = title_index.snapshot_at
+    if candidates is None:
+        return None
+    margin = timedelta(seconds=getattr(settings, "PRODUCT_TITLE_INDEX_SNAPSHOT_MARGIN_SECONDS", 60))
+    return Q(pk__in=candidates) | Q(updated_at__gte=snapshot_at - margin)
@@ -0,0 +1,105 @@
+"""
+商品热度（随时间衰减）
+热度为访问、收藏、评价按权重累加并随时间指数衰减的和，半衰期为
+PRODUCT_TRENDING_HALF_LIFE_HOURS 小时（默认24）。
+
+使用固定的基准时间（landmark）做前向衰减：时刻 t 的事件记为 w * 2^((t - LANDMARK) / H)，
+这样已有的分数不需要随时间更新，新事件直接累加，任意时刻各商品分数的大小关系都与衰减后的热度一致。
+这个值随时间指数增长，因此 product.trending_score 保存它的 log2：
+
+    trending_score = log2(Σ w * 2^((t - LANDMARK) / H))
+
+累加在对数域中进行（log2(2^a + 2^b) = max(a, b) + log2(1 + 2^-|a - b|)），分数只随时间线性增长，
+不会溢出，也就不需要定期把所有商品重新缩放或重新计算。
+还没有事件的商品 trending_score 为 NULL（而不是 0，0 表示在 LANDMARK 时刻有一个权重为 1 的事件），
+第一个事件直接写入它的 log2 值；两项相差超过 MAX_EXPONENT_GAP 时较小的一项可以忽略，差值在计算前截断，
+2^-差值 不会下溢（PostgreSQL 的 power() 下溢时报错而不是返回 0）。
+某一时刻的实际热度为 2^(trending_score - (now - LANDMARK) / H)，见 decayed_score()。
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Greatest, Least, Log, Power
+from django.utils import timezone
+
+from .models import Product
+
+LANDMARK = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_WEIGHTS = {"visit": 1.0, "collection": 5.0, "review": 3.0}
+BATCH_SIZE = 500
+# 2^-1000 仍是正常的双精度数，差值更大时较小一项的贡献已小于精度
+MAX_EXPONENT_GAP = 1000.0
+
+
+def half_life_seconds():
+    return getattr(settings, "PRODUCT_TRENDING_HALF_LIFE_HOURS", 24) * 3600
+
+
+def event_weight(kind):
+    return getattr(settings, "PRODUCT_TRENDING_WEIGHTS", DEFAULT_WEIGHTS).get(kind, 0.0)
+
+
+def event_exponent(weight, at=None):
+    """权重为 weight 的事件在 at 时刻发生时对应的 log2 值"""
+    at = at or timezone.now()
+    return math.log2(weight) + (at - LANDMARK).total_seconds() / half_life_seconds()
+
+
+def decayed_score(trending_score, at=None):
+    """trending_score 在 at 时刻的实际热度，没有事件（None）时为 0"""
+    if trending_score is None:
+        return 0.0
+    at = at or timezone.now()
+    return 2.0 ** (trending_score - (at - LANDMARK).total_seconds() / half_life_seconds())
+
+
+def _log_add(field_name, exponent):
+    """对数域的加法：log2(2^field + 2^exponent)，字段为 NULL 时结果为 exponent"""
+    score = F(field_name)
+    gap = Least(Abs(score - exponent), Value(MAX_EXPONENT_GAP))
+    return Case(
+        When(**{f"{field_name}__isnull": True}, then=exponent),
+        default=Greatest(score, exponent) + Log(Value(2.0), Value(1.0) + Power(Value(2.0), -gap)),
+        output_field=FloatField(),
+    )
+
+
+def add_events(weights, at=None):
+    """
+    按商品批量累加事件
+
+    Args:
+        weights: {product_id: 权重之和}
+        at: 事件时间，默认当前时间
+
+    Returns:
+        int: 更新的商品数
+    """
+    at = at or timezone.now()
+    items = sorted(
+        ((product_id, weight) for product_id, weight in weights.items() if weight > 0),
+        key=lambda item: str(item[0]),
+    )
+    updated = 0
+    for start in range(0, len(items), BATCH_SIZE):
+        batch = items[start:start + BATCH_SIZE]
+        exponent = Case(
+            *[
+                When(pk=product_id, then=Value(event_exponent(weight, at)))
+                for product_id, weight in batch
+            ],
+            output_field=FloatField(),
+        )
+        updated += Product.objects.filter(pk__in=[product_id for product_id, _ in batch]).update(
+            trending_score=_log_add("trending_score", exponent)
+        )
+    return updated
+
+
+def record_event(product_id, kind, count=1):
+    """记录一个收藏、评价等事件"""
+    weight = event_weight(kind) * count
+    if weight > 0:
+        add_events({product_id: weight})
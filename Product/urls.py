@@ -70,6 +70,30 @@ urlpatterns = [
         views.ProductPublishListAPIView.as_view(),
         name="product-publish-list",
     ),
+    # 商品筛选统计
+    path(
+        "product/facets/",
+        views.ProductFacetAPIView.as_view(),
+        name="product-facets",
+    ),
+    # 批量获取商品
+    path(
+        "product/bulk/",
+        views.ProductBulkAPIView.as_view(),
+        name="product-bulk",
+    ),
+    # 商品目录导出（NDJSON 流）
+    path(
+        "product/export/",
+        views.ProductExportAPIView.as_view(),
+        name="product-export",
+    ),
+    # 用户变更事件（维护本地卖家目录）
+    path(
+        "product/events/user/",
+        views.UserEventAPIView.as_view(),
+        name="user-event",
+    ),
     # 库存管理相关路由
     path(
         "product/<uuid:product_id>/update-stock/",
@@ -1,9 +1,17 @@
 """
 用户相关的序列化器和工具类
 用于处理从用户服务获取的用户数据
+
+用户信息优先从本地卖家目录（SellerSnapshot）读取，只有本地没有快照的用户才请求用户服务，
+请求到的结果会写入本地目录（可通过 SELLER_SNAPSHOT_REMOTE_FALLBACK 关闭回源）
 """
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from rest_framework import serializers
 from ProductService.user_service import user_service
+from .seller_directory import get_snapshots, upsert_snapshots
 
 
 class UserInfoSerializer(serializers.Serializer):
@@ -18,20 +26,8 @@ class UserInfoSerializer(serializers.Serializer):
     created_at = serializers.DateTimeField(read_only=True, required=False)
 
 
-def get_user_info(user_id):
-    """
-    获取用户信息的辅助函数
-    
-    Args:
-        user_id: 用户ID
-        
-    Returns:
-        dict: 用户信息字典，如果获取失败返回基本信息
-    """
-    if not user_id:
-        return None
-        
-    user_info = user_service.get_user_by_id(user_id)
+def _build_user_info(user_id, user_info):
+    """把用户服务返回的数据整理成统一结构，获取失败时返回基本信息"""
     if user_info:
         return {
             'user_id': user_info.get('user_id'),
@@ -53,3 +49,88 @@ def get_user_info(user_id):
             'privilege': 0,
             'address': None
         }
+
+
+def _normalize_user_ids(user_ids):
+    """去重并过滤掉不是合法UUID的用户ID"""
+    id_map = {}
+    for user_id in user_ids:
+        if not user_id:
+            continue
+        try:
+            id_map[str(uuid.UUID(str(user_id)))] = user_id
+        except ValueError:
+            continue
+    return id_map
+
+
+def _remote_fallback_enabled():
+    return getattr(settings, "SELLER_SNAPSHOT_REMOTE_FALLBACK", True)
+
+
+def get_user_info(user_id):
+    """
+    获取用户信息的辅助函数
+    
+    Args:
+        user_id: 用户ID
+        
+    Returns:
+        dict: 用户信息字典，如果获取失败返回基本信息
+    """
+    if not user_id:
+        return None
+
+    user_infos = get_users_info([user_id])
+    return next(iter(user_infos.values()), None) or _build_user_info(user_id, None)
+
+
+def get_users_info(user_ids):
+    """
+    批量获取用户信息，先读本地卖家目录，缺失的用户每个只请求一次用户服务
+
+    Args:
+        user_ids: 用户ID列表（可重复）
+
+    Returns:
+        dict: {str(user_id): 用户信息字典}
+    """
+    id_map = _normalize_user_ids(user_ids)
+    if not id_map:
+        return {}
+
+    user_infos = get_snapshots(id_map)
+    missing = [key for key in id_map if key not in user_infos]
+    raw_infos = {}
+    if missing and _remote_fallback_enabled():
+        raw_infos = user_service.get_users_by_ids(missing)
+        upsert_snapshots(raw_infos)
+
+    for key in missing:
+        user_infos[key] = _build_user_info(id_map[key], raw_infos.get(key))
+    return user_infos
+
+
+async def aget_users_info(user_ids):
+    """
+    get_users_info 的异步版本，供异步视图并发获取整页用户信息
+
+    Returns:
+        dict: {str(user_id): 用户信息字典}
+    """
+    from ProductService.async_user_service import async_user_service
+
+    id_map = _normalize_user_ids(user_ids)
+    if not id_map:
+        return {}
+
+    user_infos = await sync_to_async(get_snapshots)(id_map)
+    missing = [key for key in id_map if key not in user_infos]
+    raw_infos = {}
+    if missing and _remote_fallback_enabled():
+        raw_infos = await async_user_service.get_users_by_ids(missing)
+        await sync_to_async(upsert_snapshots)(raw_infos)
+
+    for key in missing:
+        user_infos[key] = _build_user_info(id_map[key], raw_infos.get(key))
+    return user_infos
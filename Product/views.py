@@ -3,13 +3,19 @@ import logging
 
 from django.db import transaction
 from django.db.models import Avg
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from rest_framework.parsers import MultiPartParser
 from rest_framework import status
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .pagination import StandardResultsSetPagination
+from .permissions import HasUserEventToken
 from rest_framework.response import Response
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.generics import (
+    GenericAPIView,
     ListAPIView,
     ListCreateAPIView,
     RetrieveUpdateDestroyAPIView,
@@ -27,9 +33,20 @@ from .serializers import (
     CategorySerializer,
     CollectionSerializer,
     ProductSerializer,
+    ProductDetailSerializer,
     ProductMediaSerializer,
+    ProductBulkRequestSerializer,
 )
-from .filters import ProductFilter
+from .cache import CachedListMixin, category_scope
+from .conditional import not_modified, product_etag, set_validators
+from .export import NDJSON_CONTENT_TYPE, accepts_gzip, export_lines
+from .facets import get_facets
+from .fast_serializers import FastProductListMixin, ProductRowSerializer
+from .filters import ProductExportFilter, ProductFilter
+from .projections import ProductProjectionMixin
+from .queries import build_product_queryset, product_prefetches
+from .seller_directory import apply_user_event
+from .visit_buffer import visit_buffer
 from ProductService.user_service import user_service
 
 logger = logging.getLogger(__name__)
@@ -37,7 +54,9 @@ logger = logging.getLogger(__name__)
 # 商品相关视图
 
 
-class ProductListCreateAPIView(ListCreateAPIView):
+class ProductListCreateAPIView(
+    CachedListMixin, FastProductListMixin, ProductProjectionMixin, ListCreateAPIView
+):
     serializer_class = ProductSerializer
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend]
@@ -52,21 +71,11 @@ class ProductListCreateAPIView(ListCreateAPIView):
         sort_by = 2 表示按价格升序
         sort_by = 3 表示按价格降序
         sort_by = 4 表示按评分倒序
+        sort_by = 5 表示按独立访客数倒序
+        sort_by = 6 表示按近期热度倒序（随时间衰减）
         """
-        # 如果查询参数sort_by存在，则按指定字段排序
         sort_by = self.request.query_params.get("sort_by")
-        if sort_by is not None:
-            if sort_by == "0":
-                return Product.objects.all().order_by("-created_at")
-            elif sort_by == "1":
-                return Product.objects.all().order_by("-visit_count")
-            elif sort_by == "2":
-                return Product.objects.all().order_by("price")
-            elif sort_by == "3":
-                return Product.objects.all().order_by("-price")
-            elif sort_by == "4":
-                return Product.objects.all().order_by("-rating_avg")
-        return Product.objects.all().order_by("-created_at")
+        return build_product_queryset(sort_by, projection=self.get_projection())
 
     def perform_create(self, serializer):
         # 获取当前用户ID（来自网关）
@@ -328,23 +337,38 @@ class ProductMediaBulkUpdateView(APIView):
             )
 
 
-class ProductDetailAPIView(RetrieveUpdateDestroyAPIView):
+class ProductDetailAPIView(ProductProjectionMixin, RetrieveUpdateDestroyAPIView):
     queryset = Product.objects.all()
-    serializer_class = ProductSerializer
+    serializer_class = ProductDetailSerializer
     lookup_field = "product_id"
 
+    def get_queryset(self):
+        # 读取时按投影预取分类和图片，卡片视图只返回主图
+        queryset = super().get_queryset()
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.prefetch_related(*product_prefetches(projection=self.get_projection()))
+        return queryset
 
     def retrieve(self, request, *args, **kwargs):
         """获取商品详情并增加访问次数"""
         instance = self.get_object()
         # 增加访问次数
         # 如果是自己的商品则不增加
+        # 访问次数写入缓冲，由后台线程批量写入数据库，响应中的访问次数包含本次访问
         current_user_id = self.request.headers.get('UUID')
         if current_user_id and str(instance.user_id) != str(current_user_id):
+            visit_buffer.add(instance.product_id, visitor_id=current_user_id)
             instance.visit_count += 1
-            instance.save(update_fields=["visit_count"])
+
+        # 商品没有变化时直接返回 304，不序列化也不请求用户服务
+        etag = product_etag(instance, self.get_projection())
+        response = not_modified(request, etag=etag, last_modified=instance.updated_at)
+        if response is not None:
+            return response
         serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        return set_validators(
+            Response(serializer.data), etag=etag, last_modified=instance.updated_at
+        )
 
     def perform_update(self, serializer):
         # 保存商品基本信息
@@ -449,8 +473,12 @@ class UserCollectionListAPIView(ListAPIView):
 
     def get_queryset(self):
         current_user_id = self.request.headers.get('UUID')
-        return Collection.objects.filter(collecter=current_user_id).order_by(
-            "-create_at"
+        # 序列化时需要读取被收藏商品及其分类和图片，一次性关联查询
+        return (
+            Collection.objects.filter(collecter=current_user_id)
+            .select_related("collection")
+            .prefetch_related(*product_prefetches("collection__"))
+            .order_by("-create_at")
         )
 
 
@@ -529,7 +557,9 @@ class CategoryDetailAPIView(RetrieveUpdateDestroyAPIView):
     lookup_field = "category_id"
 
 
-class ProductByCategoryAPIView(ListAPIView):
+class ProductByCategoryAPIView(
+    CachedListMixin, FastProductListMixin, ProductProjectionMixin, ListAPIView
+):
     """获取指定分类下的所有商品"""
 
     serializer_class = ProductSerializer
@@ -537,6 +567,10 @@ class ProductByCategoryAPIView(ListAPIView):
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProductFilter
 
+    def get_cache_scope(self):
+        # 只受该分类下商品的写入影响
+        return category_scope(self.kwargs.get("category_id"))
+
     def get_queryset(self):
         """
         sort_by = 0 表示按创建时间倒序
@@ -544,36 +578,19 @@ class ProductByCategoryAPIView(ListAPIView):
         sort_by = 2 表示按价格升序
         sort_by = 3 表示按价格降序
         sort_by = 4 表示按评分倒序
+        sort_by = 5 表示按独立访客数倒序
+        sort_by = 6 表示按近期热度倒序（随时间衰减）
         """
         category_id = self.kwargs.get("category_id")
-        # 如果查询参数sort_by存在，则按指定字段排序
         sort_by = self.request.query_params.get("sort_by")
-        if sort_by is not None:
-            if sort_by == "0":
-                return Product.objects.filter(
-                    categories__category_id=category_id
-                ).order_by("-created_at")
-            elif sort_by == "1":
-                return Product.objects.filter(
-                    categories__category_id=category_id
-                ).order_by("-visit_count")
-            elif sort_by == "2":
-                return Product.objects.filter(
-                    categories__category_id=category_id
-                ).order_by("price")
-            elif sort_by == "3":
-                return Product.objects.filter(
-                    categories__category_id=category_id
-                ).order_by("-price")
-            elif sort_by == "4":
-                return Product.objects.filter(
-                    categories__category_id=category_id
-                ).order_by("-rating_avg")
-        return Product.objects.filter(categories__category_id=category_id).order_by(
-            "-created_at"
+        return build_product_queryset(
+            sort_by,
+            Product.objects.filter(categories__category_id=category_id),
+            projection=self.get_projection(),
         )
 
-class ProductPublishListAPIView(ListAPIView):
+
+class ProductPublishListAPIView(FastProductListMixin, ProductProjectionMixin, ListAPIView):
     """获取用户自己发布的商品列表或创建新商品"""
     
     serializer_class = ProductSerializer
@@ -583,7 +600,97 @@ class ProductPublishListAPIView(ListAPIView):
 
     def get_queryset(self):
         current_user_id = self.request.query_params.get('user_id')
-        return Product.objects.filter(user_id=current_user_id).order_by('-created_at')
+        return build_product_queryset(
+            queryset=Product.objects.filter(user_id=current_user_id),
+            projection=self.get_projection(),
+        )
+
+
+class ProductFacetAPIView(APIView):
+    """
+    商品筛选统计
+
+    GET: 对 ProductFilter 过滤后的商品返回总数、各状态数量、价格区间分布和各分类数量，
+    参数与商品列表的过滤参数相同
+    """
+
+    def get(self, request):
+        return Response(get_facets(request.query_params))
+
+
+class ProductBulkAPIView(ProductProjectionMixin, GenericAPIView):
+    """
+    批量获取商品详情（供订单、购物车等服务使用）
+
+    GET: ?ids=<id>,<id>...
+    POST: {"product_ids": [...]}
+    按请求顺序返回商品，不存在的ID放在 missing 中；不增加访问次数，
+    同一卖家的用户信息只获取一次。支持 ?fields= / ?view=
+    """
+
+    queryset = Product.objects.all()
+    serializer_class = ProductDetailSerializer
+    projection_methods = ("GET", "HEAD", "POST")
+
+    def get(self, request):
+        ids = [
+            product_id
+            for value in request.query_params.getlist("ids")
+            for product_id in value.split(",")
+            if product_id
+        ]
+        return self.bulk_response({"product_ids": ids})
+
+    def post(self, request):
+        return self.bulk_response(request.data)
+
+    def bulk_response(self, data):
+        request_serializer = ProductBulkRequestSerializer(data=data)
+        request_serializer.is_valid(raise_exception=True)
+        product_ids = request_serializer.validated_data["product_ids"]
+
+        row_serializer = ProductRowSerializer(
+            context=self.get_serializer_context(), serializer_class=self.get_serializer_class()
+        )
+        rows = list(row_serializer.rows(self.get_queryset().filter(product_id__in=product_ids)))
+        found = {
+            row["product_id"]: item
+            for row, item in zip(rows, row_serializer.to_representation(rows))
+        }
+        return Response(
+            {
+                "results": [found[product_id] for product_id in product_ids if product_id in found],
+                "missing": [str(product_id) for product_id in product_ids if product_id not in found],
+            }
+        )
+
+
+class ProductExportAPIView(ProductProjectionMixin, GenericAPIView):
+    """
+    商品目录导出
+
+    GET: 按 updated_at 顺序以 NDJSON 流式输出商品，
+    支持 status、category、created_after、created_before、updated_after 过滤和 ?fields= / ?view=，
+    请求头 Accept-Encoding 包含 gzip 时压缩输出
+    """
+
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProductExportFilter
+
+    def get(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        row_serializer = ProductRowSerializer(context=self.get_serializer_context())
+        content = export_lines(queryset, row_serializer)
+
+        if accepts_gzip(request.headers.get("Accept-Encoding", "")):
+            response = StreamingHttpResponse(compress_sequence(content), content_type=NDJSON_CONTENT_TYPE)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = StreamingHttpResponse(content, content_type=NDJSON_CONTENT_TYPE)
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
 
 
 class ProductUpdateStockAPIView(APIView):
@@ -662,4 +769,34 @@ class ProductUpdateStockAPIView(APIView):
             return Response({
                 'success': False,
                 'error': '库存更新失败'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class UserEventAPIView(APIView):
+    """
+    用户变更事件接收接口
+    用户服务在用户创建、更新、删除时推送事件，用于维护本地卖家目录
+    请求必须在 X-User-Event-Token 头中携带 USER_EVENT_TOKEN，否则返回403
+
+    POST: 接收单个事件或事件列表
+    """
+
+    permission_classes = [HasUserEventToken]
+
+    def post(self, request):
+        events = request.data if isinstance(request.data, list) else [request.data]
+
+        applied = 0
+        ignored = 0
+        for event in events:
+            try:
+                if apply_user_event(event):
+                    applied += 1
+                else:
+                    ignored += 1
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Invalid user event {event}: {e}")
+                return Response(
+                    {"detail": "事件格式错误"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        return Response({"applied": applied, "ignored": ignored})
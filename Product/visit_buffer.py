@@ -0,0 +1,217 @@
+"""
+商品访问量的写缓冲
+详情接口不再在请求中写访问量：访问次数在进程内按商品累加，由后台线程每隔
+PRODUCT_VISIT_FLUSH_SECONDS 秒（默认5）在一个事务中批量写入：
+
+    UPDATE product SET visit_count = visit_count + CASE WHEN product_id = ... THEN ... END
+    WHERE product_id IN (...)
+
+增量加在数据库中的当前值上，多个进程同时写入也不会丢失计数。写入失败时增量放回缓冲，
+下次重试；进程退出（atexit）和优雅关闭时写入剩余的增量。
+PRODUCT_VISIT_FLUSH_SECONDS = 0 时不缓冲，每次访问直接写入。
+
+带访客ID的访问同时记入访客 sketch：缓冲中只保存变化的 HyperLogLog 寄存器，
+写入时与数据库中的 sketch 取最大值合并，并更新 product.unique_visitors。
+访问次数同时累加到近期热度（见 Product.trending），事件时间按写入时间计。
+"""
+import atexit
+import logging
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from .hll import HyperLogLog, register_for
+from .models import Product, ProductVisitorSketch
+from .trending import add_events, event_weight
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def flush_interval():
+    return getattr(settings, "PRODUCT_VISIT_FLUSH_SECONDS", 5)
+
+
+def apply_visits(deltas, batch_size=BATCH_SIZE):
+    """
+    在一个事务中把访问增量加到 visit_count 上
+
+    Args:
+        deltas: {product_id: 增量}
+
+    Returns:
+        int: 更新的商品数
+    """
+    # 按固定顺序更新，多个进程同时写入时加锁顺序一致，不会死锁
+    items = sorted(deltas.items(), key=lambda item: str(item[0]))
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            updated += Product.objects.filter(pk__in=[product_id for product_id, _ in batch]).update(
+                visit_count=F("visit_count")
+                + Case(
+                    *[When(pk=product_id, then=Value(delta)) for product_id, delta in batch],
+                    default=Value(0),
+                    output_field=PositiveIntegerField(),
+                )
+            )
+    return updated
+
+
+def apply_visitor_registers(registers):
+    """
+    把访客寄存器合并到数据库中的 sketch，并更新 unique_visitors
+
+    Args:
+        registers: {product_id: {寄存器序号: rho}}
+
+    Returns:
+        int: sketch 有变化的商品数
+    """
+    product_ids = sorted(registers, key=str)
+    with transaction.atomic():
+        sketches = {
+            sketch.product_id: sketch
+            for sketch in ProductVisitorSketch.objects.select_for_update()
+            .filter(product_id__in=product_ids)
+            .order_by("product_id")
+        }
+        existing_products = set(
+            Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True)
+        )
+        now = timezone.now()
+        created, updated, counts = [], [], {}
+        for product_id in product_ids:
+            if product_id not in existing_products:
+                continue
+            sketch = sketches.get(product_id)
+            hll = HyperLogLog.from_bytes(sketch.registers) if sketch else HyperLogLog()
+            if not hll.update(registers[product_id]) and sketch:
+                continue
+            counts[product_id] = hll.count()
+            if sketch:
+                sketch.registers = hll.to_bytes()
+                sketch.updated_at = now
+                updated.append(sketch)
+            else:
+                created.append(ProductVisitorSketch(product_id=product_id, registers=hll.to_bytes()))
+
+        # 其他进程同时创建同一商品的 sketch 时主键冲突，事务回滚后由调用方重试，重试时合并到已有的 sketch
+        ProductVisitorSketch.objects.bulk_create(created)
+        ProductVisitorSketch.objects.bulk_update(updated, ["registers", "updated_at"])
+        if counts:
+            Product.objects.filter(pk__in=list(counts)).update(
+                unique_visitors=Case(
+                    *[When(pk=product_id, then=Value(count)) for product_id, count in counts.items()],
+                    output_field=PositiveIntegerField(),
+                )
+            )
+    return len(counts)
+
+
+def _merge_registers(pending, product_id, registers):
+    target = pending.setdefault(product_id, {})
+    for index, rho in registers.items():
+        if rho > target.get(index, 0):
+            target[index] = rho
+
+
+class VisitBuffer:
+    """进程内的访问量缓冲"""
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = Counter()
+        self._visitors = {}  # {product_id: {寄存器序号: rho}}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add(self, product_id, count=1, visitor_id=None):
+        """记录访问；未启用缓冲时直接写入数据库"""
+        product_id = uuid.UUID(str(product_id))
+        registers = {}
+        if visitor_id:
+            index, rho = register_for(visitor_id)
+            registers[index] = rho
+        interval = flush_interval()
+        if not interval:
+            self._apply({product_id: count}, {product_id: registers} if registers else {})
+            return
+        with self._lock:
+            self._pending[product_id] += count
+            if registers:
+                _merge_registers(self._visitors, product_id, registers)
+            start = self._thread is None
+            if start:
+                self._thread = threading.Thread(
+                    target=self._run, args=(interval,), name="visit-buffer-flush", daemon=True
+                )
+        if start:
+            atexit.register(self.flush)
+            self._thread.start()
+
+    def pending(self):
+        """尚未写入数据库的增量"""
+        with self._lock:
+            return dict(self._pending)
+
+    def pending_visitors(self):
+        """尚未合并到数据库的访客寄存器"""
+        with self._lock:
+            return {product_id: dict(registers) for product_id, registers in self._visitors.items()}
+
+    def flush(self):
+        """
+        写入缓冲中的全部增量，失败时放回缓冲
+
+        Returns:
+            int: 更新的商品数
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                visitors, self._visitors = self._visitors, {}
+            if not pending and not visitors:
+                return 0
+            try:
+                return self._apply(pending, visitors)
+            except Exception as e:
+                logger.error(f"Failed to flush {len(pending)} product visit counts: {e}")
+                with self._lock:
+                    self._pending.update(pending)
+                    for product_id, registers in visitors.items():
+                        _merge_registers(self._visitors, product_id, registers)
+                return 0
+
+    def _apply(self, pending, visitors):
+        with transaction.atomic():
+            updated = apply_visits(pending, self.batch_size)
+            if visitors:
+                apply_visitor_registers(visitors)
+            weight = event_weight("visit")
+            add_events({product_id: count * weight for product_id, count in pending.items()})
+        return updated
+
+    def stop(self):
+        """停止后台线程并写入剩余的增量（优雅关闭时调用）"""
+        self._stopped.set()
+        return self.flush()
+
+    def _run(self, interval):
+        while not self._stopped.wait(interval):
+            # 后台线程使用自己的数据库连接，写入前清理超时或失效的连接
+            close_old_connections()
+            self.flush()
+
+
+# 全局访问量缓冲
+visit_buffer = VisitBuffer()
@@ -15,10 +15,21 @@ class ProductServiceConfig(AppConfig):
         # 注册信号处理器用于优雅关闭
         signal.signal(signal.SIGTERM, self._graceful_shutdown)
         signal.signal(signal.SIGINT, self._graceful_shutdown)
+
+        # 后台注册到 Nacos，不阻塞启动
+        from .nacos_register import start_registration_in_background
+        start_registration_in_background()
     
     def _graceful_shutdown(self, signum, frame):
         """优雅关闭处理"""
         print(f"\n🔄 Received signal {signum}, starting graceful shutdown...")
+
+        try:
+            from Product.visit_buffer import visit_buffer
+            visit_buffer.stop()
+            print("✅ Product visit counts flushed")
+        except Exception as e:
+            print(f"❌ Error flushing product visit counts: {e}")
         
         try:
             from .nacos_health import stop_nacos_health_monitoring
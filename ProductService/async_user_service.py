@@ -0,0 +1,205 @@
+"""
+异步用户服务客户端
+供 ASGI 部署下的异步视图使用，语义与 UserServiceClient.get_user_by_id 相同，
+并提供有并发上限的批量查询。缓存、实例表、熔断器和重试预算与同步客户端共享。
+"""
+import asyncio
+import logging
+import os
+import time
+
+import aiohttp
+
+from .singleflight import AsyncSingleFlight
+from .user_cache import UserInfoCache
+from .user_service import CircuitOpenError, NoInstanceError, UserServiceUnavailable, user_service
+
+logger = logging.getLogger(__name__)
+
+
+class _RetryableError(Exception):
+    """连接失败、超时或 5xx，可以换一个实例重试"""
+
+
+class AsyncUserServiceClient:
+    """异步用户服务客户端"""
+
+    def __init__(self, sync_client=None, base_url=None, max_concurrency=None):
+        """
+        Args:
+            sync_client: 共享缓存和容错状态的同步客户端，默认使用全局实例
+            base_url: 固定的用户服务地址，设置后不再通过 Nacos 选择实例
+            max_concurrency: 批量查询的最大并发数
+        """
+        self._sync = sync_client or user_service
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency or int(os.getenv('USER_SERVICE_MAX_CONCURRENCY', '8'))
+        connect_timeout, read_timeout = self._sync.timeout
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self._sessions = {}  # {事件循环: (会话, 关闭会话的任务)}
+        self._refresh_tasks = {}
+        # 同一用户的并发查询只发出一个请求
+        self._singleflight = AsyncSingleFlight()
+
+    @property
+    def cache(self):
+        return self._sync.cache
+
+    def _get_session(self):
+        """
+        当前事件循环的 aiohttp 会话
+
+        会话绑定事件循环，每个循环使用自己的会话。创建会话时在该循环中启动一个等待任务，
+        循环结束时（asyncio.run 会取消剩余任务）任务被取消并关闭会话，连接不会泄漏。
+        """
+        loop = asyncio.get_running_loop()
+        session, _ = self._sessions.get(loop, (None, None))
+        if session is None or session.closed:
+            # 清理已关闭的事件循环留下的记录
+            for closed_loop in [key for key in self._sessions if key.is_closed()]:
+                del self._sessions[closed_loop]
+            connector = aiohttp.TCPConnector(limit_per_host=self._sync.pool_maxsize)
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            # 保留任务的引用，事件循环只弱引用任务
+            self._sessions[loop] = (session, loop.create_task(self._close_on_shutdown(loop, session)))
+        return session
+
+    async def _close_on_shutdown(self, loop, session):
+        try:
+            await loop.create_future()
+        finally:
+            if self._sessions.get(loop, (None, None))[0] is session:
+                del self._sessions[loop]
+            await session.close()
+
+    async def close(self):
+        """关闭当前事件循环的会话"""
+        session, closer = self._sessions.pop(asyncio.get_running_loop(), (None, None))
+        if closer is not None:
+            closer.cancel()
+        if session is not None:
+            await session.close()
+
+    async def _request_once(self, user_id):
+        """发送一次请求；未指定 base_url 时通过共享实例表选择实例"""
+        instance = None
+        if self.base_url:
+            service_url = self.base_url
+        else:
+            instances = self._sync.instances
+            if not instances.started:
+                # 首次使用时创建 Nacos 客户端并同步拉取实例列表，放到线程中执行，不阻塞事件循环
+                await asyncio.to_thread(instances.start)
+            instance = instances.pick()
+            if not instance:
+                raise NoInstanceError("UserService not available")
+            service_url = instance.url
+
+        started = time.monotonic()
+        success = False
+        try:
+            url = f"{service_url}/api/v1/user/me/"
+            async with self._get_session().get(url, headers={"UUID": user_id}) as response:
+                if response.status >= 500:
+                    raise _RetryableError(f"UserService returned {response.status}")
+                success = True
+                if response.status == 404:
+                    return None
+                if response.status >= 400:
+                    raise UserServiceUnavailable(f"UserService returned {response.status}")
+                return await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise _RetryableError(str(e) or e.__class__.__name__) from e
+        finally:
+            if instance is not None:
+                self._sync.instances.release(instance, time.monotonic() - started, success)
+
+    async def _fetch_user(self, user_id):
+        """与同步客户端相同的熔断和重试预算逻辑"""
+        breaker = self._sync.breaker
+        retry_budget = self._sync.retry_budget
+        if not breaker.allow_request():
+            raise CircuitOpenError("UserService circuit breaker is open")
+
+        retry_budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                result = await self._request_once(user_id)
+            except _RetryableError as e:
+                if attempt < self._sync.max_retries and retry_budget.try_acquire():
+                    attempt += 1
+                    continue
+                breaker.record_failure()
+                raise UserServiceUnavailable(str(e)) from e
+            except NoInstanceError:
+                breaker.record_skipped()
+                raise
+            except UserServiceUnavailable:
+                breaker.record_failure()
+                raise
+            breaker.record_success()
+            return result
+
+    async def get_user_by_id(self, user_id):
+        """根据用户ID获取用户信息（优先读取本地缓存）"""
+        if user_id:
+            user_id = str(user_id)
+
+        state, user_info = self.cache.get(user_id)
+        if state == UserInfoCache.FRESH:
+            return user_info
+        if state == UserInfoCache.STALE:
+            self._refresh_in_background(user_id)
+            return user_info
+
+        try:
+            return await self._load_user(user_id)
+        except CircuitOpenError:
+            return None
+        except UserServiceUnavailable as e:
+            logger.error(f"Failed to get user {user_id}: {e}")
+            return None
+
+    async def _load_user(self, user_id):
+        """请求用户服务并写入缓存，相同用户的并发调用共享一次请求"""
+        async def load():
+            user_info = await self._fetch_user(user_id)
+            self.cache.set(user_id, user_info)
+            return user_info
+
+        return await self._singleflight.do(user_id, load)
+
+    def _refresh_in_background(self, user_id):
+        if user_id in self._refresh_tasks:
+            return
+        task = asyncio.get_running_loop().create_task(self._refresh(user_id))
+        self._refresh_tasks[user_id] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(user_id, None))
+
+    async def _refresh(self, user_id):
+        try:
+            await self._load_user(user_id)
+        except UserServiceUnavailable as e:
+            logger.warning(f"Failed to refresh user {user_id}: {e}")
+
+    async def get_users_by_ids(self, user_ids):
+        """
+        并发获取多个用户信息，同时在途的请求数不超过 max_concurrency
+
+        Returns:
+            dict: {str(user_id): 用户信息或None}
+        """
+        unique_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids if user_id))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(user_id):
+            async with semaphore:
+                return await self.get_user_by_id(user_id)
+
+        results = await asyncio.gather(*(fetch(user_id) for user_id in unique_ids))
+        return dict(zip(unique_ids, results))
+
+
+# 全局异步用户服务客户端实例
+async_user_service = AsyncUserServiceClient()
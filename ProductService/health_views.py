@@ -28,4 +28,35 @@ def nacos_health_check(request):
             'timestamp': int(time.time() * 1000),
             'service': 'ProductService',
             'error': str(e)
-        }, status=503)
\ No newline at end of file
+        }, status=503)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def user_service_metrics(request):
+    """
+    用户服务调用指标
+    包括熔断器状态、重试预算、连接池使用情况、实例表和用户信息缓存
+    """
+    from .user_service import user_service
+
+    return JsonResponse({
+        'timestamp': int(time.time() * 1000),
+        'service': 'UserService',
+        'metrics': user_service.metrics(),
+    }, status=200)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def product_cache_metrics(request):
+    """
+    商品列表响应缓存指标
+    包括命中率、失效次数和命中缓存项的存活时间（滞后窗口）
+    """
+    from Product.cache import stats
+
+    return JsonResponse({
+        'timestamp': int(time.time() * 1000),
+        'metrics': stats.snapshot(),
+    }, status=200)
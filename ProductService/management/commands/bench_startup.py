@@ -0,0 +1,77 @@
+"""
+冷启动耗时基准
+在全新的子进程中测量 django.setup()、URLconf 导入和第一次 /health/ 请求的耗时
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 子进程中执行的测量脚本，输出各阶段耗时（毫秒）
+CHILD_SCRIPT = """
+import json, os, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_done = time.perf_counter()
+from django.test import Client
+response = Client().get('/health/')
+health_done = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (setup_done - started) * 1000,
+    'urlconf_ms': (urls_done - setup_done) * 1000,
+    'first_health_ms': (health_done - urls_done) * 1000,
+    'total_ms': (health_done - started) * 1000,
+    'status': response.status_code,
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = "测量冷启动到第一次 /health/ 响应的耗时"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="测量次数")
+        parser.add_argument(
+            "--max-ms", type=float, default=None, help="总耗时中位数超过该值时返回失败"
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE)
+
+        samples = []
+        for _ in range(options["runs"]):
+            result = subprocess.run(
+                [sys.executable, "-c", CHILD_SCRIPT],
+                cwd=str(settings.BASE_DIR),
+                env=env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if result.returncode != 0:
+                raise CommandError(f"Startup run failed:\n{result.stderr}")
+            sample = json.loads(result.stdout.strip().splitlines()[-1])
+            if sample["status"] != 200:
+                raise CommandError(f"/health/ returned {sample['status']}")
+            samples.append(sample)
+
+        for key in ("setup_ms", "urlconf_ms", "first_health_ms", "total_ms"):
+            values = [sample[key] for sample in samples]
+            self.stdout.write(
+                f"{key:>16}: min {min(values):8.1f}  median {statistics.median(values):8.1f}  max {max(values):8.1f}"
+            )
+
+        median_total = statistics.median(sample["total_ms"] for sample in samples)
+        if options["max_ms"] is not None and median_total > options["max_ms"]:
+            raise CommandError(
+                f"Median cold start {median_total:.1f}ms exceeds {options['max_ms']:.1f}ms"
+            )
@@ -1,17 +1,25 @@
 """
 简单的 Nacos 服务注册
+注册在应用就绪后由后台线程完成，每个进程只执行一次，不阻塞 URLconf 导入和请求处理
 """
 import os
 import socket
+import sys
+import threading
 import time
+
+from django.conf import settings
 from nacos import NacosClient
 
+_registration_lock = threading.Lock()
+_registration_started = False
+
 
 def register_to_nacos():
     """注册服务到 Nacos"""
     try:
-        # 等待网络连接就绪
-        time.sleep(3)
+        # 等待网络连接就绪（在后台线程中执行，不影响启动）
+        time.sleep(float(os.getenv('NACOS_REGISTER_DELAY', '3')))
         
         # Nacos 配置
         nacos_server = os.getenv('NACOS_SERVER', '123.57.145.79:8848')
@@ -107,3 +115,43 @@ def register_to_nacos():
         import traceback
         traceback.print_exc()
         return False
+
+
+def _should_register():
+    """
+    只有真正提供服务的进程才注册
+
+    需要显式开启 NACOS_REGISTER_ENABLED（默认关闭，部署配置中开启），测试、脚本等进程不会注册到
+    配置的 Nacos；开启后仍跳过 test、migrate 等管理命令
+    """
+    if not getattr(settings, 'NACOS_REGISTER_ENABLED', False):
+        return False
+
+    argv = sys.argv
+    if len(argv) > 1 and os.path.basename(argv[0]) == 'manage.py':
+        if argv[1] != 'runserver':
+            return False
+        # 自动重载模式下只有子进程真正提供服务
+        if '--noreload' not in argv and os.environ.get('RUN_MAIN') != 'true':
+            return False
+    return True
+
+
+def start_registration_in_background():
+    """
+    在后台线程中注册到 Nacos 并启动心跳，每个进程只启动一次
+
+    Returns:
+        bool: 是否启动了注册线程
+    """
+    global _registration_started
+
+    with _registration_lock:
+        if _registration_started or not _should_register():
+            return False
+        _registration_started = True
+
+    threading.Thread(
+        target=register_to_nacos, daemon=True, name="NacosRegister"
+    ).start()
+    return True
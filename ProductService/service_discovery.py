@@ -0,0 +1,180 @@
+"""
+服务实例发现与客户端负载均衡
+后台定时从 Nacos 拉取实例列表，按 EWMA 延迟和在途请求数选择实例，连续失败的实例会被暂时摘除
+"""
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceInstance:
+    """单个服务实例及其负载均衡统计"""
+
+    def __init__(self, ip, port):
+        self.ip = ip
+        self.port = port
+        self.ewma_latency = 0.0  # 秒，新实例为0以便尽快被探测
+        self.outstanding = 0  # 在途请求数
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def key(self):
+        return (self.ip, self.port)
+
+    @property
+    def url(self):
+        return f"http://{self.ip}:{self.port}"
+
+    def score(self):
+        """分数越低越优先"""
+        return self.ewma_latency * (self.outstanding + 1)
+
+    def to_dict(self, now):
+        return {
+            'url': self.url,
+            'ewma_latency_ms': round(self.ewma_latency * 1000, 2),
+            'outstanding': self.outstanding,
+            'consecutive_failures': self.consecutive_failures,
+            'ejected': self.ejected_until > now,
+        }
+
+
+class ServiceInstanceTable:
+    """
+    服务实例表
+
+    - 首次使用时同步拉取一次实例列表，之后由后台线程按 refresh_interval 刷新；
+      首次拉取期间其他调用方等待拉取完成，不会拿到空的实例表
+    - pick() 使用 power-of-two-choices：随机取两个可用实例，选 EWMA 延迟 × (在途请求数 + 1) 较小者
+    - 连续失败 eject_threshold 次的实例摘除 eject_seconds 秒；全部被摘除时退化为使用全部实例
+    """
+
+    def __init__(
+        self,
+        service_name,
+        nacos_client_getter,
+        refresh_interval=10,
+        ewma_alpha=0.3,
+        eject_threshold=3,
+        eject_seconds=30,
+        clock=time.monotonic,
+    ):
+        self.service_name = service_name
+        self._nacos_client_getter = nacos_client_getter
+        self.refresh_interval = refresh_interval
+        self.ewma_alpha = ewma_alpha
+        self.eject_threshold = eject_threshold
+        self.eject_seconds = eject_seconds
+        self._clock = clock
+        self._instances = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        # 首次拉取和启动后台线程时持有，与保护实例表的 _lock 分开，拉取期间 refresh() 仍可更新实例表
+        self._start_lock = threading.Lock()
+        self._refresh_thread = None
+
+    def refresh(self):
+        """从 Nacos 拉取健康实例，保留已有实例的统计数据"""
+        nacos_client = self._nacos_client_getter()
+        if not nacos_client:
+            return False
+
+        try:
+            result = nacos_client.list_naming_instance(self.service_name)
+        except Exception as e:
+            logger.error(f"Failed to list instances for {self.service_name}: {e}")
+            return False
+
+        healthy_hosts = [host for host in result.get('hosts', []) if host.get('healthy', False)]
+        with self._lock:
+            instances = {}
+            for host in healthy_hosts:
+                key = (host['ip'], host['port'])
+                instances[key] = self._instances.get(key) or ServiceInstance(*key)
+            self._instances = instances
+            self._loaded = True
+
+        if not healthy_hosts:
+            logger.warning(f"No healthy instances found for {self.service_name}")
+        return True
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            self.refresh()
+
+    @property
+    def started(self):
+        """是否已完成首次拉取并启动后台刷新"""
+        return self._refresh_thread is not None
+
+    def start(self):
+        """首次拉取实例列表并启动后台刷新，已启动时直接返回"""
+        if self._refresh_thread is not None:
+            return
+        with self._start_lock:
+            if self._refresh_thread is not None:
+                return
+            # 首次拉取在锁内完成，并发的调用方等待拉取结束后再选择实例
+            if not self._loaded:
+                self.refresh()
+            refresh_thread = threading.Thread(
+                target=self._refresh_loop, daemon=True, name=f"{self.service_name}Discovery"
+            )
+            refresh_thread.start()
+            self._refresh_thread = refresh_thread
+
+    def pick(self):
+        """
+        选择一个实例并记为在途请求，调用方用完后必须调用 release()
+
+        Returns:
+            ServiceInstance: 没有可用实例时返回 None
+        """
+        self.start()
+        now = self._clock()
+        with self._lock:
+            instances = list(self._instances.values())
+            if not instances:
+                return None
+
+            available = [instance for instance in instances if instance.ejected_until <= now]
+            candidates = available or instances
+            if len(candidates) == 1:
+                instance = candidates[0]
+            else:
+                first, second = random.sample(candidates, 2)
+                instance = first if first.score() <= second.score() else second
+
+            instance.outstanding += 1
+            return instance
+
+    def release(self, instance, latency, success):
+        """记录一次请求结果，更新延迟和失败统计"""
+        with self._lock:
+            instance.outstanding = max(0, instance.outstanding - 1)
+            if success:
+                if instance.ewma_latency:
+                    instance.ewma_latency += self.ewma_alpha * (latency - instance.ewma_latency)
+                else:
+                    instance.ewma_latency = latency
+                instance.consecutive_failures = 0
+                return
+
+            instance.consecutive_failures += 1
+            if instance.consecutive_failures >= self.eject_threshold:
+                instance.ejected_until = self._clock() + self.eject_seconds
+                instance.consecutive_failures = 0
+                logger.warning(
+                    f"Ejected {self.service_name} instance {instance.url} for {self.eject_seconds}s"
+                )
+
+    def snapshot(self):
+        """当前实例表的统计信息"""
+        now = self._clock()
+        with self._lock:
+            return [instance.to_dict(now) for instance in self._instances.values()]
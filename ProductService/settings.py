@@ -122,10 +122,24 @@ MINIO_STORAGE_ACCESS_KEY = os.getenv('MINIO_ACCESS_KEY', 'MtLNeBT0lJ7QKiwUhCBX')
 MINIO_STORAGE_SECRET_KEY = os.getenv('MINIO_SECRET_KEY', 'fCzYlkjcrhf7sgOpUHmKV5JvoOWbfAe40ryM8k6W')
 MINIO_STORAGE_USE_HTTPS = False  # 使用 HTTP 而不是 HTTPS
 MINIO_STORAGE_MEDIA_BUCKET_NAME = 'img'
+# 启动时不检查 bucket 是否存在，避免每个进程导入模型时都访问一次 MinIO
+MINIO_STORAGE_ASSUME_MEDIA_BUCKET_EXISTS = os.getenv('MINIO_ASSUME_BUCKET_EXISTS', 'true').lower() == 'true'
 
 # Django REST Framework 配置 - 禁用认证
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [],
     'DEFAULT_PERMISSION_CLASSES': [],
+    # 输出与 JSONRenderer 相同，使用 orjson 编码
+    'DEFAULT_RENDERER_CLASSES': [
+        'Product.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# 是否把本进程注册到 Nacos，默认关闭；只在部署配置（docker-compose、k8s）中开启，
+# 测试、管理命令和临时脚本不会注册到生产环境的 Nacos
+NACOS_REGISTER_ENABLED = os.getenv('NACOS_REGISTER_ENABLED', 'false').lower() == 'true'
+
+# 用户变更事件接口（/api/product/events/user/）的共享密钥，用户服务推送事件时放在 X-User-Event-Token 头中；
+# 未配置时该接口拒绝所有请求
+USER_EVENT_TOKEN = os.getenv('USER_EVENT_TOKEN', '')
@@ -0,0 +1,572 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch, Mock
+import asyncio
+import json
+import requests
+import threading
+import time
+import uuid
+
+from . import nacos_register
+from .async_user_service import AsyncUserServiceClient
+from .resilience import CircuitBreaker, RetryBudget
+from .service_discovery import ServiceInstanceTable
+from .singleflight import SingleFlight
+from .user_cache import UserInfoCache
+from .user_service import UserServiceClient, UserServiceUnavailable
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class UserInfoCacheTest(SimpleTestCase):
+    """测试用户信息缓存"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = UserInfoCache(max_size=2, ttl=10, negative_ttl=2, stale_ttl=30, clock=self.clock)
+
+    def test_fresh_stale_and_expired(self):
+        """测试新鲜、过期可用和完全过期三种状态"""
+        self.cache.set('u1', {'username': 'a'})
+        self.assertEqual(self.cache.get('u1'), (UserInfoCache.FRESH, {'username': 'a'}))
+
+        self.clock.advance(11)
+        self.assertEqual(self.cache.get('u1'), (UserInfoCache.STALE, {'username': 'a'}))
+
+        self.clock.advance(30)
+        self.assertEqual(self.cache.get('u1'), (UserInfoCache.MISS, None))
+
+    def test_negative_cache_has_short_ttl(self):
+        """测试不存在的用户使用短TTL且不返回旧值"""
+        self.cache.set('missing', None)
+        self.assertEqual(self.cache.get('missing'), (UserInfoCache.FRESH, None))
+
+        self.clock.advance(3)
+        self.assertEqual(self.cache.get('missing'), (UserInfoCache.MISS, None))
+
+    def test_lru_eviction_and_stats(self):
+        """测试超过容量时淘汰最久未使用的条目"""
+        self.cache.set('u1', {'username': 'a'})
+        self.cache.set('u2', {'username': 'b'})
+        self.cache.get('u1')
+        self.cache.set('u3', {'username': 'c'})
+
+        self.assertEqual(self.cache.get('u2')[0], UserInfoCache.MISS)
+        self.assertEqual(self.cache.get('u1')[0], UserInfoCache.FRESH)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+
+
+class UserServiceClientCacheTest(SimpleTestCase):
+    """测试用户服务客户端的缓存行为"""
+
+    def setUp(self):
+        self.client = UserServiceClient()
+        self.clock = FakeClock()
+        self.client.cache = UserInfoCache(ttl=10, negative_ttl=2, stale_ttl=30, clock=self.clock)
+        self.user_id = str(uuid.uuid4())
+
+    def test_repeated_lookup_hits_cache(self):
+        """测试重复查询只请求一次用户服务"""
+        with patch.object(self.client, '_fetch_user', return_value={'username': 'a'}) as fetch:
+            self.assertEqual(self.client.get_user_by_id(self.user_id), {'username': 'a'})
+            self.assertEqual(self.client.get_user_by_id(uuid.UUID(self.user_id)), {'username': 'a'})
+        fetch.assert_called_once_with(self.user_id)
+
+    def test_unknown_user_is_negatively_cached(self):
+        """测试不存在的用户也会被缓存"""
+        with patch.object(self.client, '_fetch_user', return_value=None) as fetch:
+            self.assertIsNone(self.client.get_user_by_id(self.user_id))
+            self.assertIsNone(self.client.get_user_by_id(self.user_id))
+        fetch.assert_called_once()
+
+    def test_service_error_is_not_cached(self):
+        """测试用户服务异常时不写入缓存"""
+        with patch.object(self.client, '_fetch_user', side_effect=UserServiceUnavailable('down')) as fetch:
+            self.assertIsNone(self.client.get_user_by_id(self.user_id))
+            self.assertIsNone(self.client.get_user_by_id(self.user_id))
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_stale_entry_is_served_and_refreshed(self):
+        """测试过期条目先返回旧值，再在后台刷新"""
+        self.client.cache.set(self.user_id, {'username': 'old'})
+        self.clock.advance(11)
+
+        release = threading.Event()
+
+        def fetch(user_id):
+            release.wait(timeout=2)
+            return {'username': 'new'}
+
+        with patch.object(self.client, '_fetch_user', side_effect=fetch):
+            self.assertEqual(self.client.get_user_by_id(self.user_id), {'username': 'old'})
+            release.set()
+            self.client._refresh_executor.shutdown(wait=True)
+
+        self.assertEqual(self.client.get_user_by_id(self.user_id), {'username': 'new'})
+
+
+class FakeNacosClient:
+    """只实现实例查询的 Nacos 客户端"""
+
+    def __init__(self, hosts):
+        self.hosts = hosts
+        self.list_calls = 0
+
+    def list_naming_instance(self, service_name):
+        self.list_calls += 1
+        return {'hosts': self.hosts}
+
+
+class ServiceInstanceTableTest(SimpleTestCase):
+    """测试服务实例表和负载均衡"""
+
+    def setUp(self):
+        self.nacos_client = FakeNacosClient([
+            {'ip': '10.0.0.1', 'port': 8000, 'healthy': True},
+            {'ip': '10.0.0.2', 'port': 8000, 'healthy': True},
+            {'ip': '10.0.0.3', 'port': 8000, 'healthy': False},
+        ])
+        self.clock = FakeClock()
+        self.table = ServiceInstanceTable(
+            'UserService', lambda: self.nacos_client, refresh_interval=3600,
+            eject_threshold=2, eject_seconds=30, clock=self.clock,
+        )
+
+    def test_instances_are_cached_between_picks(self):
+        """测试多次选择实例只查询一次 Nacos，且只使用健康实例"""
+        urls = set()
+        for _ in range(20):
+            instance = self.table.pick()
+            urls.add(instance.url)
+            self.table.release(instance, 0.01, True)
+
+        self.assertEqual(self.nacos_client.list_calls, 1)
+        self.assertEqual(urls, {'http://10.0.0.1:8000', 'http://10.0.0.2:8000'})
+
+    def test_prefers_faster_instance(self):
+        """测试优先选择延迟更低的实例"""
+        for _ in range(2):
+            instance = self.table.pick()
+            self.table.release(instance, 0.5 if instance.ip == '10.0.0.1' else 0.01, True)
+        picks = []
+        for _ in range(10):
+            instance = self.table.pick()
+            picks.append(instance.ip)
+            self.table.release(instance, 0.5 if instance.ip == '10.0.0.1' else 0.01, True)
+
+        self.assertTrue(all(ip == '10.0.0.2' for ip in picks[1:]))
+
+    def test_failing_instance_is_ejected_temporarily(self):
+        """测试连续失败的实例被暂时摘除"""
+        self.table.refresh()
+        bad = next(i for i in self.table._instances.values() if i.ip == '10.0.0.1')
+        bad.outstanding += 2
+        self.table.release(bad, 0.01, False)
+        self.table.release(bad, 0.01, False)
+
+        for _ in range(10):
+            instance = self.table.pick()
+            self.assertEqual(instance.ip, '10.0.0.2')
+            self.table.release(instance, 0.01, True)
+
+        self.clock.advance(31)
+        self.table.refresh()
+        ips = set()
+        for _ in range(30):
+            instance = self.table.pick()
+            ips.add(instance.ip)
+            self.table.release(instance, 0.0, True)
+        self.assertIn('10.0.0.1', ips)
+
+
+    def test_concurrent_first_picks_wait_for_initial_load(self):
+        """测试首次拉取期间并发的调用方等待拉取完成，而不是拿到空的实例表"""
+        list_naming_instance = self.nacos_client.list_naming_instance
+
+        def slow_list(service_name):
+            time.sleep(0.2)
+            return list_naming_instance(service_name)
+
+        self.nacos_client.list_naming_instance = slow_list
+        picks = []
+
+        def pick():
+            picks.append(self.table.pick())
+
+        threads = [threading.Thread(target=pick) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(picks), 8)
+        self.assertTrue(all(instance is not None for instance in picks))
+        self.assertEqual(self.nacos_client.list_calls, 1)
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    """测试熔断器状态转换"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        """测试连续失败后熔断，超时后只放行一个探测请求"""
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+        self.clock.advance(10)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        """测试探测失败后重新熔断"""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.advance(10)
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.stats()['opened_count'], 2)
+
+
+class RetryBudgetTest(SimpleTestCase):
+    """测试重试预算"""
+
+    def test_budget_limits_retries(self):
+        """测试令牌耗尽后不再重试，正常请求会补充令牌"""
+        budget = RetryBudget(ratio=0.5, max_tokens=2)
+        self.assertTrue(budget.try_acquire())
+        self.assertTrue(budget.try_acquire())
+        self.assertFalse(budget.try_acquire())
+
+        budget.record_request()
+        budget.record_request()
+        self.assertTrue(budget.try_acquire())
+        self.assertEqual(budget.stats()['exhausted'], 1)
+
+
+class UserServiceClientResilienceTest(SimpleTestCase):
+    """测试用户服务客户端的重试和熔断"""
+
+    def setUp(self):
+        self.client = UserServiceClient()
+        nacos_client = FakeNacosClient([
+            {'ip': '10.0.0.1', 'port': 8000, 'healthy': True},
+            {'ip': '10.0.0.2', 'port': 8000, 'healthy': True},
+        ])
+        self.client.instances = ServiceInstanceTable('UserService', lambda: nacos_client, refresh_interval=3600)
+        self.client.session = Mock()
+        self.client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    def _response(self, status_code, payload=None):
+        response = Mock(status_code=status_code)
+        response.json.return_value = payload
+        if status_code >= 400:
+            response.raise_for_status.side_effect = requests.HTTPError(str(status_code))
+        return response
+
+    def test_server_error_is_retried_once(self):
+        """测试 5xx 在预算内重试"""
+        self.client.session.get.side_effect = [
+            self._response(503),
+            self._response(200, {'username': 'a'}),
+        ]
+        self.assertEqual(self.client.get_user_by_id(uuid.uuid4()), {'username': 'a'})
+        self.assertEqual(self.client.session.get.call_count, 2)
+
+    def test_open_breaker_skips_network(self):
+        """测试熔断后不再请求用户服务"""
+        self.client.session.get.side_effect = requests.ConnectionError('refused')
+        self.client.get_user_by_id(uuid.uuid4())
+        self.client.get_user_by_id(uuid.uuid4())
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.OPEN)
+
+        calls = self.client.session.get.call_count
+        self.assertIsNone(self.client.get_user_by_id(uuid.uuid4()))
+        self.assertEqual(self.client.session.get.call_count, calls)
+
+    def test_no_instances_is_not_a_breaker_failure(self):
+        """测试没有可用实例时不计入熔断器失败次数，也不占用半开状态的探测名额"""
+        self.client.instances = ServiceInstanceTable('UserService', lambda: FakeNacosClient([]), refresh_interval=3600)
+        for _ in range(5):
+            self.assertIsNone(self.client.get_user_by_id(uuid.uuid4()))
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.client.breaker.stats()['opened_count'], 0)
+        self.client.session.get.assert_not_called()
+
+    def test_metrics_endpoint(self):
+        """测试指标接口"""
+        response = self.client_class().get(reverse('user_service_metrics'))
+        self.assertEqual(response.status_code, 200)
+        metrics = response.json()['metrics']
+        for key in ('circuit_breaker', 'retry_budget', 'connection_pools', 'instances', 'cache'):
+            self.assertIn(key, metrics)
+
+
+class StubUserServiceHandler(BaseHTTPRequestHandler):
+    """本地模拟的 UserService：/api/v1/user/me/ 按 UUID 头返回用户"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.request_count += 1
+        try:
+            time.sleep(server.delay)
+            user_id = self.headers.get('UUID')
+            if self.path != '/api/v1/user/me/' or user_id not in server.users:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = json.dumps(server.users[user_id]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AsyncUserServiceClientTest(SimpleTestCase):
+    """使用本地 HTTP 服务测试异步用户服务客户端"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubUserServiceHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.request_count = 0
+        self.server.delay = 0.05
+        self.server.users = {}
+        for i in range(10):
+            user_id = str(uuid.uuid4())
+            self.server.users[user_id] = {'user_id': user_id, 'username': f'user{i}'}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.client = AsyncUserServiceClient(sync_client=UserServiceClient(), base_url=base_url, max_concurrency=3)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _run(self, coro_fn):
+        async def runner():
+            try:
+                return await coro_fn()
+            finally:
+                await self.client.close()
+        return asyncio.run(runner())
+
+    def test_get_user_by_id(self):
+        """测试获取单个用户，不存在的用户返回 None 且被缓存"""
+        user_id = next(iter(self.server.users))
+        missing_id = str(uuid.uuid4())
+
+        async def scenario():
+            return (
+                await self.client.get_user_by_id(uuid.UUID(user_id)),
+                await self.client.get_user_by_id(missing_id),
+                await self.client.get_user_by_id(missing_id),
+            )
+
+        user, missing, missing_again = self._run(scenario)
+        self.assertEqual(user['username'], self.server.users[user_id]['username'])
+        self.assertIsNone(missing)
+        self.assertIsNone(missing_again)
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_get_users_by_ids_respects_concurrency_cap(self):
+        """测试批量获取时并发请求数不超过上限，重复ID只请求一次"""
+        user_ids = list(self.server.users)
+
+        results = self._run(lambda: self.client.get_users_by_ids(user_ids + user_ids[:3]))
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(results[user_ids[0]]['username'], self.server.users[user_ids[0]]['username'])
+        self.assertEqual(self.server.request_count, 10)
+        self.assertLessEqual(self.server.max_in_flight, 3)
+        self.assertGreater(self.server.max_in_flight, 1)
+
+    def test_concurrent_lookups_are_coalesced(self):
+        """测试同一用户的并发查询只发出一个请求"""
+        user_id = next(iter(self.server.users))
+
+        async def scenario():
+            return await asyncio.gather(*(self.client.get_user_by_id(user_id) for _ in range(20)))
+
+        results = self._run(scenario)
+        self.assertTrue(all(result['user_id'] == user_id for result in results))
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_session_is_closed_when_loop_finishes(self):
+        """测试每个事件循环的会话在循环结束时关闭，不依赖调用方 close()"""
+        user_id = next(iter(self.server.users))
+        sessions = []
+
+        async def scenario():
+            await self.client.get_user_by_id(user_id)
+            sessions.append(self.client._get_session())
+
+        asyncio.run(scenario())
+        self.client.cache.clear()
+        asyncio.run(scenario())
+
+        self.assertEqual(len(sessions), 2)
+        self.assertIsNot(sessions[0], sessions[1])
+        self.assertTrue(all(session.closed for session in sessions))
+        self.assertEqual(self.client._sessions, {})
+
+    def test_discovery_warm_up_runs_off_the_event_loop(self):
+        """测试首次通过 Nacos 选择实例时，拉取实例列表不在事件循环线程中执行"""
+        port = self.server.server_address[1]
+        nacos_client = FakeNacosClient([{'ip': '127.0.0.1', 'port': port, 'healthy': True}])
+        list_threads = []
+        list_naming_instance = nacos_client.list_naming_instance
+
+        def list_instances(service_name):
+            list_threads.append(threading.current_thread())
+            return list_naming_instance(service_name)
+
+        nacos_client.list_naming_instance = list_instances
+        self.client._sync.instances = ServiceInstanceTable('UserService', lambda: nacos_client, refresh_interval=3600)
+        self.client.base_url = None
+        user_id = next(iter(self.server.users))
+
+        async def scenario():
+            return threading.current_thread(), await self.client.get_user_by_id(user_id)
+
+        loop_thread, user = self._run(scenario)
+        self.assertEqual(user['user_id'], user_id)
+        self.assertEqual(len(list_threads), 1)
+        self.assertIsNot(list_threads[0], loop_thread)
+
+    def test_unreachable_service_returns_none(self):
+        """测试用户服务不可达时返回 None"""
+        self.client.base_url = 'http://127.0.0.1:1'
+        self.assertIsNone(self._run(lambda: self.client.get_user_by_id(uuid.uuid4())))
+
+
+class SingleFlightTest(SimpleTestCase):
+    """测试并发相同请求合并"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """测试多个线程同时查询同一用户时只请求一次"""
+        client = UserServiceClient()
+        calls = []
+        started = threading.Barrier(10)
+
+        def fetch(user_id):
+            calls.append(user_id)
+            time.sleep(0.1)
+            return {'username': 'hot'}
+
+        results = []
+
+        def worker():
+            started.wait()
+            results.append(client.get_user_by_id('hot-seller'))
+
+        with patch.object(client, '_fetch_user', side_effect=fetch):
+            threads = [threading.Thread(target=worker) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'username': 'hot'}] * 10)
+        self.assertGreater(client.metrics()['singleflight']['coalesced'], 0)
+
+    def test_error_is_shared_and_not_remembered(self):
+        """测试异常会传给所有等待者，之后的调用重新执行"""
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do('k', lambda: (_ for _ in ()).throw(ValueError('boom')))
+        self.assertEqual(flight.do('k', lambda: 1), 1)
+
+
+class StartupTest(SimpleTestCase):
+    """测试启动过程不阻塞"""
+
+    def setUp(self):
+        nacos_register._registration_started = False
+
+    def tearDown(self):
+        nacos_register._registration_started = False
+
+    def test_registration_is_disabled_by_default(self):
+        """测试未开启 NACOS_REGISTER_ENABLED 时任何进程都不注册（pytest、gunicorn、python -c）"""
+        for argv in (['pytest'], ['gunicorn', 'ProductService.wsgi'], ['-c'], ['manage.py', 'runserver', '--noreload']):
+            with patch.object(nacos_register.sys, 'argv', argv):
+                self.assertFalse(nacos_register._should_register())
+
+    @override_settings(NACOS_REGISTER_ENABLED=True)
+    def test_management_commands_do_not_register(self):
+        """测试开启注册后 test、migrate 等管理命令仍不注册到 Nacos"""
+        with patch.object(nacos_register.sys, 'argv', ['manage.py', 'migrate']):
+            self.assertFalse(nacos_register._should_register())
+        with patch.object(nacos_register.sys, 'argv', ['manage.py', 'runserver', '--noreload']):
+            self.assertTrue(nacos_register._should_register())
+        with patch.object(nacos_register.sys, 'argv', ['gunicorn', 'ProductService.wsgi']):
+            self.assertTrue(nacos_register._should_register())
+
+    @patch('ProductService.nacos_register.register_to_nacos')
+    @patch('ProductService.nacos_register._should_register', return_value=True)
+    def test_registration_runs_once_in_background(self, mock_should_register, mock_register):
+        """测试注册在后台线程中执行且每个进程只执行一次"""
+        with patch('ProductService.nacos_register.threading.Thread') as mock_thread:
+            self.assertTrue(nacos_register.start_registration_in_background())
+            self.assertFalse(nacos_register.start_registration_in_background())
+
+        mock_thread.assert_called_once()
+        self.assertIs(mock_thread.call_args.kwargs['target'], mock_register)
+        mock_register.assert_not_called()
+
+    @patch('ProductService.user_service.NacosClient')
+    def test_user_service_client_is_lazy(self, mock_nacos_client):
+        """测试创建用户服务客户端时不连接 Nacos"""
+        client = UserServiceClient()
+        mock_nacos_client.assert_not_called()
+
+        self.assertIs(client.nacos_client, mock_nacos_client.return_value)
+        self.assertIs(client.nacos_client, mock_nacos_client.return_value)
+        mock_nacos_client.assert_called_once()
+
+    def test_health_endpoint(self):
+        """测试健康检查接口"""
+        response = self.client.get(reverse('nacos_health_check'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'UP')
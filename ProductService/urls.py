@@ -15,18 +15,17 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.urls import path, include
-from .health_views import nacos_health_check
+from .health_views import nacos_health_check, user_service_metrics, product_cache_metrics
 
-# 启动时注册到 Nacos
-try:
-    from .nacos_register import register_to_nacos
-    register_to_nacos()
-except ImportError:
-    print("⚠️ Nacos registration module not found")
+# Nacos 注册在 ProductServiceConfig.ready() 中由后台线程完成
 
 urlpatterns = [
     # Nacos 健康检查端点
     path('health/', nacos_health_check, name='nacos_health_check'),
+    # 下游用户服务调用指标
+    path('health/user-service/', user_service_metrics, name='user_service_metrics'),
+    # 商品列表响应缓存指标
+    path('health/product-cache/', product_cache_metrics, name='product_cache_metrics'),
     
     # API 端点
     path('api/', include('Product.urls')),
@@ -0,0 +1,102 @@
+"""
+用户信息本地缓存
+进程内的 LRU + TTL 缓存，支持负缓存和过期后先返回旧值再后台刷新（stale-while-revalidate）
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserInfoCache:
+    """
+    有容量上限的用户信息缓存
+
+    每个条目有两个时间点：
+        expires_at: 之前是新鲜数据，直接返回
+        stale_until: 之前可以先返回旧数据，同时由调用方在后台刷新
+    超过 stale_until 的条目视为未命中。用户不存在时缓存 None（负缓存），
+    负缓存使用更短的 TTL，且不参与 stale-while-revalidate。
+    """
+
+    FRESH = 'fresh'
+    STALE = 'stale'
+    MISS = 'miss'
+
+    def __init__(self, max_size=10000, ttl=60, negative_ttl=10, stale_ttl=300, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        查询缓存
+
+        Returns:
+            tuple: (状态, 值)，状态为 FRESH / STALE / MISS
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return self.MISS, None
+
+            value, expires_at, stale_until = entry
+            now = self._clock()
+            if now < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self.FRESH, value
+            if now < stale_until:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                return self.STALE, value
+
+            del self._entries[key]
+            self.misses += 1
+            return self.MISS, None
+
+    def set(self, key, value):
+        """写入缓存，value 为 None 表示用户不存在"""
+        now = self._clock()
+        if value is None:
+            expires_at = stale_until = now + self.negative_ttl
+        else:
+            expires_at = now + self.ttl
+            stale_until = expires_at + self.stale_ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires_at, stale_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """删除单个条目"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """命中、未命中、淘汰等统计信息"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -3,26 +3,110 @@
 通过 Nacos 服务发现调用 UserService 获取用户信息
 """
 import requests
+from requests.adapters import HTTPAdapter
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from nacos import NacosClient
 import os
 from datetime import datetime
+
+from .resilience import CircuitBreaker, RetryBudget
+from .service_discovery import ServiceInstanceTable
+from .singleflight import SingleFlight
+from .user_cache import UserInfoCache
+
 logger = logging.getLogger(__name__)
 
 
+class UserServiceUnavailable(Exception):
+    """用户服务不可用（没有健康实例或请求失败）"""
+
+
+class CircuitOpenError(UserServiceUnavailable):
+    """熔断器打开，请求被直接拒绝"""
+
+
+class NoInstanceError(UserServiceUnavailable):
+    """还没有可用的实例，请求没有发出，不计入熔断器的失败次数"""
+
+
+class _RetryableError(Exception):
+    """连接失败、超时或 5xx，可以换一个实例重试"""
+
+
 class UserServiceClient:
     """用户服务客户端"""
     
     def __init__(self):
         self.service_name = 'UserService'
-        self.nacos_client = None
-        self._init_nacos_client()
+        # Nacos 客户端在第一次查询用户时才创建，导入模块不访问网络
+        self._nacos_client = None
+        self._nacos_client_ready = False
+        self._nacos_client_lock = threading.Lock()
+        # 批量查询时的最大并发数，避免一页商品把 UserService 打满
+        self.max_concurrency = int(os.getenv('USER_SERVICE_MAX_CONCURRENCY', '8'))
+        self.cache = UserInfoCache(
+            max_size=int(os.getenv('USER_CACHE_MAX_SIZE', '10000')),
+            ttl=float(os.getenv('USER_CACHE_TTL', '60')),
+            negative_ttl=float(os.getenv('USER_CACHE_NEGATIVE_TTL', '10')),
+            stale_ttl=float(os.getenv('USER_CACHE_STALE_TTL', '300')),
+        )
+        # 后台刷新过期缓存，同一用户同时只刷新一次
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='UserCacheRefresh')
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        # 同一用户的并发查询只发出一个请求
+        self._singleflight = SingleFlight()
+        self.instances = ServiceInstanceTable(
+            self.service_name,
+            lambda: self.nacos_client,
+            refresh_interval=float(os.getenv('USER_SERVICE_DISCOVERY_INTERVAL', '10')),
+            eject_threshold=int(os.getenv('USER_SERVICE_EJECT_THRESHOLD', '3')),
+            eject_seconds=float(os.getenv('USER_SERVICE_EJECT_SECONDS', '30')),
+        )
+        # 连接池：按实例保持长连接，pool_block 限制每个实例的最大连接数
+        self.pool_maxsize = int(os.getenv('USER_SERVICE_POOL_MAXSIZE', '20'))
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(
+            pool_connections=int(os.getenv('USER_SERVICE_POOL_CONNECTIONS', '10')),
+            pool_maxsize=self.pool_maxsize,
+            pool_block=True,
+            max_retries=0,
+        )
+        self.session.mount('http://', self._adapter)
+        self.timeout = (
+            float(os.getenv('USER_SERVICE_CONNECT_TIMEOUT', '1')),
+            float(os.getenv('USER_SERVICE_READ_TIMEOUT', '2')),
+        )
+        self.max_retries = int(os.getenv('USER_SERVICE_MAX_RETRIES', '1'))
+        self.retry_budget = RetryBudget(ratio=float(os.getenv('USER_SERVICE_RETRY_RATIO', '0.2')))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('USER_SERVICE_BREAKER_THRESHOLD', '5')),
+            reset_timeout=float(os.getenv('USER_SERVICE_BREAKER_RESET', '10')),
+        )
     
+    @property
+    def nacos_client(self):
+        """延迟创建的 Nacos 客户端"""
+        if not self._nacos_client_ready:
+            with self._nacos_client_lock:
+                if not self._nacos_client_ready:
+                    self._init_nacos_client()
+                    self._nacos_client_ready = True
+        return self._nacos_client
+
+    @nacos_client.setter
+    def nacos_client(self, client):
+        self._nacos_client = client
+        self._nacos_client_ready = True
+
     def _init_nacos_client(self):
         """初始化 Nacos 客户端"""
         try:
             nacos_server = os.getenv('NACOS_SERVER', '123.57.145.79:8848')
-            self.nacos_client = NacosClient(
+            self._nacos_client = NacosClient(
                 server_addresses=nacos_server, 
                 namespace='public',
                 username=os.getenv('NACOS_USERNAME', 'nacos'),
@@ -32,51 +116,173 @@ class UserServiceClient:
         except Exception as e:
             logger.error(f"Failed to initialize Nacos client: {e}")
     
-    def _get_service_url(self):
-        """获取用户服务的 URL"""
-        if not self.nacos_client:
-            return None
-            
-        try:
-            instances = self.nacos_client.list_naming_instance(self.service_name)
-            hosts = instances.get('hosts', [])
-            
-            # 找到健康的实例
-            healthy_hosts = [host for host in hosts if host.get('healthy', False)]
-            if not healthy_hosts:
-                logger.warning(f"No healthy instances found for {self.service_name}")
-                return None
-                
-            # 简单的负载均衡：使用第一个健康的实例
-            host = healthy_hosts[0]
-            return f"http://{host['ip']}:{host['port']}"
-            
-        except Exception as e:
-            logger.error(f"Failed to get service URL for {self.service_name}: {e}")
-            return None
-    
-    def get_user_by_id(self, user_id):
-        """根据用户ID获取用户信息"""
-        service_url = self._get_service_url()
-        if not service_url:
-            logger.error("UserService not available")
-            return None
-        
+    def _fetch_user(self, user_id):
+        """
+        请求用户服务获取用户信息
+
+        熔断器打开时直接失败；连接失败、超时和 5xx 在重试预算允许时换实例重试
+
+        Returns:
+            dict: 用户信息，用户不存在时返回 None
+
+        Raises:
+            UserServiceUnavailable: 用户服务不可用或请求失败
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("UserService circuit breaker is open")
+
+        self.retry_budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                result = self._request_once(user_id)
+            except _RetryableError as e:
+                if attempt < self.max_retries and self.retry_budget.try_acquire():
+                    attempt += 1
+                    continue
+                self.breaker.record_failure()
+                raise UserServiceUnavailable(str(e)) from e
+            except NoInstanceError:
+                self.breaker.record_skipped()
+                raise
+            except UserServiceUnavailable:
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def _request_once(self, user_id):
+        """选择一个实例发送一次请求"""
+        instance = self.instances.pick()
+        if not instance:
+            raise NoInstanceError("UserService not available")
+
+        started = time.monotonic()
+        success = False
         try:
-            # 确保user_id是字符串格式
-            if user_id:
-                user_id = str(user_id)
-            
             # 使用实际的 API 路径
-            url = f"{service_url}/api/v1/user/me/"
+            url = f"{instance.url}/api/v1/user/me/"
             headers = {"UUID": user_id}
-            response = requests.get(url, headers=headers, timeout=5)
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise _RetryableError(str(e)) from e
+        else:
+            if response.status_code >= 500:
+                raise _RetryableError(f"UserService returned {response.status_code}")
+            success = True
+        finally:
+            self.instances.release(instance, time.monotonic() - started, success)
+
+        if response.status_code == 404:
+            return None
+        try:
             response.raise_for_status()
             return response.json()
         except Exception as e:
+            raise UserServiceUnavailable(str(e)) from e
+
+    def get_user_by_id(self, user_id):
+        """根据用户ID获取用户信息（优先读取本地缓存）"""
+        # 确保user_id是字符串格式
+        if user_id:
+            user_id = str(user_id)
+
+        state, user_info = self.cache.get(user_id)
+        if state == UserInfoCache.FRESH:
+            return user_info
+        if state == UserInfoCache.STALE:
+            # 先返回旧数据，后台刷新
+            self._refresh_in_background(user_id)
+            return user_info
+
+        try:
+            return self._load_user(user_id)
+        except CircuitOpenError:
+            return None
+        except UserServiceUnavailable as e:
             logger.error(f"Failed to get user {user_id}: {e}")
             return None
 
+    def _load_user(self, user_id):
+        """请求用户服务并写入缓存，相同用户的并发调用共享一次请求"""
+        def load():
+            user_info = self._fetch_user(user_id)
+            self.cache.set(user_id, user_info)
+            return user_info
+
+        return self._singleflight.do(user_id, load)
+
+    def _refresh_in_background(self, user_id):
+        """在后台线程刷新过期的缓存条目"""
+        with self._refreshing_lock:
+            if user_id in self._refreshing:
+                return
+            self._refreshing.add(user_id)
+        self._refresh_executor.submit(self._refresh, user_id)
+
+    def _refresh(self, user_id):
+        try:
+            self._load_user(user_id)
+        except UserServiceUnavailable as e:
+            # 刷新失败时保留旧数据，直到超过 stale 窗口
+            logger.warning(f"Failed to refresh user {user_id}: {e}")
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(user_id)
+
+    def cache_stats(self):
+        """用户信息缓存统计"""
+        return self.cache.stats()
+
+    def pool_stats(self):
+        """连接池使用情况，每个实例一个连接池"""
+        pools = []
+        pool_manager = self._adapter.poolmanager
+        for key in list(pool_manager.pools.keys()):
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append({
+                'host': f"{pool.host}:{pool.port}",
+                'maxsize': pool.pool.maxsize if pool.pool else 0,
+                'in_use': (pool.pool.maxsize - pool.pool.qsize()) if pool.pool else 0,
+                'connections_created': pool.num_connections,
+                'requests': pool.num_requests,
+            })
+        return pools
+
+    def metrics(self):
+        """用户服务调用相关的全部指标"""
+        return {
+            'circuit_breaker': self.breaker.stats(),
+            'retry_budget': self.retry_budget.stats(),
+            'connection_pools': self.pool_stats(),
+            'instances': self.instances.snapshot(),
+            'cache': self.cache_stats(),
+            'singleflight': self._singleflight.stats(),
+        }
+
+    def get_users_by_ids(self, user_ids):
+        """
+        批量获取用户信息
+
+        UserService 没有批量接口，这里对去重后的用户ID做有界并发请求，
+        耗时取决于不同用户的数量而不是调用方传入的条数。
+
+        Returns:
+            dict: {str(user_id): 用户信息或None}
+        """
+        unique_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids if user_id))
+        if not unique_ids:
+            return {}
+        if len(unique_ids) == 1:
+            return {unique_ids[0]: self.get_user_by_id(unique_ids[0])}
+
+        workers = max(1, min(self.max_concurrency, len(unique_ids)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='UserServiceFetch') as executor:
+            results = executor.map(self.get_user_by_id, unique_ids)
+            return dict(zip(unique_ids, results))
+
 
 # 全局用户服务客户端实例
 user_service = UserServiceClient()